@@ -0,0 +1,15 @@
+# analytics/__init__.py
+
+from .histogram import LatencyHistogram
+from .latency import LatencyTracker
+from .rolling_aggregates import RollingAggregator, SlidingWindow
+from .rules import Rule, RuleEngine
+
+__all__ = [
+    "LatencyHistogram",
+    "LatencyTracker",
+    "RollingAggregator",
+    "SlidingWindow",
+    "Rule",
+    "RuleEngine",
+]
@@ -0,0 +1,169 @@
+from array import array
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Values are recorded as whole microseconds.
+UNITS_PER_SECOND = 1_000_000
+
+
+class LatencyHistogram:
+    """
+    A log-linear histogram of durations, in the style of HdrHistogram.
+
+    Values below ``2 ** sub_bucket_bits`` microseconds get one bucket each; above
+    that, each power of two is split into ``2 ** (sub_bucket_bits - 1)`` equal
+    buckets, so every value is kept to within ``2 ** (1 - sub_bucket_bits)`` of
+    its size (about 1.6% with the default 7 bits). Recording is a bit_length,
+    a shift and an array increment, whatever the number of samples, and the
+    counts fit in a fixed array of a couple of thousand slots.
+    """
+
+    __slots__ = (
+        "sub_bucket_bits",
+        "highest",
+        "counts",
+        "count",
+        "total",
+        "min_value",
+        "max_value",
+    )
+
+    def __init__(
+        self, highest_seconds: float = 3600.0, sub_bucket_bits: int = 7
+    ) -> None:
+        """
+        Args:
+            highest_seconds (float): Largest trackable value; larger ones are clamped.
+            sub_bucket_bits (int): Precision; each power of two gets 2 ** (bits - 1) buckets.
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self.highest = max(1, int(highest_seconds * UNITS_PER_SECOND))
+        self.counts = array("Q", bytes(8 * (self._index(self.highest) + 1)))
+        self.count: int = 0
+        self.total: int = 0
+        self.min_value: int = 0
+        self.max_value: int = 0
+
+    def _index(self, value: int) -> int:
+        bits = self.sub_bucket_bits
+        shift = value.bit_length() - bits
+        if shift <= 0:
+            return value
+        return (shift << (bits - 1)) + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """Return the largest value that lands in bucket `index`."""
+        bits = self.sub_bucket_bits
+        if index < 1 << bits:
+            return index
+        half = 1 << (bits - 1)
+        shift = index // half - 1
+        return ((index - shift * half + 1) << shift) - 1
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """
+        Records a duration `count` times; negative durations count as zero.
+        """
+        value = int(seconds * UNITS_PER_SECOND)
+        if value < 0:
+            value = 0
+        elif value > self.highest:
+            value = self.highest
+        self.counts[self._index(value)] += count
+        if not self.count or value < self.min_value:
+            self.min_value = value
+        if value > self.max_value:
+            self.max_value = value
+        self.count += count
+        self.total += value * count
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Adds another histogram's samples; both must have the same layout.
+        """
+        if len(other.counts) != len(self.counts):
+            raise ValueError("Only histograms with the same range and precision merge.")
+        if not other.count:
+            return
+        counts = self.counts
+        for index, bucket in enumerate(other.counts):
+            if bucket:
+                counts[index] += bucket
+        if not self.count or other.min_value < self.min_value:
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+        self.count += other.count
+        self.total += other.total
+
+    def reset(self) -> None:
+        """Clears all samples."""
+        self.counts = array("Q", bytes(8 * len(self.counts)))
+        self.count = self.total = self.min_value = self.max_value = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count / UNITS_PER_SECOND if self.count else 0.0
+
+    @property
+    def minimum(self) -> float:
+        return self.min_value / UNITS_PER_SECOND
+
+    @property
+    def maximum(self) -> float:
+        return self.max_value / UNITS_PER_SECOND
+
+    def percentiles(self, ranks: Sequence[float]) -> List[float]:
+        """
+        Returns the value at each percentile rank in 0-100, in seconds.
+
+        Like HdrHistogram, each value is the highest one equivalent to its bucket,
+        capped at the largest recorded value.
+        """
+        results = [0.0] * len(ranks)
+        if not self.count:
+            return results
+        order = sorted(range(len(ranks)), key=lambda position: ranks[position])
+        targets = [
+            (position, max(1, -(-self.count * ranks[position] // 100)))
+            for position in order
+        ]
+        seen = 0
+        pending = iter(targets)
+        position, target = next(pending)
+        for index, bucket in enumerate(self.counts):
+            if not bucket:
+                continue
+            seen += bucket
+            while seen >= target:
+                value = min(self._highest_equivalent(index), self.max_value)
+                results[position] = value / UNITS_PER_SECOND
+                try:
+                    position, target = next(pending)
+                except StopIteration:
+                    return results
+        return results
+
+    def buckets(self) -> Iterator[Tuple[float, int]]:
+        """
+        Yields (upper bound in seconds, count) for every power of two holding samples.
+        """
+        totals: Dict[int, int] = {}
+        for index, bucket in enumerate(self.counts):
+            if bucket:
+                upper = self._highest_equivalent(index).bit_length()
+                totals[upper] = totals.get(upper, 0) + bucket
+        for bits in sorted(totals):
+            yield ((1 << bits) - 1) / UNITS_PER_SECOND, totals[bits]
+
+    def summary(self, ranks: Sequence[float] = (50, 90, 99, 99.9)) -> Dict[str, float]:
+        """
+        Returns count, min, max, mean and the requested percentiles (as p50, p90, ...).
+        """
+        summary = {
+            "count": self.count,
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean,
+        }
+        for rank, value in zip(ranks, self.percentiles(ranks)):
+            summary[f"p{rank:g}"] = value
+        return summary
@@ -0,0 +1,232 @@
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from output.output_sink import get_sink
+
+from .histogram import LatencyHistogram
+
+# Latency reports are published under this prefix, outside home/#.
+METRICS_PREFIX = "metrics/latency"
+# Sequence numbers wrap at 2 ** 32 (see payload_codec.trace_payload).
+SEQUENCE_MODULUS = 1 << 32
+
+
+class StreamCounters:
+    """
+    Delivery counters of one device type's traced messages.
+    """
+
+    __slots__ = ("received", "lost", "reordered", "duplicates", "restarts")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.restarts = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class LatencyTracker:
+    """
+    Measures publish-to-receive latency, loss and reordering of traced messages.
+
+    Register ``observe`` as the MessageHandler's ``on_trace`` hook. Latency is the
+    receive time minus the send time stamped by the publisher, so sender and
+    receiver clocks must agree (the same host, or NTP-synchronized ones).
+
+    Each topic is one stream of sequence numbers. A number past the next
+    expected one counts the skipped messages as lost; one that arrives later
+    after all is counted as reordered and taken back off the loss count (of the
+    run totals if that loss was already reported); a repeat of the last number
+    is a duplicate. A stream that starts again from
+    zero is a restarted publisher, not reordering.
+
+    Every ``export_interval`` seconds the latency histogram and counters of each
+    device type (the third topic level) are logged and published as JSON on
+    ``metrics/latency/<device type>``, then reset; ``totals`` keeps them for the
+    whole run.
+    """
+
+    def __init__(
+        self,
+        mqtt_manager: Any = None,
+        export_interval: float = 10.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Args:
+            mqtt_manager: Manager used to publish reports; reports are only logged
+                without one.
+            export_interval (float): Seconds between reports.
+            clock (Callable[[], float]): Receive time source, in seconds since the epoch.
+        """
+        self.mqtt_manager = mqtt_manager
+        self.export_interval = export_interval
+        self.clock = clock
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, StreamCounters] = {}
+        self.totals: Dict[str, LatencyHistogram] = {}
+        self.total_counters: Dict[str, StreamCounters] = {}
+        self._last_sequence: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def attach(self, mqtt_manager: Any) -> None:
+        """
+        Starts observing the traced messages received by `mqtt_manager`.
+        """
+        mqtt_manager.message_handler.on_trace = self.observe
+
+    def observe(self, topic: str, sent: float, sequence: int) -> None:
+        """
+        Records one traced message; the hook MessageHandler calls on arrival.
+        """
+        latency = self.clock() - sent
+        levels = topic.split("/", 3)
+        if len(levels) < 4 or levels[0] != "home":
+            return  # Not a device message
+        device_type = levels[2]
+        with self._lock:
+            histogram = self.histograms.get(device_type)
+            if histogram is None:
+                histogram = self.histograms[device_type] = LatencyHistogram()
+                self.counters[device_type] = StreamCounters()
+            histogram.record(latency)
+            self._count(topic, sequence, device_type)
+
+    def _count(self, topic: str, sequence: int, device_type: str) -> None:
+        counters = self.counters[device_type]
+        counters.received += 1
+        last = self._last_sequence.get(topic)
+        if last is None:
+            self._last_sequence[topic] = sequence
+            return
+        gap = (sequence - last) % SEQUENCE_MODULUS
+        if gap == 1:
+            self._last_sequence[topic] = sequence
+        elif gap == 0:
+            counters.duplicates += 1
+        elif sequence == 0:
+            counters.restarts += 1
+            self._last_sequence[topic] = sequence
+        elif gap < SEQUENCE_MODULUS // 2:
+            counters.lost += gap - 1
+            self._last_sequence[topic] = sequence
+        else:
+            # Older than the last one seen: it was counted as lost when skipped.
+            counters.reordered += 1
+            if counters.lost:
+                counters.lost -= 1
+            else:
+                # That loss was already reported; reported intervals stay as they were.
+                total = self.total_counters.get(device_type)
+                if total is not None and total.lost:
+                    total.lost -= 1
+
+    def take_reports(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the latency summary and counters per device type since the last
+        call, and adds them to the run totals.
+        """
+        with self._lock:
+            reports = {}
+            for device_type, histogram in self.histograms.items():
+                counters = self.counters[device_type]
+                if not counters.received:
+                    continue
+                reports[device_type] = dict(histogram.summary(), **counters.snapshot())
+                total = self.totals.get(device_type)
+                if total is None:
+                    total = self.totals[device_type] = LatencyHistogram()
+                    self.total_counters[device_type] = StreamCounters()
+                total.merge(histogram)
+                total_counters = self.total_counters[device_type]
+                for name in StreamCounters.__slots__:
+                    setattr(
+                        total_counters,
+                        name,
+                        getattr(total_counters, name) + getattr(counters, name),
+                    )
+                histogram.reset()
+                counters.reset()
+            return reports
+
+    def export(self) -> int:
+        """
+        Logs and publishes the reports since the last export.
+
+        Returns:
+            int: The number of device types reported.
+        """
+        reports = self.take_reports()
+        for device_type, report in reports.items():
+            log_report(device_type, report)
+            if self.mqtt_manager is not None:
+                self.mqtt_manager.publish(
+                    f"{METRICS_PREFIX}/{device_type}", json.dumps(report)
+                )
+        return len(reports)
+
+    def print_totals(self) -> None:
+        """
+        Logs each device type's figures over the whole run.
+        """
+        self.take_reports()
+        with self._lock:
+            for device_type, histogram in self.totals.items():
+                report = dict(
+                    histogram.summary(), **self.total_counters[device_type].snapshot()
+                )
+                log_report(f"{device_type} (total)", report)
+
+    def start(self) -> None:
+        """
+        Starts exporting reports every ``export_interval`` seconds.
+        """
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="latency-export", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the export thread.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.export_interval):
+            self.export()
+
+
+def log_report(name: str, report: Dict[str, Any]) -> None:
+    """
+    Logs one device type's latency summary and delivery counters.
+    """
+    get_sink().info(
+        "Latency %s: %d received, p50 %.2f ms, p99 %.2f ms, p99.9 %.2f ms, "
+        "max %.2f ms, %d lost, %d reordered, %d duplicates",
+        name,
+        report["received"],
+        report["p50"] * 1000,
+        report["p99"] * 1000,
+        report["p99.9"] * 1000,
+        report["max"] * 1000,
+        report["lost"],
+        report["reordered"],
+        report["duplicates"],
+    )
@@ -0,0 +1,241 @@
+import json
+import threading
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from output.output_sink import get_sink
+
+STATS_SUFFIX = "stats"
+# Device id used in the topic of group-wide rollups.
+GROUP_DEVICE = "all"
+
+# Window key: (group, device type, device id or GROUP_DEVICE, metric).
+WindowKey = Tuple[str, str, str, str]
+
+
+class SlidingWindow:
+    """
+    The last ``capacity`` samples of one metric, kept in a ring buffer.
+
+    Adding a sample is O(1) amortized: the sum is updated incrementally and the
+    minimum and maximum come from monotonic queues that drop every sample which
+    can no longer be the extreme. Percentiles sort a copy of the window, so they
+    are computed only when a rollup is published.
+    """
+
+    __slots__ = ("capacity", "samples", "added", "total", "_min", "_max")
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError(f"Window capacity must be at least 1: {capacity}")
+        self.capacity = capacity
+        self.samples = array("d")
+        self.added: int = 0  # Samples ever added; the next one's sequence number
+        self.total: float = 0.0
+        self._min: Deque[Tuple[int, float]] = deque()
+        self._max: Deque[Tuple[int, float]] = deque()
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, value: float) -> None:
+        """
+        Adds a sample, evicting the oldest one when the window is full.
+        """
+        sequence = self.added
+        slot = sequence % self.capacity
+        if len(self.samples) < self.capacity:
+            self.samples.append(value)
+        else:
+            self.total -= self.samples[slot]
+            self.samples[slot] = value
+        self.total += value
+        self.added = sequence + 1
+
+        # Each queue holds (sequence, value) pairs in window order; a sample that an
+        # equal-or-better newer one outlasts can never be the extreme again.
+        oldest = self.added - len(self.samples)
+        lows, highs = self._min, self._max
+        while lows and lows[-1][1] >= value:
+            lows.pop()
+        lows.append((sequence, value))
+        if lows[0][0] < oldest:
+            lows.popleft()
+        while highs and highs[-1][1] <= value:
+            highs.pop()
+        highs.append((sequence, value))
+        if highs[0][0] < oldest:
+            highs.popleft()
+
+    @property
+    def minimum(self) -> float:
+        return self._min[0][1]
+
+    @property
+    def maximum(self) -> float:
+        return self._max[0][1]
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.samples)
+
+    def percentiles(self, ranks: Sequence[float]) -> List[float]:
+        """
+        Returns the nearest-rank percentile for each rank in 0-100.
+        """
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return [ordered[min(last, int(round(rank / 100.0 * last)))] for rank in ranks]
+
+    def summary(self, ranks: Sequence[float]) -> Dict[str, float]:
+        """
+        Returns count, min, max, mean and the requested percentiles (as p50, p90, ...).
+        """
+        summary = {
+            "count": len(self.samples),
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean,
+        }
+        for rank, value in zip(ranks, self.percentiles(ranks)):
+            summary[f"p{rank:g}"] = value
+        return summary
+
+
+class RollingAggregator:
+    """
+    Keeps sliding-window statistics of numeric sensor readings and publishes rollups.
+
+    Readings are taken from topics shaped ``home/<group>/<type>/<device>/<metric>/...``
+    and from packed sensor payloads (one metric per field). Each reading updates
+    a window for its device and one for its group and device type. Every
+    ``publish_interval`` seconds, each window that received samples since the
+    last rollup is published as JSON on::
+
+        home/<group>/<type>/<device>/<metric>/stats    (per device)
+        home/<group>/<type>/all/<metric>/stats         (per group)
+    """
+
+    def __init__(
+        self,
+        mqtt_manager: Any,
+        window: int = 60,
+        publish_interval: float = 10.0,
+        percentiles: Sequence[float] = (50, 90, 99),
+    ) -> None:
+        """
+        Initializes an aggregator with no windows.
+
+        Args:
+            mqtt_manager: Manager used to subscribe and to publish rollups.
+            window (int): Samples kept per device and per group.
+            publish_interval (float): Seconds between rollups.
+            percentiles (Sequence[float]): Percentile ranks included in each rollup.
+        """
+        self.mqtt_manager = mqtt_manager
+        self.window = window
+        self.publish_interval = publish_interval
+        self.percentiles = tuple(percentiles)
+        self.windows: Dict[WindowKey, SlidingWindow] = {}
+        self._changed: Dict[WindowKey, SlidingWindow] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def attach(self, topic_filter: str = "home/#") -> None:
+        """
+        Subscribes the aggregator to readings matching `topic_filter`.
+        """
+        self.mqtt_manager.subscribe(topic_filter, self.on_message, with_topic=True)
+
+    def on_message(self, topic: str, payload: Any) -> None:
+        """
+        Subscriber action: adds the numeric readings in a message to their windows.
+        """
+        levels = topic.split("/")
+        if len(levels) < 5 or levels[-1] == STATS_SUFFIX:
+            return  # Not a device reading, or one of our own rollups
+        _, group, device_type, device_id, metric = levels[:5]
+        if isinstance(payload, dict):
+            readings = [
+                (field, value)
+                for field, value in payload.items()
+                if field not in ("timestamp", "schema")
+            ]
+        else:
+            readings = [(metric, payload)]
+        for metric, value in readings:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue  # States such as "OPEN" have no numeric summary
+            self.add(group, device_type, device_id, metric, value)
+
+    def add(
+        self, group: str, device_type: str, device_id: str, metric: str, value: float
+    ) -> None:
+        """
+        Adds one reading to its device window and its group window.
+        """
+        with self._lock:
+            for key in (
+                (group, device_type, device_id, metric),
+                (group, device_type, GROUP_DEVICE, metric),
+            ):
+                window = self.windows.get(key)
+                if window is None:
+                    window = self.windows[key] = SlidingWindow(self.window)
+                window.add(value)
+                self._changed[key] = window
+
+    def rollups(self) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        Returns (topic, summary) for every window changed since the last call.
+        """
+        with self._lock:
+            changed, self._changed = self._changed, {}
+            return [
+                (
+                    f"home/{group}/{device_type}/{device_id}/{metric}/{STATS_SUFFIX}",
+                    window.summary(self.percentiles),
+                )
+                for (group, device_type, device_id, metric), window in changed.items()
+            ]
+
+    def publish_rollups(self) -> int:
+        """
+        Publishes the changed windows' summaries.
+
+        Returns:
+            int: The number of rollups published.
+        """
+        rollups = self.rollups()
+        for topic, summary in rollups:
+            self.mqtt_manager.publish(topic, json.dumps(summary))
+        get_sink().debug("Published %d rollups.", len(rollups))
+        return len(rollups)
+
+    def start(self) -> None:
+        """
+        Starts publishing rollups every ``publish_interval`` seconds.
+        """
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="rolling-aggregates", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the rollup thread.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.publish_interval):
+            self.publish_rollups()
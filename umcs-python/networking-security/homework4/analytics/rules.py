@@ -0,0 +1,225 @@
+import operator
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from output.output_sink import get_sink
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+_CONDITION = re.compile(r"^(\S+)\s*(==|!=|<=|>=|<|>)\s*(\S+)$")
+_ACTION = re.compile(r"^publish\s+(\S+)\s+(.+)$")
+
+
+def _compile_predicate(op: str, literal: str) -> Callable[[Any], bool]:
+    """
+    Builds a test of a payload against a literal.
+
+    Literals that parse as numbers compare numerically; anything else compares as text.
+    """
+    compare = _OPERATORS[op]
+    try:
+        number = float(literal)
+    except ValueError:
+        return lambda value: compare(str(value), literal)
+
+    def numeric(value: Any) -> bool:
+        try:
+            return compare(float(value), number)
+        except (TypeError, ValueError):
+            return False
+
+    return numeric
+
+
+class Condition:
+    """
+    A test on the latest payload of one topic, e.g. ``<topic> == OPEN``.
+    """
+
+    __slots__ = ("topic", "op", "literal", "test")
+
+    def __init__(self, topic: str, op: str, literal: str) -> None:
+        if "+" in topic or "#" in topic:
+            raise ValueError(f"Rule conditions need a concrete topic: {topic}")
+        if op not in _OPERATORS:
+            raise ValueError(f"Unknown operator '{op}'")
+        self.topic = topic
+        self.op = op
+        self.literal = literal
+        self.test = _compile_predicate(op, literal)
+
+    def __repr__(self) -> str:
+        return f"{self.topic} {self.op} {self.literal}"
+
+
+class Rule:
+    """
+    Publishes messages when all of its conditions hold.
+
+    A rule fires when its conditions become true and not again until one of
+    them has been false in between, so a steady state does not republish on
+    every message.
+    """
+
+    __slots__ = ("name", "conditions", "actions", "active", "fired")
+
+    def __init__(
+        self,
+        name: str,
+        conditions: Iterable[Condition],
+        actions: Iterable[Tuple[str, str]],
+    ) -> None:
+        """
+        Args:
+            name (str): Identifies the rule in logs.
+            conditions (Iterable[Condition]): All must hold for the rule to fire.
+            actions (Iterable[Tuple[str, str]]): (topic, payload) pairs to publish.
+        """
+        self.name = name
+        self.conditions = tuple(conditions)
+        self.actions = tuple(actions)
+        if not self.conditions or not self.actions:
+            raise ValueError(f"Rule '{name}' needs at least one condition and action.")
+        self.active = False
+        self.fired = 0
+
+    @classmethod
+    def parse(cls, text: str, name: Optional[str] = None) -> "Rule":
+        """
+        Parses a rule written as::
+
+            if <topic> <op> <value> [and ...] then publish <topic> <payload> [, publish ...]
+
+        where <op> is one of ==, !=, <, <=, >, >=.
+
+        Raises:
+            ValueError: If the text does not follow that form.
+        """
+        match = re.match(r"^\s*if\s+(.+?)\s+then\s+(.+?)\s*$", text)
+        if match is None:
+            raise ValueError(f"Rules look like 'if ... then publish ...': {text!r}")
+        conditions = []
+        for part in re.split(r"\s+and\s+", match.group(1)):
+            condition = _CONDITION.match(part.strip())
+            if condition is None:
+                raise ValueError(f"Bad condition {part!r} in rule {text!r}")
+            conditions.append(Condition(*condition.groups()))
+        actions = []
+        for part in match.group(2).split(","):
+            action = _ACTION.match(part.strip())
+            if action is None:
+                raise ValueError(f"Bad action {part!r} in rule {text!r}")
+            actions.append((action.group(1), action.group(2).strip()))
+        return cls(name or text.strip(), conditions, actions)
+
+
+class RuleEngine:
+    """
+    Evaluates rules against incoming messages using a dependency index.
+
+    Adding a rule records it under each topic its conditions read. A message
+    only looks up its own topic in that index and evaluates the rules listed
+    there, so its cost depends on how many rules read that topic, not on the
+    total number of rules. The latest payload of every indexed topic is kept
+    so conditions on other topics can be checked without waiting for them.
+    """
+
+    def __init__(self, mqtt_manager: Any) -> None:
+        """
+        Args:
+            mqtt_manager: Manager used to subscribe and to publish rule actions.
+        """
+        self.mqtt_manager = mqtt_manager
+        self.rules: List[Rule] = []
+        self._index: Dict[str, List[Rule]] = {}
+        self._latest: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.evaluated: int = 0
+        self.fired: int = 0
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def add_rule(self, rule: Rule) -> None:
+        """
+        Adds a rule and indexes it under the topics it depends on.
+        """
+        with self._lock:
+            self.rules.append(rule)
+            for topic in {condition.topic for condition in rule.conditions}:
+                self._index.setdefault(topic, []).append(rule)
+
+    def load(self, lines: Iterable[str]) -> int:
+        """
+        Adds one rule per non-empty line, skipping lines starting with '#'.
+
+        Returns:
+            int: The number of rules added.
+        """
+        added = 0
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                self.add_rule(Rule.parse(line, name=f"rule {number}"))
+                added += 1
+        return added
+
+    def attach(self, topic_filter: str = "home/#") -> None:
+        """
+        Subscribes the engine to messages matching `topic_filter`.
+        """
+        self.mqtt_manager.subscribe(topic_filter, self.on_message, with_topic=True)
+
+    def on_message(self, topic: str, payload: Any) -> None:
+        """
+        Subscriber action: records the payload and evaluates the rules that read it.
+
+        Fields of packed payloads are addressed as ``<topic>/<field>``.
+        """
+        if isinstance(payload, dict):
+            updates = [
+                (f"{topic}/{field}", value)
+                for field, value in payload.items()
+                if field not in ("timestamp", "schema")
+            ]
+        else:
+            updates = [(topic, payload)]
+
+        to_fire: List[Rule] = []
+        with self._lock:
+            for key, value in updates:
+                rules = self._index.get(key)
+                if rules is None:
+                    continue  # No rule reads this topic
+                self._latest[key] = value
+                for rule in rules:
+                    self.evaluated += 1
+                    if self._holds(rule):
+                        if not rule.active:
+                            rule.active = True
+                            rule.fired += 1
+                            self.fired += 1
+                            to_fire.append(rule)
+                    else:
+                        rule.active = False
+        # Publish outside the lock: the actions may loop back into on_message.
+        for rule in to_fire:
+            get_sink().debug("Rule fired: %s", rule.name)
+            for action_topic, action_payload in rule.actions:
+                self.mqtt_manager.publish(action_topic, action_payload)
+
+    def _holds(self, rule: Rule) -> bool:
+        latest = self._latest
+        for condition in rule.conditions:
+            value = latest.get(condition.topic)
+            if value is None or not condition.test(value):
+                return False
+        return True
@@ -0,0 +1,55 @@
+"""
+Measures memory used per simulated device (device + simulation object).
+
+Run from the homework4 directory:
+    python -m benchmarks.device_memory --count 100000
+"""
+
+import argparse
+import tracemalloc
+
+from devices.device_type import DeviceType
+from simulation.fleet import FleetEntry, FleetSpec
+from simulation.simulation_controller import SimulationController
+
+
+def measure(device_name, count):
+    """
+    Build `count` devices of one type and return the traced bytes per device.
+
+    Args:
+        device_name (str): A DeviceType value.
+        count (int): Number of devices to build.
+
+    Returns:
+        float: Average bytes allocated per device and its simulation.
+    """
+    fleet = FleetSpec([FleetEntry(device_name, count, groups=("g0", "g1", "g2", "g3"))])
+    controller = SimulationController(mqtt_manager=None, fleet=fleet)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    simulations = controller.build_simulations()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del simulations
+    return allocated / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000, help="devices per type")
+    args = parser.parse_args()
+
+    print(f"{'Device type':<16} {'bytes/device':>14} {'MiB per 1M':>12}")
+    for name in DeviceType.list():
+        if name == DeviceType.ALL_DEVICES.value:
+            continue
+        per_device = measure(name, args.count)
+        print(f"{name:<16} {per_device:>14.1f} {per_device * 1e6 / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Benchmarks the broker and simulation stack against the in-process loopback broker.
+
+Run from the homework4 directory:
+    python -m benchmarks.suite --save             # record a baseline
+    python -m benchmarks.suite                    # compare against it
+
+Every benchmark reports a cost where lower is better (time or bytes per unit).
+Timings are the best of ``--repeat`` samples. Results more than ``--tolerance``
+above the baseline are flagged as regressions and make the run exit with
+status 1, so the suite can gate a change. Baselines are machine specific:
+record one on the machine that compares against it.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from logging import WARNING
+
+from broker.loopback_broker import LoopbackBroker, LoopbackClient, LoopbackMessage
+from broker.message_manager import MessageHandler
+from broker.mqtt_manager import MQTTManager
+from devices.device_type import DeviceType
+from output.output_sink import PrintSink, set_sink
+from simulation.fleet import FleetEntry, FleetSpec
+from simulation.simulation_controller import SimulationController
+
+from .device_memory import measure as measure_device_memory
+from .topic_building import NullManager
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Device types simulated by the tick benchmark, with equal counts of each.
+TICK_TYPES = ("Door Sensor", "Indoor Sensor", "Light Switch")
+
+
+def time_per_unit(body, units, repeat, min_time=0.2):
+    """
+    Return the best nanoseconds per unit over `repeat` samples of `body`.
+
+    `body` performs `units` operations per call. Like asv and pytest-benchmark,
+    each sample calls it often enough to last at least `min_time` seconds, so
+    short benchmarks are not dominated by timer resolution and scheduling noise.
+    """
+    start = time.perf_counter()
+    body()
+    once = time.perf_counter() - start
+    number = max(1, int(min_time / once) + 1) if once > 0 else 1000
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            body()
+        elapsed = (time.perf_counter() - start) / (number * units) * 1e9
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def dispatch(subscriptions, messages=5000, repeat=5):
+    """
+    Time MessageHandler.handle_message with many subscriptions registered.
+
+    Half of the filters are exact device topics and half use wildcards, spread
+    over groups as a fleet's subscribers would be; each message matches one
+    exact filter and one wildcard filter.
+
+    Returns:
+        float: Nanoseconds per dispatched message.
+    """
+    handler = MessageHandler()
+    received = [0]
+
+    def action(payload):
+        received[0] += 1
+
+    for i in range(subscriptions // 2):
+        handler.register_action(f"home/g{i % 50}/door_sensor/d{i}/state/update", action)
+        handler.register_action(f"home/g{i % 50}/+/d{i}/#", action)
+    topics = [
+        f"home/g{i % 50}/door_sensor/d{i}/state/update"
+        for i in range(max(1, subscriptions // 2))
+    ]
+    batch = [
+        LoopbackMessage(topics[i % len(topics)], b"OPEN", 0, False, i)
+        for i in range(messages)
+    ]
+
+    def run():
+        handle = handler.handle_message
+        for message in batch:
+            handle(None, None, message)
+
+    return time_per_unit(run, messages, repeat)
+
+
+def publish(payload_size, messages=5000, repeat=5):
+    """
+    Time publishing through MQTTManager until a subscriber has every message.
+
+    The manager both publishes and subscribes over a private loopback broker,
+    so the cost covers the publish call, routing, queueing and dispatch.
+
+    Returns:
+        float: Nanoseconds per delivered message.
+    """
+    client = LoopbackClient(broker=LoopbackBroker(max_queued=messages * 2))
+    manager = MQTTManager(broker="loopback", client=client)
+    manager.connect()
+    delivered = threading.Semaphore(0)
+
+    def action(payload):
+        delivered.release()
+
+    manager.subscribe("bench/#", action)
+    manager.start()
+    payload = b"x" * payload_size
+    topics = [f"bench/device/{i}" for i in range(100)]
+
+    def run():
+        for i in range(messages):
+            manager.publish(topics[i % 100], payload)
+        for _ in range(messages):
+            delivered.acquire()
+
+    try:
+        return time_per_unit(run, messages, repeat)
+    finally:
+        manager.stop()
+
+
+def tick(devices, repeat=5):
+    """
+    Time one simulation step of every device in a mixed fleet.
+
+    Returns:
+        float: Nanoseconds per device step.
+    """
+    per_type = max(1, devices // len(TICK_TYPES))
+    fleet = FleetSpec(
+        [FleetEntry(name, per_type, groups=("g0", "g1")) for name in TICK_TYPES]
+    )
+    simulations = SimulationController(NullManager(), fleet=fleet).build_simulations()
+
+    def run():
+        for simulation in simulations:
+            simulation.simulate_step()
+
+    return time_per_unit(run, len(simulations), repeat)
+
+
+def benchmarks(quick=False, repeat=5):
+    """
+    Return (name, unit, callable) for every benchmark in the suite.
+
+    Args:
+        quick (bool): Use smaller sizes, for a fast smoke run.
+        repeat (int): Runs per timing benchmark; the best one counts.
+    """
+    subscription_counts = (10, 1000) if quick else (10, 1000, 10000)
+    payload_sizes = (16, 1024) if quick else (16, 256, 4096, 65536)
+    fleet_sizes = (300, 3000) if quick else (300, 3000, 30000)
+    memory_count = 2000 if quick else 20000
+    suite = []
+    for count in subscription_counts:
+        suite.append(
+            (
+                f"dispatch[subs={count}]",
+                "ns/msg",
+                lambda c=count: dispatch(c, repeat=repeat),
+            )
+        )
+    for size in payload_sizes:
+        suite.append(
+            (
+                f"publish[bytes={size}]",
+                "ns/msg",
+                lambda s=size: publish(s, repeat=repeat),
+            )
+        )
+    for size in fleet_sizes:
+        suite.append(
+            (
+                f"tick[devices={size}]",
+                "ns/device",
+                lambda s=size: tick(s, repeat=repeat),
+            )
+        )
+    for name in DeviceType.list():
+        if name != DeviceType.ALL_DEVICES.value:
+            suite.append(
+                (
+                    f"memory[{name}]",
+                    "B/device",
+                    lambda n=name: measure_device_memory(n, memory_count),
+                )
+            )
+    return suite
+
+
+def load_baseline(path):
+    """Return the saved results, or an empty dict if there are none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)["results"]
+
+
+def save_baseline(path, results):
+    """Write results as the baseline."""
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "python": sys.version.split()[0],
+                "saved": time.time(),
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+
+
+def compare(name, value, baseline, tolerance):
+    """
+    Return a status for one result: 'new', 'ok', 'faster' or 'REGRESSION'.
+    """
+    previous = baseline.get(name)
+    if previous is None:
+        return "new", ""
+    change = value / previous["value"] - 1.0 if previous["value"] else 0.0
+    if change > tolerance:
+        status = "REGRESSION"
+    elif change < -tolerance:
+        status = "faster"
+    else:
+        status = "ok"
+    return status, f"{change:+.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file")
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="fraction above the baseline that counts as a regression",
+    )
+    parser.add_argument("--filter", default="", help="run benchmarks containing this")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes")
+    args = parser.parse_args()
+
+    set_sink(PrintSink(level=WARNING))
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = 0
+    print(f"{'Benchmark':<32} {'result':>14} {'unit':<10} {'vs baseline':>12}")
+    for name, unit, run in benchmarks(args.quick, args.repeat):
+        if args.filter not in name:
+            continue
+        value = run()
+        results[name] = {"value": value, "unit": unit}
+        status, change = compare(name, value, baseline, args.tolerance)
+        regressions += status == "REGRESSION"
+        print(f"{name:<32} {value:>14.1f} {unit:<10} {change:>12} {status}")
+
+    if args.save:
+        # Benchmarks left out by --filter keep their previous baseline.
+        save_baseline(args.baseline, dict(baseline, **results))
+        print(f"Saved {len(results)} results to {args.baseline}")
+    elif regressions:
+        print(f"{regressions} regression(s) over {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compares building a topic per publish with using precomputed, interned topics.
+
+Both paths publish through MQTTManager.publish (including its sys.intern call)
+into a private loopback broker with no subscribers. Time is measured on its
+own; allocation is measured separately with tracemalloc, as the peak memory
+each publish allocates on top of what was live before it.
+
+Run from the homework4 directory:
+    python -m benchmarks.topic_building --publishes 100000
+"""
+
+import argparse
+import time
+import tracemalloc
+from logging import WARNING
+
+from broker.loopback_broker import LoopbackBroker, LoopbackClient
+from broker.mqtt_manager import MQTTManager
+from output.output_sink import PrintSink, set_sink
+from simulation.fleet import FleetEntry, FleetSpec
+from simulation.simulation_controller import SimulationController
+
+
+class NullManager:
+    """Stands in for MQTTManager and discards every publish."""
+
+    def publish(self, topic, message):
+        pass
+
+
+def loopback_manager():
+    """Return an MQTTManager connected to a private loopback broker."""
+    manager = MQTTManager(
+        broker="loopback", client=LoopbackClient(broker=LoopbackBroker())
+    )
+    manager.connect()
+    return manager
+
+
+def rebuilt_topics(manager, simulations):
+    """Return a publish that formats the topic every time, as the simulations used to."""
+    count = len(simulations)
+
+    def publish(i):
+        device = simulations[i % count].device
+        manager.publish(
+            f"home/{device.group_id}/{device.device_type}/{device.device_id}/state/update",
+            "OPEN",
+        )
+
+    return publish
+
+
+def precomputed_topics(manager, simulations):
+    """Return a publish that reuses the topic each simulation computed at construction."""
+    count = len(simulations)
+
+    def publish(i):
+        manager.publish(simulations[i % count].state_topic, "OPEN")
+
+    return publish
+
+
+def time_publishes(publish, publishes):
+    """Return the seconds taken by `publishes` calls of `publish`."""
+    start = time.perf_counter()
+    for i in range(publishes):
+        publish(i)
+    return time.perf_counter() - start
+
+
+def allocated_per_publish(publish, samples):
+    """
+    Return the mean bytes allocated by one call of `publish`, over `samples` calls.
+
+    Temporaries such as a formatted topic are freed before the next call, so
+    each call is measured as its tracemalloc peak above the memory live before it.
+    """
+    for i in range(samples):
+        publish(i)  # Warm up: intern topics and fill caches first
+    tracemalloc.start()
+    total = 0
+    try:
+        for i in range(samples):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            publish(i)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--publishes", type=int, default=100000)
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument(
+        "--samples", type=int, default=20000, help="publishes traced for allocation"
+    )
+    args = parser.parse_args()
+
+    set_sink(PrintSink(level=WARNING))
+    fleet = FleetSpec(
+        [FleetEntry("Door Sensor", args.devices, groups=("floor1", "floor2"))]
+    )
+    controller = SimulationController(NullManager(), fleet=fleet)
+    simulations = controller.build_simulations()
+    manager = loopback_manager()
+
+    print(f"{args.publishes} publishes across {args.devices} devices")
+    for name, build in (
+        ("rebuilt", rebuilt_topics),
+        ("precomputed", precomputed_topics),
+    ):
+        publish = build(manager, simulations)
+        elapsed = time_publishes(publish, args.publishes)
+        per_publish = allocated_per_publish(publish, args.samples)
+        print(
+            f"{name:<12} {elapsed / args.publishes * 1e9:8.1f} ns/publish  "
+            f"{per_publish:6.1f} B allocated/publish  "
+            f"{per_publish * 100000 / 2**20:6.2f} MiB/s at 100k publishes/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
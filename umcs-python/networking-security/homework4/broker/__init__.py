@@ -1,9 +1,34 @@
 # broker/__init__.py
 
 from .mqtt_manager import MQTTManager
+from .async_mqtt_manager import AsyncMQTTManager
+from .client_pool import PooledMQTTManager
+from .keyed_executor import KeyedExecutor
+from .loopback_broker import LoopbackBroker, LoopbackClient
 from .message_manager import MessageHandler
+from .metrics import MetricsDump, MetricsRegistry, MetricsServer
+from .retained_snapshot import RetainedSnapshot
+from .payload_codec import (
+    decode_payload,
+    encode_payload,
+    trace_payload,
+    untrace_payload,
+)
 
 __all__ = [
     "MQTTManager",
+    "AsyncMQTTManager",
+    "PooledMQTTManager",
+    "KeyedExecutor",
+    "LoopbackBroker",
+    "LoopbackClient",
     "MessageHandler",
+    "MetricsDump",
+    "MetricsRegistry",
+    "MetricsServer",
+    "RetainedSnapshot",
+    "decode_payload",
+    "encode_payload",
+    "trace_payload",
+    "untrace_payload",
 ]
@@ -0,0 +1,185 @@
+import asyncio
+from typing import Any, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+from output.output_sink import get_sink
+
+from .mqtt_manager import MQTTManager
+
+
+class AsyncMQTTManager(MQTTManager):
+    """
+    MQTTManager with a bounded, asyncio-driven outbound publish pipeline.
+
+    The synchronous ``start``, ``publish`` and ``stop`` behave exactly as in
+    MQTTManager. ``start_async`` additionally starts the pipeline on the running
+    event loop; ``publish_async`` then only enqueues the message, and a
+    background flusher task drains the queue in batches through the same path
+    as MQTTManager.publish, so coalescing, snapshots, trace stamps and publish
+    metrics apply unchanged. When the queue is full, ``publish_async`` waits, so
+    fast producers are slowed down instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        broker: Optional[str] = None,
+        port: int = 1883,
+        client: Optional[mqtt.Client] = None,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        coalesce_window: Optional[float] = None,
+        dispatch_workers: int = 0,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = 5.0,
+        trace: bool = False,
+    ) -> None:
+        """
+        Initializes the manager and the publish pipeline settings.
+
+        Args:
+            broker (Optional[str]): Broker address; prompts the user when omitted.
+            port (int): Broker port.
+            client (Optional[mqtt.Client]): Client to use instead of creating one.
+            max_queue_size (int): Maximum number of messages waiting to be flushed.
+            batch_size (int): Maximum number of messages flushed before yielding to the event loop.
+            coalesce_window (Optional[float]): Seconds to buffer publishes for,
+                keeping only the latest message per topic; None sends immediately.
+            dispatch_workers (int): Threads that run subscription actions, keeping
+                per-topic order; 0 runs them on the network thread.
+            snapshot_path (Optional[str]): File holding the last payload per topic,
+                replayed as retained messages on start.
+            snapshot_interval (float): Seconds between snapshot saves.
+            trace (bool): Stamp payloads with their send time and sequence number.
+        """
+        super().__init__(
+            broker,
+            port,
+            client,
+            coalesce_window,
+            dispatch_workers,
+            snapshot_path,
+            snapshot_interval,
+            trace,
+        )
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.dropped_count: int = 0
+        self.failed_count: int = 0
+        self._queue: Optional["asyncio.Queue[Tuple[str, Any]]"] = None
+        self._flusher: Optional["asyncio.Task[None]"] = None
+        self.metrics.gauge(
+            "mqtt_async_queue_depth",
+            "Messages waiting in the outbound publish queue.",
+            self.queue_depth,
+        )
+        self.metrics.counter_func(
+            "mqtt_async_dropped_total",
+            "Messages dropped by publish_nowait because the queue was full.",
+            lambda: self.dropped_count,
+        )
+        self.metrics.counter_func(
+            "mqtt_async_failed_total",
+            "Messages the flusher failed to hand to the client.",
+            lambda: self.failed_count,
+        )
+
+    async def start_async(self) -> None:
+        """
+        Starts the background flusher task on the running event loop.
+
+        The network loop is started separately, by ``start``.
+        """
+        # The queue must be created on the running event loop.
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._flusher = asyncio.create_task(self._flush())
+
+    async def publish_async(self, topic: str, message: Any) -> None:
+        """
+        Enqueues a message, waiting while the outbound queue is full.
+
+        Args:
+            topic (str): The MQTT topic to publish to.
+            message (Any): The message payload.
+        """
+        await self._pipeline().put((topic, message))
+
+    def publish_nowait(self, topic: str, message: Any) -> bool:
+        """
+        Enqueues a message without waiting, dropping it if the queue is full.
+
+        Args:
+            topic (str): The MQTT topic to publish to.
+            message (Any): The message payload.
+
+        Returns:
+            bool: True if the message was enqueued.
+        """
+        try:
+            self._pipeline().put_nowait((topic, message))
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            return False
+        return True
+
+    def queue_depth(self) -> int:
+        """
+        Returns the number of messages waiting to be flushed.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def flush_async(self) -> None:
+        """
+        Waits until every enqueued message has been handed to the client.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop_async(self) -> None:
+        """
+        Flushes pending messages and stops the flusher task.
+
+        The connection stays open until ``stop`` is called.
+        """
+        await self.flush_async()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        self._queue = None
+
+    def _pipeline(self) -> "asyncio.Queue[Tuple[str, Any]]":
+        if self._queue is None:
+            raise RuntimeError(
+                "AsyncMQTTManager.start_async() must be awaited before publishing."
+            )
+        return self._queue
+
+    async def _flush(self) -> None:
+        """
+        Drains the outbound queue into the paho client in batches.
+        """
+        queue = self._pipeline()
+        publish = self._publish
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            for topic, message in batch:
+                try:
+                    # paho reports a lost connection or a full queue through rc.
+                    if not publish(topic, message):
+                        self.failed_count += 1
+                except Exception as e:
+                    self.failed_count += 1
+                    get_sink().error("Failed to publish to %s: %s", topic, e)
+            for _ in batch:
+                queue.task_done()
+            # Let producers refill the queue before the next batch.
+            await asyncio.sleep(0)
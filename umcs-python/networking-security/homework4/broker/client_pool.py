@@ -0,0 +1,440 @@
+import bisect
+import hashlib
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import paho.mqtt.client as mqtt
+
+from output.output_sink import get_sink
+
+from .loopback_broker import LoopbackClient
+from .mqtt_manager import LOOPBACK_BROKER, MQTTManager
+
+# Topics are home/<group>/<type>/<id>/...; the first four levels name the device.
+DEVICE_TOPIC_LEVELS = 4
+
+
+def device_key(topic: str) -> str:
+    """
+    Returns the part of a topic that identifies the device publishing it.
+
+    All topics of one device hash to the same client, so its messages stay in order.
+    """
+    return "/".join(topic.split("/", DEVICE_TOPIC_LEVELS)[:DEVICE_TOPIC_LEVELS])
+
+
+class ConsistentHashRing:
+    """
+    Maps keys to nodes so that adding or removing a node only moves the keys
+    that hashed to it.
+
+    Every node is placed on the ring ``replicas`` times to even out the load.
+    """
+
+    def __init__(self, nodes: Iterable[int], replicas: int = 160) -> None:
+        """
+        Builds the ring.
+
+        Args:
+            nodes (Iterable[int]): Node identifiers, e.g. client indices.
+            replicas (int): Number of virtual points per node.
+        """
+        points = sorted(
+            (self._hash(f"{node}:{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        if not points:
+            raise ValueError("A hash ring needs at least one node.")
+        self._hashes: List[int] = [point for point, _ in points]
+        self._nodes: List[int] = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key: str) -> int:
+        """
+        Returns the node owning a key: the first ring point at or after its hash.
+        """
+        index = bisect.bisect_left(self._hashes, self._hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class PooledClient:
+    """
+    One connection of a PooledMQTTManager and its counters.
+
+    ``sent`` is only updated by the publishing thread and ``acked`` only by the
+    client's network thread, so their difference is the number of messages still
+    waiting to be written (QoS 0) or acknowledged (QoS 1 and 2) without locking.
+
+    paho discards unwritten QoS 0 messages when it reconnects, without calling
+    ``on_publish`` for them, so each (re)connect moves the outstanding count to
+    ``lost`` and restarts both counters from zero (see ``reset_outstanding``).
+    """
+
+    __slots__ = (
+        "index",
+        "client",
+        "connected",
+        "connections",
+        "sent",
+        "acked",
+        "shed",
+        "lost",
+    )
+
+    def __init__(self, index: int, client: mqtt.Client) -> None:
+        self.index = index
+        self.client = client
+        self.connected: bool = False
+        self.connections: int = 0
+        self.sent: int = 0
+        self.acked: int = 0
+        self.shed: int = 0
+        self.lost: int = 0
+
+    @property
+    def outstanding(self) -> int:
+        return self.sent - self.acked
+
+    def reset_outstanding(self) -> int:
+        """
+        Counts the messages still outstanding as lost and zeroes both counters.
+
+        Called from the network thread on connect. A publish racing with the
+        reset may be miscounted by one, which is preferable to a leftover count
+        that would keep the client shedding for the rest of the run.
+
+        Returns:
+            int: The number of messages counted as lost.
+        """
+        lost = max(0, self.sent - self.acked)
+        self.lost += lost
+        self.sent = self.acked = 0
+        return lost
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "client": self.index,
+            "connected": self.connected,
+            "reconnects": max(0, self.connections - 1),
+            "sent": self.sent,
+            "outstanding": self.outstanding,
+            "shed": self.shed,
+            "lost": self.lost,
+        }
+
+
+class PooledMQTTManager(MQTTManager):
+    """
+    MQTTManager that spreads publishes over a pool of MQTT connections.
+
+    Device topics are assigned to clients with a consistent hash, so each device
+    always publishes through the same connection and keeps its message order.
+    Every client caps the messages it has outstanding; once a slow connection
+    reaches the cap its publishes are shed and counted instead of queueing without
+    bound, while the other clients carry on. Each client reconnects on its own
+    with exponential backoff between ``min_reconnect_delay`` and
+    ``max_reconnect_delay`` seconds. Subscriptions use the first client and are
+    restored whenever it reconnects.
+    """
+
+    def __init__(
+        self,
+        broker: Optional[str] = None,
+        port: int = 1883,
+        pool_size: int = 4,
+        max_inflight: int = 20,
+        max_outstanding: int = 1000,
+        min_reconnect_delay: int = 1,
+        max_reconnect_delay: int = 60,
+        client_factory: Optional[Callable[[], mqtt.Client]] = None,
+        coalesce_window: Optional[float] = None,
+        dispatch_workers: int = 0,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = 5.0,
+        trace: bool = False,
+    ) -> None:
+        """
+        Initializes the pool configuration and creates its clients.
+
+        Args:
+            broker (Optional[str]): Broker address; prompts the user when omitted.
+            port (int): Broker port.
+            pool_size (int): Number of MQTT connections.
+            max_inflight (int): Per-client limit of unacknowledged QoS 1/2 messages.
+            max_outstanding (int): Per-client limit of messages not yet written or
+                acknowledged; publishes beyond it are shed.
+            min_reconnect_delay (int): First reconnect delay in seconds.
+            max_reconnect_delay (int): Upper bound of the doubling reconnect delay.
+            client_factory (Optional[Callable[[], mqtt.Client]]): Creates each client.
+            coalesce_window (Optional[float]): Seconds to buffer publishes for,
+                keeping only the latest message per topic; None sends immediately.
+            dispatch_workers (int): Threads that run subscription actions, keeping
+                per-topic order; 0 runs them on the network thread.
+            snapshot_path (Optional[str]): File holding the last payload per topic,
+                replayed as retained messages as the clients connect; live
+                messages are then published retained as well.
+            snapshot_interval (float): Seconds between snapshot saves.
+            trace (bool): Stamp payloads with their send time and sequence number.
+        """
+        if pool_size < 1:
+            raise ValueError(f"Pool size must be at least 1: {pool_size}")
+        super().__init__(
+            broker,
+            port,
+            client_factory() if client_factory else None,
+            coalesce_window,
+            dispatch_workers,
+            snapshot_path,
+            snapshot_interval,
+            trace,
+        )
+        if client_factory is None:
+            client_factory = (
+                LoopbackClient if self.broker == LOOPBACK_BROKER else mqtt.Client
+            )
+        self.max_inflight = max_inflight
+        self.max_outstanding = max_outstanding
+        self.min_reconnect_delay = min_reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        # The client created by MQTTManager is the first in the pool.
+        self.pool: List[PooledClient] = [PooledClient(0, self.client)] + [
+            PooledClient(index, client_factory()) for index in range(1, pool_size)
+        ]
+        self._ring = ConsistentHashRing(range(pool_size))
+        self._assignments: Dict[str, PooledClient] = {}
+        self._subscriptions: List[str] = []
+        self.metrics.counter_func(
+            "mqtt_shed_total", "Publishes shed by the pool.", lambda: self.shed_count
+        )
+        self.metrics.counter_func(
+            "mqtt_lost_total",
+            "Messages discarded unsent when a pooled client reconnected.",
+            lambda: self.lost_count,
+        )
+        for pooled in self.pool:
+            labels = {"client": str(pooled.index)}
+            self.metrics.gauge(
+                "mqtt_client_outstanding",
+                "Messages sent and not yet acknowledged, per pooled client.",
+                lambda pooled=pooled: pooled.outstanding,
+                labels,
+            )
+            self.metrics.gauge(
+                "mqtt_client_connected",
+                "1 while the pooled client is connected.",
+                lambda pooled=pooled: int(pooled.connected),
+                labels,
+            )
+
+    def client_for(self, topic: str) -> PooledClient:
+        """
+        Returns the pooled client that publishes a topic.
+        """
+        pooled = self._assignments.get(topic)
+        if pooled is None:
+            pooled = self.pool[self._ring.node_for(device_key(topic))]
+            self._assignments[sys.intern(topic)] = pooled
+        return pooled
+
+    def connect(self) -> None:
+        """
+        Configures every client and starts connecting in the background.
+
+        Connection attempts (and later reconnects) are made by each client's network
+        loop, so an unreachable broker does not block start-up. The snapshot is
+        loaded first, ready to be replayed as each client connects.
+        """
+        self.load_snapshot()
+        for pooled in self.pool:
+            client = pooled.client
+            client.max_inflight_messages_set(self.max_inflight)
+            client.max_queued_messages_set(self.max_outstanding)
+            client.reconnect_delay_set(
+                self.min_reconnect_delay, self.max_reconnect_delay
+            )
+            client.on_connect = self._on_connect_callback(pooled)
+            client.on_disconnect = self._on_disconnect_callback(pooled)
+            client.on_publish = self._on_publish_callback(pooled)
+            try:
+                client.connect_async(self.broker, self.port)
+            except Exception as e:
+                get_sink().error("Client %d failed to connect: %s", pooled.index, e)
+        get_sink().info(
+            "Connecting %d clients to MQTT broker at %s:%s",
+            len(self.pool),
+            self.broker,
+            self.port,
+        )
+
+    def _on_connect_callback(self, pooled: PooledClient) -> Callable[..., None]:
+        def on_connect(client: Any, userdata: Any, flags: Any, rc: int) -> None:
+            if rc != 0:
+                get_sink().warning(
+                    "Client %d connection refused: %s",
+                    pooled.index,
+                    mqtt.connack_string(rc),
+                )
+                return
+            pooled.connected = True
+            pooled.connections += 1
+            self._connections.inc()
+            # Whatever was still queued on the old connection was dropped by paho.
+            lost = pooled.reset_outstanding()
+            if pooled.connections > 1:
+                get_sink().info(
+                    "Client %d reconnected; %d unsent messages lost.",
+                    pooled.index,
+                    lost,
+                )
+            if pooled.index == 0:
+                for topic in self._subscriptions:
+                    client.subscribe(topic)
+            # Clients connect in the background, so each replays the snapshot
+            # topics it publishes once it is up rather than from start().
+            if pooled.connections == 1:
+                self._restore_assigned(pooled)
+
+        return on_connect
+
+    def _on_disconnect_callback(self, pooled: PooledClient) -> Callable[..., None]:
+        def on_disconnect(client: Any, userdata: Any, rc: int) -> None:
+            pooled.connected = False
+            if rc != 0:
+                self._disconnects.inc()
+                get_sink().warning(
+                    "Client %d lost its connection (rc=%s); reconnecting.",
+                    pooled.index,
+                    rc,
+                )
+
+        return on_disconnect
+
+    def _on_publish_callback(self, pooled: PooledClient) -> Callable[..., None]:
+        def on_publish(client: Any, userdata: Any, mid: int) -> None:
+            pooled.acked += 1
+
+        return on_publish
+
+    def subscribe(
+        self, topic: str, action: Callable[..., None], with_topic: bool = False
+    ) -> None:
+        """
+        Subscribes through the first client, remembering the topic for reconnects.
+
+        Args:
+            topic (str): The MQTT topic to subscribe to.
+            action (Callable[..., None]): The callback function to execute when a message is received.
+            with_topic (bool): Call the action as ``action(topic, payload)``.
+        """
+        super().subscribe(topic, action, with_topic)
+        if topic not in self._subscriptions:
+            self._subscriptions.append(sys.intern(topic))
+
+    def _restore_assigned(self, pooled: PooledClient) -> int:
+        """
+        Publishes, as retained messages, the loaded snapshot topics that a
+        client publishes, so each topic keeps using one connection.
+
+        Returns:
+            int: The number of topics published.
+        """
+        if self.snapshot is None:
+            return 0
+        published = 0
+        for topic, payload in self.snapshot.items():
+            if self.client_for(topic) is pooled:
+                published += self._send(topic, payload, retain=True)
+        if published:
+            get_sink().info(
+                "Client %d published %d retained topics from %s",
+                pooled.index,
+                published,
+                self.snapshot.path,
+            )
+        return published
+
+    def _send(self, topic: str, message: Any, retain: bool = False) -> bool:
+        """
+        Publishes a message through the client assigned to its device.
+
+        The message is shed if that client already has ``max_outstanding``
+        messages outstanding or the client rejects it.
+
+        Args:
+            topic (str): The MQTT topic to publish to.
+            message (Any): The message payload.
+            retain (bool): Ask the broker to keep the message for new subscribers.
+
+        Returns:
+            bool: False if the message was shed.
+        """
+        pooled = self.client_for(topic)
+        if self.trace:
+            # Stamp before shedding so receivers count shed messages as lost.
+            message = self._stamp(topic, message)
+        if pooled.sent - pooled.acked >= self.max_outstanding:
+            pooled.shed += 1
+            return False
+        started = time.perf_counter()
+        info = pooled.client.publish(topic, message, retain=retain)
+        self._publish_seconds.observe(time.perf_counter() - started)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self._publish_failures.inc()
+            pooled.shed += 1
+            return False
+        pooled.sent += 1
+        self.published_count += 1
+        get_sink().debug(
+            "Published to %s via client %d: %s", topic, pooled.index, message
+        )
+        return True
+
+    @property
+    def shed_count(self) -> int:
+        """
+        Returns the number of publishes shed across the pool.
+        """
+        return sum(pooled.shed for pooled in self.pool)
+
+    @property
+    def lost_count(self) -> int:
+        """
+        Returns the number of messages discarded by reconnects across the pool.
+        """
+        return sum(pooled.lost for pooled in self.pool)
+
+    def pool_stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns connection state and counters for every client in the pool.
+        """
+        return [pooled.stats() for pooled in self.pool]
+
+    def start(self) -> None:
+        """
+        Starts the network loop of every client.
+        """
+        for pooled in self.pool:
+            pooled.client.loop_start()
+        get_sink().info("MQTT loops started for %d clients.", len(self.pool))
+        self._start_background()
+
+    def stop(self) -> None:
+        """
+        Stops every client's network loop and disconnects it.
+        """
+        get_sink().info("Stopping %d MQTT clients...", len(self.pool))
+        self._stop_background()
+        for pooled in self.pool:
+            pooled.client.disconnect()
+            pooled.client.loop_stop()
+        self.message_handler.close()
+        get_sink().info(
+            "MQTT clients stopped; %d messages shed and %d lost to reconnects.",
+            self.shed_count,
+            self.lost_count,
+        )
@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from output.output_sink import get_sink
+
+# A queued call: (callable, arguments, time it was queued).
+_Task = Tuple[Callable[..., None], Tuple[Any, ...], float]
+
+
+class ExecutorStats:
+    """
+    Counters and timings collected by a KeyedExecutor.
+
+    ``wait`` is the time a task spent queued, ``run`` the time its callable took.
+    """
+
+    __slots__ = (
+        "submitted",
+        "completed",
+        "failed",
+        "dropped",
+        "max_depth",
+        "total_wait",
+        "max_wait",
+        "total_run",
+        "max_run",
+    )
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.submitted: int = 0
+        self.completed: int = 0
+        self.failed: int = 0
+        self.dropped: int = 0
+        self.max_depth: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+        self.total_run: float = 0.0
+        self.max_run: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the counters plus mean wait and run times in seconds.
+        """
+        done = self.completed + self.failed
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "max_depth": self.max_depth,
+            "mean_wait": self.total_wait / done if done else 0.0,
+            "max_wait": self.max_wait,
+            "mean_run": self.total_run / done if done else 0.0,
+            "max_run": self.max_run,
+        }
+
+
+class KeyedExecutor:
+    """
+    Runs callables on a fixed set of worker threads, serially per key.
+
+    Each key is hashed to one worker, and each worker runs its queue in order, so
+    tasks submitted with the same key (e.g. an MQTT topic) never run concurrently
+    or out of order, while different keys proceed in parallel. Every worker queue
+    holds at most ``max_backlog // workers`` tasks; ``submit`` never blocks and
+    drops the task instead when the key's queue is full.
+    """
+
+    def __init__(self, workers: int = 4, max_backlog: int = 10000) -> None:
+        """
+        Initializes the executor and starts its worker threads.
+
+        Args:
+            workers (int): Number of worker threads.
+            max_backlog (int): Maximum number of queued tasks across all workers.
+        """
+        if workers < 1:
+            raise ValueError(f"An executor needs at least one worker: {workers}")
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self.stats = ExecutorStats()
+        per_worker = max(1, max_backlog // workers)
+        self._queues: List["queue.Queue[Optional[_Task]]"] = [
+            queue.Queue(maxsize=per_worker) for _ in range(workers)
+        ]
+        self._stats_lock = threading.Lock()
+        self._threads: List[threading.Thread] = [
+            threading.Thread(
+                target=self._work,
+                args=(tasks,),
+                name=f"dispatch-{index}",
+                daemon=True,
+            )
+            for index, tasks in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _queue_for(self, key: str) -> "queue.Queue[Optional[_Task]]":
+        return self._queues[zlib.crc32(key.encode("utf-8")) % self.workers]
+
+    def submit(self, key: str, function: Callable[..., None], *args: Any) -> bool:
+        """
+        Queues a call behind earlier calls with the same key.
+
+        Args:
+            key (str): Ordering key; calls with equal keys run one at a time, in order.
+            function (Callable[..., None]): The callable to run.
+            *args (Any): Arguments for the callable.
+
+        Returns:
+            bool: False if the backlog was full and the call was dropped.
+        """
+        tasks = self._queue_for(key)
+        try:
+            tasks.put_nowait((function, args, time.perf_counter()))
+        except queue.Full:
+            self.stats.dropped += 1
+            return False
+        self.stats.submitted += 1
+        depth = self.queue_depth()
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        return True
+
+    def queue_depth(self) -> int:
+        """
+        Returns the number of tasks waiting across all workers.
+        """
+        return sum(tasks.qsize() for tasks in self._queues)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stops the workers after they finish the tasks already queued.
+
+        Args:
+            wait (bool): Block until every worker has exited.
+        """
+        for tasks in self._queues:
+            tasks.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self, tasks: "queue.Queue[Optional[_Task]]") -> None:
+        clock = time.perf_counter
+        stats = self.stats
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            function, args, queued = task
+            started = clock()
+            failed = False
+            try:
+                function(*args)
+            except Exception as e:
+                failed = True
+                get_sink().error("Dispatched action failed: %s", e)
+            finished = clock()
+            wait, run = started - queued, finished - started
+            # Workers finish concurrently, so the shared totals need the lock.
+            with self._stats_lock:
+                if failed:
+                    stats.failed += 1
+                else:
+                    stats.completed += 1
+                stats.total_wait += wait
+                stats.total_run += run
+                if wait > stats.max_wait:
+                    stats.max_wait = wait
+                if run > stats.max_run:
+                    stats.max_run = run
@@ -0,0 +1,375 @@
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from output.output_sink import get_sink
+
+from .topic_trie import TopicTrie
+
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+
+def _to_bytes(payload: Any) -> bytes:
+    """Converts a payload the same way paho does before sending it."""
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    if isinstance(payload, (int, float)):
+        return str(payload).encode("ascii")
+    raise TypeError("payload must be a string, bytearray, int, float or None.")
+
+
+def _matches(topic_filter: str, topic: str) -> bool:
+    """Returns True if a single topic filter matches a topic."""
+    trie: TopicTrie[bool] = TopicTrie()
+    trie.insert(topic_filter, True)
+    return bool(trie.match(topic))
+
+
+class LoopbackMessage:
+    """
+    Mirrors the attributes of paho's MQTTMessage that callbacks use.
+    """
+
+    __slots__ = ("topic", "payload", "qos", "retain", "mid", "timestamp")
+
+    def __init__(
+        self, topic: str, payload: bytes, qos: int, retain: bool, mid: int
+    ) -> None:
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+        self.timestamp = time.monotonic()
+
+
+class LoopbackMessageInfo:
+    """
+    Mirrors paho's MQTTMessageInfo.
+
+    The loopback broker receives a message as soon as it is published, so
+    messages are reported as published immediately (QoS 1 PUBACK included).
+    """
+
+    __slots__ = ("mid", "rc")
+
+    def __init__(self, mid: int, rc: int = MQTT_ERR_SUCCESS) -> None:
+        self.mid = mid
+        self.rc = rc
+
+    def is_published(self) -> bool:
+        return self.rc == MQTT_ERR_SUCCESS
+
+    def wait_for_publish(self, timeout: Optional[float] = None) -> bool:
+        return self.is_published()
+
+
+class LoopbackBroker:
+    """
+    An in-process MQTT broker stand-in routing messages between LoopbackClients.
+
+    Subscriptions are stored in a TopicTrie, so routing supports the '+' and '#'
+    wildcards. Delivery uses the lower of the publish and subscription QoS:
+    QoS 0 messages are dropped when a subscriber already has ``max_queued``
+    messages waiting, QoS 1 messages are always queued. Retained messages are
+    stored per topic and sent to new matching subscriptions.
+    """
+
+    _default: Optional["LoopbackBroker"] = None
+
+    def __init__(self, max_queued: int = 100000) -> None:
+        """
+        Initializes an empty broker.
+
+        Args:
+            max_queued (int): Per-subscriber limit of waiting QoS 0 messages.
+        """
+        self.max_queued = max_queued
+        self._subscriptions: TopicTrie[Dict["LoopbackClient", int]] = TopicTrie()
+        self._retained: Dict[str, LoopbackMessage] = {}
+        self._lock = threading.Lock()
+        self._mids = itertools.count(1)
+        self.published: int = 0
+        self.delivered: int = 0
+        self.dropped: int = 0
+
+    @classmethod
+    def default(cls) -> "LoopbackBroker":
+        """
+        Returns the process-wide broker shared by clients created without one.
+        """
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def subscribe(self, client: "LoopbackClient", topic_filter: str, qos: int) -> None:
+        """
+        Adds or updates a client's subscription and replays matching retained messages.
+        """
+        with self._lock:
+            subscribers = self._subscriptions.get(topic_filter)
+            if subscribers is None:
+                subscribers = {}
+                self._subscriptions.insert(topic_filter, subscribers)
+            subscribers[client] = qos
+            retained = [
+                message
+                for topic, message in self._retained.items()
+                if _matches(topic_filter, topic)
+            ]
+        for message in retained:
+            client._enqueue(message, min(qos, message.qos), force=True)
+
+    def unsubscribe(self, client: "LoopbackClient", topic_filter: str) -> None:
+        """
+        Removes a client's subscription to a topic filter.
+        """
+        with self._lock:
+            subscribers = self._subscriptions.get(topic_filter)
+            if subscribers is not None:
+                subscribers.pop(client, None)
+                if not subscribers:
+                    self._subscriptions.remove(topic_filter)
+
+    def disconnect(self, client: "LoopbackClient") -> None:
+        """
+        Removes every subscription held by a client.
+        """
+        for topic_filter in list(client._filters):
+            self.unsubscribe(client, topic_filter)
+
+    def publish(
+        self, topic: str, payload: bytes, qos: int, retain: bool
+    ) -> LoopbackMessageInfo:
+        """
+        Routes a message to every matching subscription.
+
+        Returns:
+            LoopbackMessageInfo: Delivery tracking for the message.
+        """
+        mid = next(self._mids)
+        # Live deliveries never carry the retain flag; only replays on subscribe do.
+        message = LoopbackMessage(topic, payload, qos, False, mid)
+
+        with self._lock:
+            self.published += 1
+            if retain:
+                # An empty retained payload clears the topic, as on a real broker.
+                if payload:
+                    self._retained[topic] = LoopbackMessage(
+                        topic, payload, qos, True, mid
+                    )
+                else:
+                    self._retained.pop(topic, None)
+            # A client subscribed through several matching filters gets the highest QoS once.
+            targets: Dict["LoopbackClient", int] = {}
+            for subscribers in self._subscriptions.match(topic):
+                for client, sub_qos in subscribers.items():
+                    targets[client] = max(targets.get(client, 0), min(qos, sub_qos))
+
+        delivered = 0
+        for client, delivery_qos in targets.items():
+            if client._enqueue(message, delivery_qos):
+                delivered += 1
+        with self._lock:
+            self.delivered += delivered
+            self.dropped += len(targets) - delivered
+        return LoopbackMessageInfo(mid)
+
+    def retained_topics(self) -> List[str]:
+        """
+        Returns the topics that currently hold a retained message.
+        """
+        with self._lock:
+            return list(self._retained)
+
+
+class LoopbackClient:
+    """
+    Implements the subset of paho.mqtt.client.Client that MQTTManager uses,
+    backed by a LoopbackBroker instead of a network connection.
+
+    Incoming messages wait in a per-client queue and are passed to
+    ``on_message(client, userdata, message)`` either by the thread started with
+    ``loop_start`` or by explicit calls to ``loop``.
+    """
+
+    def __init__(
+        self,
+        client_id: str = "",
+        userdata: Any = None,
+        broker: Optional[LoopbackBroker] = None,
+    ) -> None:
+        self._client_id = client_id
+        self._userdata = userdata
+        self._broker = broker
+        # Broker (re)attached to by connect(); set on the first connect if not given.
+        self._home = broker
+        self._filters: Dict[str, int] = {}
+        self._inbox: "queue.Queue[LoopbackMessage]" = queue.Queue()
+        self._loop_thread: Optional[threading.Thread] = None
+        self._running = False
+        self._mids = itertools.count(1)
+        self.on_message: Optional[Callable[[Any, Any, Any], None]] = None
+        self.on_connect: Optional[Callable[..., None]] = None
+        self.on_disconnect: Optional[Callable[..., None]] = None
+        self.on_publish: Optional[Callable[[Any, Any, int], None]] = None
+
+    def user_data_set(self, userdata: Any) -> None:
+        self._userdata = userdata
+
+    def is_connected(self) -> bool:
+        return self._broker is not None
+
+    def connect(
+        self,
+        host: str = "loopback",
+        port: int = 1883,
+        keepalive: int = 60,
+        **kwargs: Any
+    ) -> int:
+        """
+        Attaches to the client's broker, by default the process-wide one; host
+        and port are ignored.
+        """
+        if self._broker is None:
+            if self._home is None:
+                self._home = LoopbackBroker.default()
+            self._broker = self._home
+        if self.on_connect is not None:
+            self.on_connect(self, self._userdata, {}, 0)
+        return MQTT_ERR_SUCCESS
+
+    def connect_async(
+        self,
+        host: str = "loopback",
+        port: int = 1883,
+        keepalive: int = 60,
+        **kwargs: Any
+    ) -> int:
+        # Attaching cannot block, so there is nothing to defer to the loop thread.
+        return self.connect(host, port, keepalive)
+
+    def reconnect(self) -> int:
+        return self.connect()
+
+    def reconnect_delay_set(self, min_delay: int = 1, max_delay: int = 120) -> None:
+        pass  # The loopback connection never drops.
+
+    def max_inflight_messages_set(self, inflight: int) -> None:
+        pass  # Messages are acknowledged as soon as they are published.
+
+    def max_queued_messages_set(self, queue_size: int) -> None:
+        pass
+
+    def disconnect(self, *args: Any, **kwargs: Any) -> int:
+        """
+        Detaches from the broker, dropping every subscription as a clean
+        session would; ``reconnect`` attaches to the same broker again.
+        """
+        if self._broker is not None:
+            self._broker.disconnect(self)
+            self._broker = None
+        self._filters.clear()
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, self._userdata, 0)
+        return MQTT_ERR_SUCCESS
+
+    def subscribe(self, topic: str, qos: int = 0, **kwargs: Any) -> Tuple[int, int]:
+        mid = next(self._mids)
+        if self._broker is None:
+            return MQTT_ERR_NO_CONN, mid
+        self._filters[topic] = qos
+        self._broker.subscribe(self, topic, qos)
+        return MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic: str, **kwargs: Any) -> Tuple[int, int]:
+        mid = next(self._mids)
+        if self._broker is None:
+            return MQTT_ERR_NO_CONN, mid
+        self._filters.pop(topic, None)
+        self._broker.unsubscribe(self, topic)
+        return MQTT_ERR_SUCCESS, mid
+
+    def publish(
+        self,
+        topic: str,
+        payload: Any = None,
+        qos: int = 0,
+        retain: bool = False,
+        **kwargs: Any
+    ) -> LoopbackMessageInfo:
+        if self._broker is None:
+            return LoopbackMessageInfo(next(self._mids), MQTT_ERR_NO_CONN)
+        info = self._broker.publish(topic, _to_bytes(payload), qos, retain)
+        if self.on_publish is not None:
+            self.on_publish(self, self._userdata, info.mid)
+        return info
+
+    def loop(self, timeout: float = 1.0) -> int:
+        """
+        Delivers waiting messages, waiting up to `timeout` seconds for the first one.
+        """
+        try:
+            message = self._inbox.get(timeout=timeout)
+        except queue.Empty:
+            return MQTT_ERR_SUCCESS
+        while True:
+            self._deliver(message)
+            try:
+                message = self._inbox.get_nowait()
+            except queue.Empty:
+                return MQTT_ERR_SUCCESS
+
+    def loop_start(self) -> int:
+        if self._loop_thread is None:
+            self._running = True
+            self._loop_thread = threading.Thread(
+                target=self._loop_forever, name="loopback-client", daemon=True
+            )
+            self._loop_thread.start()
+        return MQTT_ERR_SUCCESS
+
+    def loop_stop(self, force: bool = False) -> int:
+        if self._loop_thread is not None:
+            self._running = False
+            self._loop_thread.join()
+            self._loop_thread = None
+        return MQTT_ERR_SUCCESS
+
+    def pending(self) -> int:
+        """
+        Returns the number of messages waiting to be delivered to this client.
+        """
+        return self._inbox.qsize()
+
+    def _loop_forever(self) -> None:
+        while self._running:
+            self.loop(timeout=0.1)
+
+    def _enqueue(self, message: LoopbackMessage, qos: int, force: bool = False) -> bool:
+        if (
+            qos == 0
+            and not force
+            and self._broker is not None
+            and self._inbox.qsize() >= self._broker.max_queued
+        ):
+            return False
+        self._inbox.put(message)
+        return True
+
+    def _deliver(self, message: LoopbackMessage) -> None:
+        if self.on_message is None:
+            return
+        try:
+            self.on_message(self, self._userdata, message)
+        except Exception as e:
+            # Keep the delivery loop alive, like a broker connection would.
+            get_sink().error("on_message failed for topic %s: %s", message.topic, e)
@@ -1,28 +1,127 @@
-from typing import Callable, Dict
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import paho.mqtt.client as mqtt
 
+from output.output_sink import get_sink
+
+from .keyed_executor import KeyedExecutor
+from .metrics import MetricsRegistry
+from .payload_codec import decode_any, untrace_payload
+from .topic_trie import TopicTrie
+
+# Actions receive decoded text, or a field dictionary for packed binary payloads.
+Payload = Union[str, Dict[str, Any]]
+
+# A registered action and whether it also takes the message topic.
+_Registration = Tuple[Callable[..., None], bool]
+
+# Receives (topic, send time, sequence number) for every traced message.
+TraceObserver = Callable[[str, float, int], None]
+
 
 class MessageHandler:
     """
     Handles incoming MQTT messages and triggers corresponding actions.
+
+    Actions are registered against topic filters, which may use the MQTT
+    wildcards ``+`` and ``#``, and are resolved through a topic trie. Several
+    actions may share a filter; they run in registration order. Payloads in
+    the packed binary format (see payload_codec) are unpacked before dispatch.
+
+    Without an executor, actions run on the client's network thread. With one,
+    they run on its workers, keyed by topic so each topic's messages are still
+    handled in arrival order.
+
+    Traced payloads (see payload_codec.trace_payload) have their stamp removed
+    before decoding and passed to ``on_trace``, on the network thread, as soon
+    as they arrive.
+
+    Received, malformed and unmatched messages are counted in ``metrics``,
+    along with the time actions take when they run on the network thread.
     """
 
-    def __init__(self) -> None:
-        """Initializes the MessageHandler with an empty action registry."""
-        self._actions: Dict[str, Callable[[str], None]] = {}
+    def __init__(
+        self,
+        executor: Optional[KeyedExecutor] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ) -> None:
+        """
+        Initializes the MessageHandler with an empty action registry.
+
+        Args:
+            executor (Optional[KeyedExecutor]): Runs actions off the network thread.
+            metrics (Optional[MetricsRegistry]): Registry for the dispatch metrics;
+                a private one is created when omitted.
+        """
+        self._actions: TopicTrie[List[_Registration]] = TopicTrie()
+        self.executor = executor
+        self.on_trace: Optional[TraceObserver] = None
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._received = self.metrics.counter(
+            "mqtt_messages_received_total", "Messages received from the broker."
+        )
+        self._malformed = self.metrics.counter(
+            "mqtt_messages_malformed_total", "Received payloads that failed to decode."
+        )
+        self._unmatched = self.metrics.counter(
+            "mqtt_messages_unmatched_total", "Received messages with no action."
+        )
+        self._dispatch_seconds = self.metrics.histogram(
+            "mqtt_dispatch_seconds",
+            "Time spent running the actions of one message on the network thread.",
+        )
+        if executor is not None:
+            stats = executor.stats
+            for name, help_text in (
+                ("submitted", "Messages handed to dispatch workers."),
+                ("completed", "Messages whose actions finished on a worker."),
+                ("failed", "Messages whose actions raised on a worker."),
+                ("dropped", "Messages dropped because a worker queue was full."),
+            ):
+                self.metrics.counter_func(
+                    f"mqtt_dispatch_{name}_total",
+                    help_text,
+                    lambda name=name: getattr(stats, name),
+                )
+            self.metrics.gauge(
+                "mqtt_dispatch_queue_depth",
+                "Messages waiting in dispatch worker queues.",
+                executor.queue_depth,
+            )
 
-    def register_action(self, topic: str, action: Callable[[str], None]) -> None:
+    def register_action(
+        self, topic: str, action: Callable[..., None], with_topic: bool = False
+    ) -> None:
         """
         Registers a callback action for a specific topic.
 
         Args:
-            topic (str): The MQTT topic.
-            action (Callable[[str], None]): The callback function to execute when a message is received on this topic.
+            topic (str): The MQTT topic filter, optionally containing '+' or '#' wildcards.
+            action (Callable[..., None]): The callback function to execute when a message is received on this topic.
+            with_topic (bool): Call the action as ``action(topic, payload)`` instead of ``action(payload)``.
+        """
+        registrations = self._actions.get(topic)
+        if registrations is None:
+            registrations = []
+            self._actions.insert(topic, registrations)
+        registrations.append((action, with_topic))
+
+    def unregister_action(self, topic: str) -> bool:
+        """
+        Removes the callback actions registered for a topic filter.
+
+        Args:
+            topic (str): The MQTT topic filter used at registration.
+
+        Returns:
+            bool: True if any action was removed.
         """
-        self._actions[topic] = action
+        return self._actions.remove(topic)
 
-    def handle_message(self, client: mqtt.Client, userdata: None, message: mqtt.MQTTMessage) -> None:
+    def handle_message(
+        self, client: mqtt.Client, userdata: None, message: mqtt.MQTTMessage
+    ) -> None:
         """
         Processes received MQTT messages and triggers the corresponding action.
 
@@ -31,12 +130,62 @@ class MessageHandler:
             userdata (None): User-defined data (not used here).
             message (mqtt.MQTTMessage): The received MQTT message.
         """
+        self._received.inc()
         topic = message.topic
-        payload = message.payload.decode()
-        print(f"Received message from topic '{topic}': {payload}")
-
-        # Execute the registered action if available
-        if topic in self._actions:
-            self._actions[topic](payload)
-        else:
-            print(f"No action registered for topic: {topic}")
+        raw = message.payload
+        traced = untrace_payload(raw)
+        if traced is not None:
+            sent, sequence, raw = traced
+            if self.on_trace is not None:
+                self.on_trace(topic, sent, sequence)
+        try:
+            payload = decode_any(raw)
+        except ValueError as e:
+            self._malformed.inc()
+            get_sink().warning("Dropping malformed payload on topic '%s': %s", topic, e)
+            return
+        get_sink().debug("Received message from topic '%s': %s", topic, payload)
+
+        # Execute every action whose topic filter matches
+        matches = self._actions.match(topic)
+        if not matches:
+            self._unmatched.inc()
+            get_sink().debug("No action registered for topic: %s", topic)
+        elif self.executor is None:
+            started = time.perf_counter()
+            self._run_actions(matches, topic, payload)
+            self._dispatch_seconds.observe(time.perf_counter() - started)
+        elif not self.executor.submit(
+            topic, self._run_actions, matches, topic, payload
+        ):
+            get_sink().debug("Dispatch backlog full; dropped message on %s", topic)
+
+    @staticmethod
+    def _run_actions(
+        matches: List[List[_Registration]], topic: str, payload: Payload
+    ) -> None:
+        for registrations in matches:
+            for action, with_topic in registrations:
+                if with_topic:
+                    action(topic, payload)
+                else:
+                    action(payload)
+
+    def close(self) -> None:
+        """
+        Waits for dispatched actions to finish and stops the executor, if any.
+        """
+        if self.executor is None:
+            return
+        self.executor.shutdown()
+        stats = self.executor.stats.snapshot()
+        get_sink().info(
+            "Dispatch: %d handled, %d failed, %d dropped, max depth %d, "
+            "mean wait %.1f ms, max action time %.1f ms",
+            stats["completed"],
+            stats["failed"],
+            stats["dropped"],
+            stats["max_depth"],
+            stats["mean_wait"] * 1000,
+            stats["max_run"] * 1000,
+        )
@@ -0,0 +1,336 @@
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from output.output_sink import get_sink
+
+# Upper bounds, in seconds, of the default histogram buckets (10 us to 1 s).
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """
+    A monotonically increasing count.
+
+    Increments are a plain attribute update with no lock. Under the GIL a
+    concurrent increment can very rarely be lost, which is an acceptable
+    error for monitoring and keeps the hot paths cheap.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, as Prometheus histograms do.
+    """
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds = tuple(sorted(bounds))
+        # One slot per bound plus one for values above the largest (+Inf).
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+# A callback sampled when metrics are rendered.
+Sampled = Callable[[], float]
+Metric = Union[Counter, Histogram, Sampled]
+
+
+class MetricsRegistry:
+    """
+    Named metrics rendered in the Prometheus text exposition format.
+
+    Counters and histograms are updated on the hot paths. Values that a
+    component already tracks, such as queue depths or its own counters, are
+    registered as callbacks instead and only read when metrics are rendered,
+    so they cost nothing in between.
+    """
+
+    def __init__(self) -> None:
+        # name -> (type, help, {labels: metric}), in registration order
+        self._families: Dict[str, Tuple[str, str, Dict[Labels, Metric]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(
+        self,
+        kind: str,
+        name: str,
+        help_text: str,
+        labels: Optional[Dict[str, str]],
+        create: Callable[[], Metric],
+        replace: bool = False,
+    ) -> Metric:
+        key: Labels = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help_text, {})
+            elif family[0] != kind:
+                raise ValueError(f"Metric '{name}' is already a {family[0]}.")
+            metrics = family[2]
+            if replace or key not in metrics:
+                metrics[key] = create()
+            return metrics[key]
+
+    def counter(
+        self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None
+    ) -> Counter:
+        """
+        Returns the counter with this name and labels, creating it if needed.
+        """
+        return self._register("counter", name, help_text, labels, Counter)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Histogram:
+        """
+        Returns the histogram with this name and labels, creating it if needed.
+        """
+        return self._register(
+            "histogram", name, help_text, labels, lambda: Histogram(buckets)
+        )
+
+    def counter_func(
+        self,
+        name: str,
+        help_text: str,
+        read: Sampled,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Exposes a count kept elsewhere; `read` is called when rendering.
+        """
+        self._register("counter", name, help_text, labels, lambda: read, True)
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        read: Sampled,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        Exposes a value that can go up and down; `read` is called when rendering.
+        """
+        self._register("gauge", name, help_text, labels, lambda: read, True)
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            families = [
+                (name, kind, help_text, list(metrics.items()))
+                for name, (kind, help_text, metrics) in self._families.items()
+            ]
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if isinstance(metric, Histogram):
+                    lines.extend(_render_histogram(name, labels, metric))
+                    continue
+                try:
+                    value = metric.value if isinstance(metric, Counter) else metric()
+                except Exception as e:  # A failing callback must not break the export
+                    get_sink().debug("Metric %s could not be read: %s", name, e)
+                    continue
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = (
+        '{}="{}"'.format(
+            key,
+            value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for key, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _render_histogram(name: str, labels: Labels, histogram: Histogram) -> List[str]:
+    counts = list(histogram.counts)
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds + (float("inf"),), counts):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(
+            f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}"
+        )
+    lines.append(f"{name}_sum{_format_labels(labels)} {repr(histogram.total)}")
+    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return lines
+
+
+class MetricsServer:
+    """
+    Serves a registry's metrics over HTTP at ``/metrics`` for Prometheus or curl.
+    """
+
+    def __init__(
+        self, registry: MetricsRegistry, port: int, host: str = "127.0.0.1"
+    ) -> None:
+        """
+        Args:
+            registry (MetricsRegistry): Metrics to serve.
+            port (int): Port to listen on; 0 picks a free one (see ``port``).
+            host (str): Address to bind; local only by default.
+        """
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _handler(self) -> type:
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass  # Scrapes would otherwise be printed to stderr
+
+        return Handler
+
+    def start(self) -> None:
+        """
+        Starts serving on a background thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name="metrics-http", daemon=True
+            )
+            self._thread.start()
+            get_sink().info(
+                "Serving metrics on http://%s:%d/metrics",
+                self._server.server_address[0],
+                self.port,
+            )
+
+    def stop(self) -> None:
+        """
+        Stops the server and closes its socket.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+class MetricsDump:
+    """
+    Writes a registry's metrics to a file every ``interval`` seconds and on stop.
+
+    The file is replaced atomically, so readers (or ``watch cat``) never see a
+    partial dump.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float) -> None:
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def dump(self) -> None:
+        """
+        Writes the current metrics.
+        """
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as file:
+                file.write(self.registry.render())
+            os.replace(temporary, self.path)
+        except OSError as e:
+            get_sink().error("Failed to write metrics to %s: %s", self.path, e)
+
+    def start(self) -> None:
+        """
+        Starts dumping on a background thread.
+        """
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="metrics-dump", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the dump thread and writes a final dump.
+        """
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+        self.dump()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.dump()
@@ -1,23 +1,143 @@
-from typing import Callable
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 import paho.mqtt.client as mqtt
 
+from output.output_sink import get_sink
+
+from .keyed_executor import KeyedExecutor
+from .loopback_broker import LoopbackClient
 from .message_manager import MessageHandler
+from .metrics import MetricsRegistry
+from .payload_codec import trace_payload
+from .retained_snapshot import RetainedSnapshot
+
+# Broker address that selects the in-process LoopbackBroker instead of the network.
+LOOPBACK_BROKER = "loopback"
 
 
 class MQTTManager:
     """
     Manages MQTT broker connection, subscriptions, and message publishing.
+
+    With a ``coalesce_window``, publishes are buffered per topic instead of sent
+    immediately: a newer message to the same topic replaces the buffered one
+    (last value wins), and every window the buffer is flushed in one burst.
+
+    With a ``snapshot_path``, every message is published retained and the last
+    payload of every published topic is saved to that file every
+    ``snapshot_interval`` seconds and on stop. ``start`` publishes the saved
+    payloads as retained messages, so subscribers that join, also after a
+    restart, get the last known state at once instead of waiting for each
+    device's next step.
+
+    With ``trace`` set, every sent payload is prefixed with its send time and a
+    per-topic sequence number (see payload_codec.trace_payload), so receivers
+    can measure end-to-end latency, loss and reordering.
+
+    Publishes, failures, subscriptions, connections, buffered messages and the
+    dispatch side (see MessageHandler) are counted in ``metrics``, which
+    MetricsServer or MetricsDump export.
     """
 
-    def __init__(self) -> None:
-        """Initializes MQTTManager with broker configuration and an MQTT client."""
-        self.broker: str = ""
-        self.port: int = 1883
-        self.client: mqtt.Client = mqtt.Client()
-        self.message_handler = MessageHandler()
+    def __init__(
+        self,
+        broker: Optional[str] = None,
+        port: int = 1883,
+        client: Optional[mqtt.Client] = None,
+        coalesce_window: Optional[float] = None,
+        dispatch_workers: int = 0,
+        snapshot_path: Optional[str] = None,
+        snapshot_interval: float = 5.0,
+        trace: bool = False,
+    ) -> None:
+        """
+        Initializes MQTTManager with broker configuration and an MQTT client.
 
-        self._configure_broker()
+        Args:
+            broker (Optional[str]): Broker address; prompts the user when omitted.
+                "loopback" uses the in-process LoopbackBroker.
+            port (int): Broker port.
+            client (Optional[mqtt.Client]): Client to use instead of creating one.
+            coalesce_window (Optional[float]): Seconds to buffer publishes for,
+                keeping only the latest message per topic; None sends immediately.
+            dispatch_workers (int): Threads that run subscription actions, keeping
+                per-topic order; 0 runs them on the network thread.
+            snapshot_path (Optional[str]): File holding the last payload per topic,
+                replayed as retained messages on start; live messages are then
+                published retained as well.
+            snapshot_interval (float): Seconds between snapshot saves.
+            trace (bool): Stamp payloads with their send time and sequence number.
+        """
+        if coalesce_window is not None and coalesce_window <= 0:
+            raise ValueError(f"Coalesce window must be positive: {coalesce_window}")
+        self.broker: str = broker or ""
+        self.port: int = port
+        self.metrics = MetricsRegistry()
+        self.message_handler = MessageHandler(
+            KeyedExecutor(dispatch_workers) if dispatch_workers else None,
+            self.metrics,
+        )
+        self.published_count: int = 0
+        self.coalesce_window = coalesce_window
+        self.coalesced_count: int = 0
+        self._coalesced: Dict[str, Any] = {}
+        self._coalesce_lock = threading.Lock()
+        self.snapshot = RetainedSnapshot(snapshot_path) if snapshot_path else None
+        # Snapshot topics are retained live too, not only when replayed on start.
+        self.retain = self.snapshot is not None
+        self.snapshot_interval = snapshot_interval
+        self.trace = trace
+        self._sequences: Dict[str, int] = {}
+        self._stopping = threading.Event()
+        self._background: List[threading.Thread] = []
+        self._register_metrics()
+
+        if broker is None:
+            self._configure_broker()
+        if client is None:
+            client = (
+                LoopbackClient() if self.broker == LOOPBACK_BROKER else mqtt.Client()
+            )
+        self.client: mqtt.Client = client
+
+    def _register_metrics(self) -> None:
+        """
+        Creates the hot-path metrics and exposes the counters kept as attributes.
+        """
+        metrics = self.metrics
+        self._publish_failures = metrics.counter(
+            "mqtt_publish_failures_total", "Publishes the client rejected."
+        )
+        self._publish_seconds = metrics.histogram(
+            "mqtt_publish_seconds", "Time spent in the client's publish call."
+        )
+        self._subscribes = metrics.counter(
+            "mqtt_subscribe_total", "Topic filters subscribed to."
+        )
+        self._connections = metrics.counter(
+            "mqtt_connections_total", "Successful connections, reconnects included."
+        )
+        self._disconnects = metrics.counter(
+            "mqtt_unexpected_disconnects_total", "Connections lost without stop()."
+        )
+        metrics.counter_func(
+            "mqtt_published_total",
+            "Messages handed to the client.",
+            lambda: self.published_count,
+        )
+        metrics.counter_func(
+            "mqtt_coalesced_total",
+            "Buffered messages replaced by a newer one on the same topic.",
+            lambda: self.coalesced_count,
+        )
+        metrics.gauge(
+            "mqtt_coalesce_pending",
+            "Messages buffered for the next coalesce flush.",
+            lambda: len(self._coalesced),
+        )
 
     def _configure_broker(self) -> None:
         """
@@ -29,56 +149,226 @@ class MQTTManager:
                 input("Enter the MQTT broker port (default: 1883): ").strip()
             )
         except ValueError:
-            print("Invalid input. Defaulting to port 1883.")
+            get_sink().warning("Invalid input. Defaulting to port 1883.")
             self.port = 1883
-        print(f"Configured MQTT broker: {self.broker}:{self.port}")
+        get_sink().info("Configured MQTT broker: %s:%s", self.broker, self.port)
 
     def connect(self) -> None:
         """
         Connects to the configured MQTT broker.
         """
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
         try:
             self.client.connect(self.broker, self.port)
-            print(f"Connected to MQTT broker at {self.broker}:{self.port}")
+            get_sink().info("Connected to MQTT broker at %s:%s", self.broker, self.port)
         except Exception as e:
-            print(f"Failed to connect to broker: {e}")
+            get_sink().error("Failed to connect to broker: %s", e)
+
+    def _on_connect(self, client: Any, userdata: Any, flags: Any, rc: int) -> None:
+        if rc == 0:
+            self._connections.inc()
 
-    def subscribe(self, topic: str, action: Callable[[str], None]) -> None:
+    def _on_disconnect(self, client: Any, userdata: Any, rc: int) -> None:
+        if rc != 0:
+            self._disconnects.inc()
+
+    def subscribe(
+        self, topic: str, action: Callable[..., None], with_topic: bool = False
+    ) -> None:
         """
         Subscribes to a topic and registers an action to handle its messages.
 
         Args:
             topic (str): The MQTT topic to subscribe to.
-            action (Callable[[str], None]): The callback function to execute when a message is received.
+            action (Callable[..., None]): The callback function to execute when a message is received.
+            with_topic (bool): Call the action as ``action(topic, payload)``.
         """
-        self.message_handler.register_action(topic, action)
+        topic = sys.intern(topic)
+        self.message_handler.register_action(topic, action, with_topic)
         self.client.subscribe(topic)
+        self._subscribes.inc()
         self.client.on_message = self.message_handler.handle_message
-        print(f"Subscribed to topic: {topic}")
+        get_sink().info("Subscribed to topic: %s", topic)
 
     def publish(self, topic: str, message: str) -> None:
         """
-        Publishes a message to a topic.
+        Publishes a message to a topic, or buffers it when coalescing.
 
         Args:
             topic (str): The MQTT topic to publish to.
             message (str): The message payload.
         """
-        self.client.publish(topic, message)
-        print(f"Published to {topic}: {message}")
+        self._publish(topic, message)
+
+    def _publish(self, topic: str, message: Any) -> bool:
+        """
+        Records, buffers or sends one message; shared by every publish front end.
+
+        Returns:
+            bool: False if the client rejected the message.
+        """
+        # Topics repeat for every tick of a device; interning keeps one shared copy.
+        topic = sys.intern(topic)
+        if self.snapshot is not None:
+            self.snapshot.record(topic, message)
+        if self.coalesce_window is None:
+            return self._send(topic, message, self.retain)
+        with self._coalesce_lock:
+            if topic in self._coalesced:
+                self.coalesced_count += 1
+            self._coalesced[topic] = message
+        return True
+
+    def _send(self, topic: str, message: Any, retain: bool = False) -> bool:
+        """
+        Hands one message to the client.
+
+        Args:
+            topic (str): The MQTT topic to publish to.
+            message (Any): The message payload.
+            retain (bool): Ask the broker to keep the message for new subscribers.
+
+        Returns:
+            bool: False if the client rejected the message.
+        """
+        if self.trace:
+            message = self._stamp(topic, message)
+        started = time.perf_counter()
+        info = self.client.publish(topic, message, retain=retain)
+        self._publish_seconds.observe(time.perf_counter() - started)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self._publish_failures.inc()
+            return False
+        self.published_count += 1
+        get_sink().debug("Published to %s: %s", topic, message)
+        return True
+
+    def _stamp(self, topic: str, message: Any) -> bytes:
+        """
+        Prefixes a message with the send time and the topic's next sequence number.
+        """
+        sequence = self._sequences.get(topic, 0)
+        self._sequences[topic] = sequence + 1
+        return trace_payload(message, sequence)
+
+    def flush_coalesced(self) -> int:
+        """
+        Sends every buffered message in one burst.
+
+        Returns:
+            int: The number of messages sent.
+        """
+        with self._coalesce_lock:
+            pending, self._coalesced = self._coalesced, {}
+        for topic, message in pending.items():
+            self._send(topic, message, self.retain)
+        return len(pending)
+
+    def restore_snapshot(self) -> int:
+        """
+        Publishes the saved snapshot as retained messages.
+
+        Returns:
+            int: The number of topics published.
+        """
+        if not self.load_snapshot():
+            return 0
+        published = 0
+        for topic, payload in self.snapshot.items():
+            published += self._send(topic, payload, retain=True)
+        get_sink().info(
+            "Published %d retained topics from %s", published, self.snapshot.path
+        )
+        return published
+
+    def load_snapshot(self) -> int:
+        """
+        Reads the saved snapshot, if there is one.
+
+        Returns:
+            int: The number of topics loaded; 0 if there is no readable snapshot.
+        """
+        if self.snapshot is None:
+            return 0
+        try:
+            return self.snapshot.load()
+        except ValueError as e:
+            get_sink().warning("Ignoring unreadable snapshot: %s", e)
+            return 0
+
+    def save_snapshot(self) -> None:
+        """
+        Writes the snapshot file if any topic was published since the last save.
+        """
+        if self.snapshot is None:
+            return
+        try:
+            self.snapshot.save()
+        except OSError as e:
+            get_sink().error("Failed to save snapshot %s: %s", self.snapshot.path, e)
 
     def start(self) -> None:
         """
         Starts the MQTT loop to process incoming and outgoing messages.
         """
-        print("MQTT loop started.")
+        get_sink().info("MQTT loop started.")
         self.client.loop_start()
+        self.restore_snapshot()
+        self._start_background()
+
+    def _start_background(self) -> None:
+        """
+        Starts the threads that flush coalesced messages and save snapshots.
+        """
+        if self._background:
+            return
+        self._stopping.clear()
+        if self.coalesce_window is not None:
+            self._background.append(
+                self._repeat(
+                    "mqtt-coalesce", self.coalesce_window, self.flush_coalesced
+                )
+            )
+        if self.snapshot is not None:
+            self._background.append(
+                self._repeat(
+                    "mqtt-snapshot", self.snapshot_interval, self.save_snapshot
+                )
+            )
+
+    def _repeat(
+        self, name: str, interval: float, action: Callable[[], Any]
+    ) -> threading.Thread:
+        def run() -> None:
+            while not self._stopping.wait(interval):
+                action()
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def _stop_background(self) -> None:
+        """
+        Stops the background threads, sends what is still buffered and saves
+        the final snapshot.
+        """
+        self._stopping.set()
+        for thread in self._background:
+            thread.join()
+        self._background = []
+        self.flush_coalesced()
+        if self.coalesced_count:
+            get_sink().info("Coalesced %d superseded messages.", self.coalesced_count)
+        self.save_snapshot()
 
     def stop(self) -> None:
         """
         Stops the MQTT loop and disconnects from the broker.
         """
-        print("Stopping MQTT loop and disconnecting...")
+        get_sink().info("Stopping MQTT loop and disconnecting...")
+        self._stop_background()
         self.client.loop_stop()
         self.client.disconnect()
-        print("MQTT loop stopped and disconnected.")
+        self.message_handler.close()
+        get_sink().info("MQTT loop stopped and disconnected.")
@@ -0,0 +1,187 @@
+import struct
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+# Every packed payload starts with this byte. 0x80-0xBF can never start a valid
+# UTF-8 string, so packed payloads are never confused with plain text ones.
+MAGIC = 0xB7
+VERSION = 1
+
+_HEADER = struct.Struct("<BBB")  # magic, version, schema id
+
+# Traced payloads start with this byte (also never valid UTF-8), followed by the
+# send time and a per-topic sequence number, then the original payload.
+TRACE_MAGIC = 0xB8
+_TRACE = struct.Struct("<BdI")  # magic, send time, sequence
+
+
+class PayloadSchema:
+    """
+    A fixed layout of named fields packed with a struct format.
+    """
+
+    def __init__(
+        self, schema_id: int, name: str, fields: Tuple[str, ...], fmt: str
+    ) -> None:
+        """
+        Initializes a schema and checks the format matches the field names.
+
+        Args:
+            schema_id (int): Identifier written into the payload header (0-255).
+            name (str): Human-readable schema name.
+            fields (Tuple[str, ...]): Field names, in packing order.
+            fmt (str): struct format for the fields (without byte-order prefix).
+        """
+        self.schema_id = schema_id
+        self.name = name
+        self.fields = fields
+        self.body = struct.Struct("<" + fmt)
+        if len(fields) != len(self.body.unpack(bytes(self.body.size))):
+            raise ValueError(
+                f"Schema '{name}' has {len(fields)} fields but format '{fmt}'."
+            )
+
+
+_SCHEMAS_BY_ID: Dict[int, PayloadSchema] = {}
+_SCHEMAS_BY_NAME: Dict[str, PayloadSchema] = {}
+
+
+def register_schema(schema: PayloadSchema) -> None:
+    """
+    Makes a schema available to encode_payload and decode_payload.
+
+    Args:
+        schema (PayloadSchema): The schema to register.
+
+    Raises:
+        ValueError: If the id or name is already taken by another schema.
+    """
+    if schema.schema_id in _SCHEMAS_BY_ID or schema.name in _SCHEMAS_BY_NAME:
+        raise ValueError(
+            f"Schema '{schema.name}' ({schema.schema_id}) is already registered."
+        )
+    _SCHEMAS_BY_ID[schema.schema_id] = schema
+    _SCHEMAS_BY_NAME[schema.name] = schema
+
+
+# Humidity/temperature reading with its send time (seconds since the epoch).
+register_schema(
+    PayloadSchema(1, "sensor", ("timestamp", "humidity", "temperature"), "dff")
+)
+
+
+def encode_payload(schema_name: str, values: Dict[str, Any]) -> bytes:
+    """
+    Packs a reading into the compact binary format.
+
+    Missing "timestamp" fields are filled with the current time.
+
+    Args:
+        schema_name (str): Name of a registered schema.
+        values (Dict[str, Any]): Field values keyed by name.
+
+    Returns:
+        bytes: The packed payload.
+    """
+    schema = _SCHEMAS_BY_NAME[schema_name]
+    if "timestamp" in schema.fields and "timestamp" not in values:
+        values = dict(values, timestamp=time.time())
+    header = _HEADER.pack(MAGIC, VERSION, schema.schema_id)
+    return header + schema.body.pack(*(values[field] for field in schema.fields))
+
+
+def is_packed(payload: bytes) -> bool:
+    """
+    Returns True if the payload uses the packed binary format.
+    """
+    return len(payload) >= _HEADER.size and payload[0] == MAGIC
+
+
+def decode_payload(payload: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Unpacks a payload produced by encode_payload.
+
+    Args:
+        payload (bytes): The raw MQTT payload.
+
+    Returns:
+        Optional[Dict[str, Any]]: The fields plus a "schema" entry, or None if the
+        payload is not in the packed format.
+
+    Raises:
+        ValueError: If the version or schema is unknown, or the payload is truncated.
+    """
+    if not is_packed(payload):
+        return None
+    _, version, schema_id = _HEADER.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"Unsupported payload version: {version}")
+    schema = _SCHEMAS_BY_ID.get(schema_id)
+    if schema is None:
+        raise ValueError(f"Unknown payload schema id: {schema_id}")
+    if len(payload) != _HEADER.size + schema.body.size:
+        raise ValueError(
+            f"Payload size {len(payload)} does not match schema '{schema.name}'."
+        )
+    values: Dict[str, Any] = dict(
+        zip(schema.fields, schema.body.unpack_from(payload, _HEADER.size))
+    )
+    values["schema"] = schema.name
+    return values
+
+
+def trace_payload(payload: Any, sequence: int, sent: Optional[float] = None) -> bytes:
+    """
+    Prefixes a payload with its send time and sequence number.
+
+    Args:
+        payload (Any): Text, bytes or a number, converted the way paho sends it.
+        sequence (int): Position of the message in its topic's stream (mod 2**32).
+        sent (Optional[float]): Send time in seconds since the epoch; defaults to now.
+
+    Returns:
+        bytes: The traced payload.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    elif isinstance(payload, (int, float)):
+        payload = str(payload).encode("ascii")
+    elif payload is None:
+        payload = b""
+    stamp = _TRACE.pack(
+        TRACE_MAGIC, time.time() if sent is None else sent, sequence & 0xFFFFFFFF
+    )
+    return stamp + bytes(payload)
+
+
+def untrace_payload(payload: bytes) -> Optional[Tuple[float, int, bytes]]:
+    """
+    Splits a payload produced by trace_payload.
+
+    Returns:
+        Optional[Tuple[float, int, bytes]]: Send time, sequence number and the
+        original payload, or None if the payload is not traced.
+    """
+    if len(payload) < _TRACE.size or payload[0] != TRACE_MAGIC:
+        return None
+    _, sent, sequence = _TRACE.unpack_from(payload)
+    return sent, sequence, payload[_TRACE.size :]
+
+
+def decode_any(payload: bytes) -> Union[str, Dict[str, Any]]:
+    """
+    Decodes a payload that may be either packed or plain UTF-8 text.
+
+    A trace prefix (see trace_payload) is skipped.
+
+    Args:
+        payload (bytes): The raw MQTT payload.
+
+    Returns:
+        Union[str, Dict[str, Any]]: The unpacked fields, or the decoded text.
+    """
+    traced = untrace_payload(payload)
+    if traced is not None:
+        payload = traced[2]
+    values = decode_payload(payload)
+    return values if values is not None else payload.decode()
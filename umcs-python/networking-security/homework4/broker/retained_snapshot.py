@@ -0,0 +1,129 @@
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, Tuple
+
+# File layout: header, then per topic a length-prefixed UTF-8 topic and payload.
+MAGIC = b"HSNP"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBI")  # magic, version, entry count
+_ENTRY = struct.Struct("<HI")  # topic length, payload length
+
+
+def _payload_bytes(payload: Any) -> bytes:
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    return str(payload).encode("utf-8")
+
+
+class RetainedSnapshot:
+    """
+    Last-known payload per topic, persisted to a compact binary file.
+
+    ``record`` is called for every publish and only replaces a dictionary entry;
+    ``save`` writes the whole table to a temporary file and renames it over the
+    snapshot, so a crash mid-write leaves the previous snapshot intact.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes an empty snapshot stored at `path`.
+
+        Args:
+            path (str): The snapshot file.
+        """
+        self.path = path
+        self._latest: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # Records made so far, and how many of them the file on disk includes.
+        self._recorded = 0
+        self._saved = 0
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def record(self, topic: str, payload: Any) -> None:
+        """
+        Remembers the latest payload published to a topic.
+        """
+        with self._lock:
+            self._latest[topic] = payload
+            self._recorded += 1
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Yields (topic, payload bytes) for every recorded topic.
+        """
+        with self._lock:
+            latest = list(self._latest.items())
+        for topic, payload in latest:
+            yield topic, _payload_bytes(payload)
+
+    def save(self) -> bool:
+        """
+        Writes the snapshot file if anything was recorded since the last save.
+
+        A failed write leaves the snapshot marked as changed, so the next
+        save tries again.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        with self._lock:
+            recorded = self._recorded
+            if recorded == self._saved:
+                return False
+        entries = list(self.items())
+        chunks = [_HEADER.pack(MAGIC, VERSION, len(entries))]
+        for topic, payload in entries:
+            encoded = topic.encode("utf-8")
+            chunks.append(_ENTRY.pack(len(encoded), len(payload)))
+            chunks.append(encoded)
+            chunks.append(payload)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(b"".join(chunks))
+        os.replace(temporary, self.path)
+        with self._lock:
+            # Records made while writing were not necessarily included.
+            self._saved = recorded
+        return True
+
+    def load(self) -> int:
+        """
+        Reads the snapshot file, replacing anything recorded so far.
+
+        Returns:
+            int: The number of topics loaded; 0 if the file does not exist.
+
+        Raises:
+            ValueError: If the file is not a snapshot or is truncated.
+        """
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0
+        if len(data) < _HEADER.size:
+            raise ValueError(f"Snapshot {self.path} is truncated.")
+        magic, version, count = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} state snapshot.")
+
+        latest: Dict[str, Any] = {}
+        offset = _HEADER.size
+        for _ in range(count):
+            if offset + _ENTRY.size > len(data):
+                raise ValueError(f"Snapshot {self.path} is truncated.")
+            topic_length, payload_length = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            end = offset + topic_length + payload_length
+            if end > len(data):
+                raise ValueError(f"Snapshot {self.path} is truncated.")
+            topic = data[offset : offset + topic_length].decode("utf-8")
+            latest[topic] = data[offset + topic_length : end]
+            offset = end
+        with self._lock:
+            self._latest = latest
+        return count
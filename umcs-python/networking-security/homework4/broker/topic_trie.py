@@ -0,0 +1,184 @@
+from typing import Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+SINGLE_LEVEL_WILDCARD = "+"
+MULTI_LEVEL_WILDCARD = "#"
+
+
+class _TrieNode(Generic[T]):
+    """
+    A single topic level in the trie.
+    """
+
+    __slots__ = ("children", "value", "has_value")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode[T]"] = {}
+        self.value: Optional[T] = None
+        self.has_value: bool = False
+
+
+class TopicTrie(Generic[T]):
+    """
+    Stores values keyed by MQTT topic filters and matches concrete topics against them.
+
+    Filters may contain the single-level wildcard ``+`` and a trailing multi-level
+    wildcard ``#``. Matching walks the trie one topic level at a time, so its cost
+    depends on the depth of the topic rather than on the number of stored filters.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty trie."""
+        self._root: _TrieNode[T] = _TrieNode()
+        self._size: int = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, topic_filter: str) -> bool:
+        node = self._find(topic_filter)
+        return node is not None and node.has_value
+
+    @staticmethod
+    def validate_filter(topic_filter: str) -> List[str]:
+        """
+        Splits a topic filter into levels, checking wildcard placement.
+
+        Args:
+            topic_filter (str): The MQTT topic filter.
+
+        Returns:
+            List[str]: The filter levels.
+
+        Raises:
+            ValueError: If the filter is empty or uses a wildcard incorrectly.
+        """
+        if not topic_filter:
+            raise ValueError("Topic filter must not be empty.")
+        levels = topic_filter.split("/")
+        for idx, level in enumerate(levels):
+            if MULTI_LEVEL_WILDCARD in level:
+                if level != MULTI_LEVEL_WILDCARD or idx != len(levels) - 1:
+                    raise ValueError(
+                        f"'#' must occupy the last level of the filter: {topic_filter}"
+                    )
+            elif SINGLE_LEVEL_WILDCARD in level and level != SINGLE_LEVEL_WILDCARD:
+                raise ValueError(
+                    f"'+' must occupy an entire level of the filter: {topic_filter}"
+                )
+        return levels
+
+    def insert(self, topic_filter: str, value: T) -> None:
+        """
+        Stores a value under a topic filter, replacing any previous value.
+
+        Args:
+            topic_filter (str): The MQTT topic filter (may contain wildcards).
+            value (T): The value to store.
+        """
+        node = self._root
+        for level in self.validate_filter(topic_filter):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _TrieNode()
+            node = child
+        if not node.has_value:
+            self._size += 1
+        node.value = value
+        node.has_value = True
+
+    def get(self, topic_filter: str) -> Optional[T]:
+        """
+        Returns the value stored under exactly this filter, if any.
+
+        Args:
+            topic_filter (str): The MQTT topic filter.
+
+        Returns:
+            Optional[T]: The stored value, or None.
+        """
+        node = self._find(topic_filter)
+        return node.value if node is not None and node.has_value else None
+
+    def remove(self, topic_filter: str) -> bool:
+        """
+        Removes the value stored under a topic filter and prunes empty branches.
+
+        Args:
+            topic_filter (str): The MQTT topic filter.
+
+        Returns:
+            bool: True if a value was removed.
+        """
+        path = [self._root]
+        for level in topic_filter.split("/"):
+            child = path[-1].children.get(level)
+            if child is None:
+                return False
+            path.append(child)
+
+        node = path[-1]
+        if not node.has_value:
+            return False
+        node.value = None
+        node.has_value = False
+        self._size -= 1
+
+        levels = topic_filter.split("/")
+        for idx in range(len(levels) - 1, -1, -1):
+            current = path[idx + 1]
+            if current.has_value or current.children:
+                break
+            del path[idx].children[levels[idx]]
+        return True
+
+    def match(self, topic: str) -> List[T]:
+        """
+        Returns the values of every stored filter that matches a concrete topic.
+
+        Args:
+            topic (str): The topic a message was published on.
+
+        Returns:
+            List[T]: Matching values, in no particular order.
+        """
+        levels = topic.split("/")
+        depth = len(levels)
+        # Topics starting with '$' are reserved and never match a leading wildcard.
+        system_topic = topic.startswith("$")
+        matches: List[T] = []
+        stack = [(self._root, 0)]
+
+        while stack:
+            node, idx = stack.pop()
+            wildcards_allowed = not (system_topic and idx == 0)
+
+            if wildcards_allowed:
+                multi = node.children.get(MULTI_LEVEL_WILDCARD)
+                # 'a/#' also matches the parent level 'a' itself.
+                if multi is not None and multi.has_value:
+                    matches.append(multi.value)
+
+            if idx == depth:
+                if node.has_value:
+                    matches.append(node.value)
+                continue
+
+            exact = node.children.get(levels[idx])
+            if exact is not None:
+                stack.append((exact, idx + 1))
+            if wildcards_allowed:
+                single = node.children.get(SINGLE_LEVEL_WILDCARD)
+                if single is not None:
+                    stack.append((single, idx + 1))
+
+        return matches
+
+    def _find(self, topic_filter: str) -> Optional[_TrieNode[T]]:
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.get(level)
+            if node is None:
+                return None
+        return node
@@ -0,0 +1,8 @@
+# config/__init__.py
+
+from .simulator_config import SimulatorConfig, load_config
+
+__all__ = [
+    "SimulatorConfig",
+    "load_config",
+]
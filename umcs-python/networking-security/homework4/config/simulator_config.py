@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+from logging import getLevelName
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:  # pragma: no cover - older interpreters
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from simulation.fleet import FleetSpec
+
+ENV_PREFIX = "MQTT_SIM_"
+
+# Setting name -> (type, default). None as a default means "ask interactively".
+SETTINGS = {
+    "broker": (str, None),
+    "port": (int, 1883),
+    "device": (str, None),
+    "fleet": (dict, None),
+    "intervals": (dict, None),
+    "jitter": (float, 0.1),
+    "report_interval": (float, 10.0),
+    "sampler": (str, None),
+    "packed": (bool, False),
+    "snapshot_every": (int, None),
+    "activity": (float, 1.0),
+    "duration": (float, None),
+    "shards": (int, 1),
+    "pool_size": (int, 1),
+    "coalesce_window": (float, None),
+    "dispatch_workers": (int, 0),
+    "async_publish": (bool, False),
+    "snapshot_path": (str, None),
+    "snapshot_interval": (float, 5.0),
+    "record_path": (str, None),
+    "aggregate_window": (int, None),
+    "aggregate_interval": (float, 10.0),
+    "rules_path": (str, None),
+    "load_rate": (float, None),
+    "load_mix": (dict, None),
+    "trace": (bool, False),
+    "latency_interval": (float, 10.0),
+    "metrics_port": (int, None),
+    "metrics_path": (str, None),
+    "metrics_interval": (float, 10.0),
+    "dashboard": (bool, False),
+    "dashboard_fps": (float, 10.0),
+    "log_level": (str, "INFO"),
+    "log_writer": (str, "print"),
+    "interactive": (bool, True),
+}
+
+# Values accepted by the log_writer setting.
+LOG_WRITERS = ("print", "threaded")
+
+# Features of the parent process's own MQTT connection, which sharded runs do
+# not open; they cannot be combined with shards > 1.
+NOT_SHARDED = (
+    "dispatch_workers",
+    "async_publish",
+    "snapshot_path",
+    "record_path",
+    "aggregate_window",
+    "rules_path",
+    "metrics_port",
+    "metrics_path",
+    "dashboard",
+)
+
+
+class SimulatorConfig:
+    """
+    Settings for an unattended (or interactive) simulator run.
+
+    Values are resolved in increasing priority: built-in defaults, a TOML or JSON
+    config file, ``MQTT_SIM_*`` environment variables, then command-line flags.
+    A setting left as None (broker, device) falls back to the interactive prompt
+    unless ``interactive`` is False.
+    """
+
+    def __init__(self, **values):
+        for name, (_, default) in SETTINGS.items():
+            setattr(self, name, values.get(name, default))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in SETTINGS)
+        return f"SimulatorConfig({fields})"
+
+    def require(self, name):
+        """
+        Return a setting, failing if it is unset and prompting is disabled.
+
+        Raises:
+            ValueError: If the setting is None and the run is non-interactive.
+        """
+        value = getattr(self, name)
+        if value is None and not self.interactive:
+            raise ValueError(
+                f"'{name}' must be set via --{name.replace('_', '-')}, "
+                f"{ENV_PREFIX}{name.upper()} or the config file in non-interactive mode."
+            )
+        return value
+
+    def missing(self):
+        """
+        Return the settings a non-interactive run needs but that are still unset.
+
+        Sharded runs take their devices from the fleet, so only the broker is needed.
+        """
+        if self.interactive:
+            return []
+        needed = ("broker",) if self.shards > 1 else ("broker", "device")
+        return [name for name in needed if getattr(self, name) is None]
+
+    def unsupported(self):
+        """Return the settings that are set but do not apply to this run."""
+        if self.shards <= 1:
+            return []
+        return [
+            name for name in NOT_SHARDED if getattr(self, name) != SETTINGS[name][1]
+        ]
+
+
+def _convert(name, value):
+    """Convert a raw string or parsed value to the setting's type."""
+    kind, _ = SETTINGS[name]
+    if kind is int and isinstance(value, (bool, float)):
+        # int() would truncate 1.5 to 1; only whole numbers are accepted.
+        if isinstance(value, bool) or not value.is_integer():
+            raise ValueError(f"Invalid int for '{name}': {value!r}")
+        return int(value)
+    if value is None or isinstance(value, kind):
+        return value
+    if kind is bool:
+        if isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered in ("1", "true", "yes", "on"):
+                return True
+            if lowered in ("0", "false", "no", "off"):
+                return False
+        raise ValueError(f"Invalid boolean for '{name}': {value!r}")
+    if kind is dict:
+        # Dictionaries given as strings may be inline JSON or a path to a JSON/TOML file.
+        value = value.strip()
+        if not value.startswith("{"):
+            return load_file(value)
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON for '{name}': {e}") from None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {kind.__name__} for '{name}': {value!r}") from None
+
+
+def load_file(path):
+    """
+    Read a TOML or JSON config file.
+
+    Args:
+        path (str): Path ending in .toml or .json.
+
+    Returns:
+        dict: The parsed settings.
+    """
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError("Reading TOML needs Python 3.11+ or the 'tomli' package.")
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def build_parser():
+    """Return the argument parser for the simulator's command-line flags."""
+    parser = argparse.ArgumentParser(
+        description="Simulate smart-home devices over MQTT."
+    )
+    parser.add_argument("--config", help="TOML or JSON file with simulator settings")
+    parser.add_argument(
+        "--broker", help="MQTT broker address ('loopback' for in-process)"
+    )
+    parser.add_argument("--port", help="MQTT broker port")
+    parser.add_argument(
+        "--device", help="device type to simulate, e.g. 'Door Sensor' or 'All devices'"
+    )
+    parser.add_argument(
+        "--fleet", help="fleet spec as inline JSON or a JSON/TOML file path"
+    )
+    parser.add_argument(
+        "--intervals", help="per-device-type step intervals in seconds (JSON)"
+    )
+    parser.add_argument(
+        "--jitter", help="fraction of each interval used as random jitter"
+    )
+    parser.add_argument(
+        "--report-interval", help="seconds between scheduler lag reports"
+    )
+    parser.add_argument(
+        "--sampler", help="fleet sampler model: uniform, random_walk or diurnal"
+    )
+    parser.add_argument(
+        "--packed", help="publish packed binary sensor payloads (true/false)"
+    )
+    parser.add_argument(
+        "--snapshot-every",
+        help="publish door/light/vacuum state only on change, plus every N steps",
+    )
+    parser.add_argument(
+        "--activity", help="chance per step that a door/light/vacuum device changes"
+    )
+    parser.add_argument("--duration", help="stop after this many seconds")
+    parser.add_argument(
+        "--shards", help="number of worker processes to split the fleet across"
+    )
+    parser.add_argument(
+        "--pool-size", help="number of MQTT connections to spread publishes over"
+    )
+    parser.add_argument(
+        "--coalesce-window",
+        help="seconds to buffer publishes, keeping the latest message per topic",
+    )
+    parser.add_argument(
+        "--dispatch-workers",
+        help="threads running subscription callbacks (0 = on the network thread)",
+    )
+    parser.add_argument(
+        "--async-publish",
+        help="run the devices as asyncio tasks publishing through a bounded "
+        "queue (true/false)",
+    )
+    parser.add_argument(
+        "--snapshot-path",
+        help="file of last-known state per topic, republished as retained on "
+        "start; publishes are retained while it is set",
+    )
+    parser.add_argument(
+        "--snapshot-interval", help="seconds between snapshot file saves"
+    )
+    parser.add_argument(
+        "--record-path", help="directory to record received messages to"
+    )
+    parser.add_argument(
+        "--aggregate-window",
+        help="publish rolling sensor stats over this many samples per device",
+    )
+    parser.add_argument(
+        "--aggregate-interval", help="seconds between rolling stats rollups"
+    )
+    parser.add_argument(
+        "--rules-path",
+        help="file of rules, one per line: if <topic> == <value> [and ...] "
+        "then publish <topic> <payload>",
+    )
+    parser.add_argument(
+        "--load-rate",
+        help="publish at this many msg/s in total instead of per-device intervals",
+    )
+    parser.add_argument(
+        "--load-mix", help="relative share of messages per device type (JSON)"
+    )
+    parser.add_argument(
+        "--trace",
+        help="stamp payloads with send time and sequence number and report "
+        "end-to-end latency, loss and reordering (true/false)",
+    )
+    parser.add_argument("--latency-interval", help="seconds between latency reports")
+    parser.add_argument(
+        "--metrics-port",
+        help="serve publish/dispatch metrics at http://127.0.0.1:<port>/metrics",
+    )
+    parser.add_argument(
+        "--metrics-path", help="file to write publish/dispatch metrics to"
+    )
+    parser.add_argument(
+        "--metrics-interval", help="seconds between metrics file writes"
+    )
+    parser.add_argument(
+        "--dashboard",
+        help="show a live per-device traffic view instead of printing messages "
+        "(true/false)",
+    )
+    parser.add_argument("--dashboard-fps", help="maximum dashboard redraws per second")
+    parser.add_argument("--log-level", help="DEBUG, INFO, WARNING or ERROR")
+    parser.add_argument(
+        "--log-writer",
+        help="'print' writes status output as it happens, 'threaded' hands it to "
+        "a background writer thread",
+    )
+    parser.add_argument(
+        "--non-interactive",
+        dest="interactive",
+        action="store_const",
+        const="false",
+        help="never prompt; fail if a required setting is missing",
+    )
+    return parser
+
+
+def load_config(argv=None, environ=None):
+    """
+    Resolve the simulator settings from a file, the environment and the command line.
+
+    Args:
+        argv (list, optional): Command-line arguments; defaults to sys.argv[1:].
+        environ (dict, optional): Environment variables; defaults to os.environ.
+
+    Returns:
+        SimulatorConfig: The resolved settings.
+
+    Invalid values and settings missing from a non-interactive run are reported
+    through the parser (usage and exit status 2), before anything connects.
+    """
+    environ = os.environ if environ is None else environ
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+
+    def convert(name, value, source):
+        try:
+            return _convert(name, value)
+        except (ValueError, OSError) as e:
+            parser.error(f"{source}: {e}")
+
+    values = {}
+    config_path = args.pop("config") or environ.get(f"{ENV_PREFIX}CONFIG")
+    if config_path:
+        try:
+            file_values = load_file(config_path)
+        except (ValueError, OSError) as e:
+            parser.error(f"{config_path}: {e}")
+        for name, value in file_values.items():
+            name = name.replace("-", "_")
+            if name not in SETTINGS:
+                parser.error(f"Unknown setting '{name}' in {config_path}")
+            values[name] = convert(name, value, config_path)
+
+    for name in SETTINGS:
+        env_name = f"{ENV_PREFIX}{name.upper()}"
+        if environ.get(env_name) is not None:
+            values[name] = convert(name, environ[env_name], env_name)
+        if args.get(name) is not None:
+            values[name] = convert(name, args[name], f"--{name.replace('_', '-')}")
+
+    config = SimulatorConfig(**values)
+    if config.fleet is not None:
+        try:
+            FleetSpec.from_dict(config.fleet)
+        except ValueError as e:
+            parser.error(f"fleet: {e}")
+    if not isinstance(getLevelName(config.log_level.upper()), int):
+        parser.error(f"Unknown log level: {config.log_level}")
+    if config.log_writer not in LOG_WRITERS:
+        parser.error(
+            f"Unknown log writer: {config.log_writer} "
+            f"(expected {' or '.join(LOG_WRITERS)})"
+        )
+    unsupported = config.unsupported()
+    if unsupported:
+        parser.error(
+            "--shards cannot be combined with "
+            + ", ".join(f"--{name.replace('_', '-')}" for name in unsupported)
+        )
+    if config.async_publish and (config.pool_size > 1 or config.load_rate):
+        parser.error(
+            "--async-publish cannot be combined with --pool-size or --load-rate"
+        )
+    missing = config.missing()
+    if missing:
+        parser.error(
+            "non-interactive runs need "
+            + ", ".join(f"--{name.replace('_', '-')}" for name in missing)
+            + f" (or {ENV_PREFIX}* variables or the config file)"
+        )
+    return config
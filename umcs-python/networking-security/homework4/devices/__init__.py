@@ -6,6 +6,8 @@ from .door_sensor import DoorSensor
 from .indoor_sensor import IndoorSensor
 from .light_switch import LightSwitch
 from .outdoor_sensor import OutdoorSensor
+from .sensor_sampler import SensorFleetSampler
+from .state_store import DeviceStateStore, StatefulDevice
 from .vacuum_cleaner import VacuumCleaner
 
 __all__ = [
@@ -15,5 +17,8 @@ __all__ = [
     "VacuumCleaner",
     "IndoorSensor",
     "OutdoorSensor",
+    "SensorFleetSampler",
+    "DeviceStateStore",
+    "StatefulDevice",
     "DeviceType",
 ]
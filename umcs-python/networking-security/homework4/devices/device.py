@@ -1,4 +1,12 @@
+from output.output_sink import get_sink
+
+
 class Device:
+    # Slots keep per-device memory small when simulating large fleets.
+    __slots__ = ("group_id", "device_type", "device_id", "powered")
+
+    DEVICE_TYPE = None  # Topic level naming the type; set by each device class
+
     def __init__(self, group_id, device_type, device_id):
         self.group_id = group_id
         self.device_type = device_type
@@ -8,9 +16,9 @@ class Device:
     def power_on(self):
         """Turn on the device."""
         self.powered = True
-        print(f"{self.device_type} {self.device_id} powered ON.")
+        get_sink().debug("%s %s powered ON.", self.device_type, self.device_id)
 
     def power_off(self):
         """Turn off the device."""
         self.powered = False
-        print(f"{self.device_type} {self.device_id} powered OFF.")
+        get_sink().debug("%s %s powered OFF.", self.device_type, self.device_id)
@@ -1,21 +1,47 @@
-from .device import Device  # Import the base Device class
+import random
+from enum import IntEnum
 
+from output.output_sink import get_sink
 
-class DoorSensor(Device):
-    def __init__(self, group_id, device_id):
-        super().__init__(group_id, "door_sensor", device_id)
-        self.state = "CLOSED"
+from .state_store import StatefulDevice
+
+
+class DoorState(IntEnum):
+    CLOSED = 0
+    OPEN = 1
+
+
+class DoorSensor(StatefulDevice):
+    __slots__ = ()
+
+    DEVICE_TYPE = "door_sensor"
+    State = DoorState
+
+    def __init__(self, group_id, device_id, store=None):
+        super().__init__(group_id, self.DEVICE_TYPE, device_id, "CLOSED", store)
 
     def open_door(self):
         if self.powered:
             self.state = "OPEN"
-            print(f"Door Sensor {self.device_id}: Door is OPEN.")
+            get_sink().debug("Door Sensor %s: Door is OPEN.", self.device_id)
         else:
-            print(f"Door Sensor {self.device_id} cannot operate. Power is OFF.")
+            get_sink().debug(
+                "Door Sensor %s cannot operate. Power is OFF.", self.device_id
+            )
 
     def close_door(self):
         if self.powered:
             self.state = "CLOSED"
-            print(f"Door Sensor {self.device_id}: Door is CLOSED.")
+            get_sink().debug("Door Sensor %s: Door is CLOSED.", self.device_id)
+        else:
+            get_sink().debug(
+                "Door Sensor %s cannot operate. Power is OFF.", self.device_id
+            )
+
+    def generate_state(self):
+        """Randomly open or close the door and return the resulting state."""
+        if random.random() < 0.5:
+            self.open_door()
         else:
-            print(f"Door Sensor {self.device_id} cannot operate. Power is OFF.")
+            self.close_door()
+        return self.state
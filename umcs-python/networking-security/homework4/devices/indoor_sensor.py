@@ -4,8 +4,14 @@ from .device import Device
 
 
 class IndoorSensor(Device):
+    __slots__ = ("sampler", "sample_index")
+
+    DEVICE_TYPE = "indoor_sensor"
+
     def __init__(self, group_id, device_id):
-        super().__init__(group_id, "indoor_sensor", device_id)
+        super().__init__(group_id, self.DEVICE_TYPE, device_id)
+        self.sampler = None  # Optional SensorFleetSampler shared by the fleet
+        self.sample_index = 0
 
     def read_humidity(self):
         """Generate and return simulated humidity data."""
@@ -17,6 +23,8 @@ class IndoorSensor(Device):
 
     def generate_data(self):
         """Combine humidity and temperature readings into a dictionary."""
+        if self.sampler is not None:
+            return self.sampler.reading(self.sample_index)
         return {
             "humidity": self.read_humidity(),
             "temperature": self.read_temperature(),
@@ -1,24 +1,50 @@
-from .device import Device  # Import the base Device class
+from enum import IntEnum
 
+from output.output_sink import get_sink
 
-class LightSwitch(Device):
-    def __init__(self, group_id, device_id):
-        super().__init__(group_id, "light_switch", device_id)
-        self.state = "OFF"
+from .state_store import StatefulDevice
+
+
+class SwitchState(IntEnum):
+    OFF = 0
+    ON = 1
+
+
+class LightSwitch(StatefulDevice):
+    __slots__ = ()
+
+    DEVICE_TYPE = "light_switch"
+    State = SwitchState
+
+    def __init__(self, group_id, device_id, store=None):
+        super().__init__(group_id, self.DEVICE_TYPE, device_id, "OFF", store)
 
     def toggle(self):
         if self.powered:
             self.state = "ON" if self.state == "OFF" else "OFF"
-            print(f"Light Switch {self.device_id} toggled to {self.state}.")
+            get_sink().debug(
+                "Light Switch %s toggled to %s.", self.device_id, self.state
+            )
         else:
-            print(f"Light Switch {self.device_id} cannot toggle. Power is OFF.")
+            get_sink().debug(
+                "Light Switch %s cannot toggle. Power is OFF.", self.device_id
+            )
 
     def set_state(self, state):
         if self.powered:
             if state.upper() in ["ON", "OFF"]:
                 self.state = state.upper()
-                print(f"Light Switch {self.device_id} set to {self.state}.")
+                get_sink().debug(
+                    "Light Switch %s set to %s.", self.device_id, self.state
+                )
             else:
-                print("Invalid state. Use 'ON' or 'OFF'.")
+                get_sink().warning("Invalid state. Use 'ON' or 'OFF'.")
         else:
-            print(f"Light Switch {self.device_id} cannot change state. Power is OFF.")
+            get_sink().debug(
+                "Light Switch %s cannot change state. Power is OFF.", self.device_id
+            )
+
+    def toggle_state(self):
+        """Toggle the switch and return the resulting state."""
+        self.toggle()
+        return self.state
@@ -0,0 +1,192 @@
+import math
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to the random module
+    np = None
+
+SECONDS_PER_DAY = 86400.0
+
+
+class SensorFleetSampler:
+    """
+    Generates humidity and temperature for a whole fleet of sensors at once.
+
+    Sensors are attached to the sampler and read their own slot with ``reading``.
+    The first read after a tick boundary regenerates every sensor's values in a
+    single vectorized call, so the Python work per sensor read is one index lookup.
+
+    Models:
+        uniform: independent uniform values in range, like ``generate_data``.
+        random_walk: each sensor drifts from its previous value.
+        diurnal: a daily sine cycle (temperature peaks mid-afternoon, humidity
+            moves the other way) with a per-sensor offset and noise.
+    """
+
+    MODELS = ("uniform", "random_walk", "diurnal")
+
+    def __init__(
+        self,
+        model="uniform",
+        tick=1.0,
+        humidity_range=(20.0, 80.0),
+        temperature_range=(-10.0, 40.0),
+        seed=None,
+        clock=time.time,
+    ):
+        """
+        Initializes a sampler with no sensors attached.
+
+        Args:
+            model (str): One of MODELS.
+            tick (float): Seconds between fleet-wide regenerations.
+            humidity_range (tuple): Min and max humidity in %.
+            temperature_range (tuple): Min and max temperature in °C.
+            seed (int, optional): Seed for reproducible samples.
+            clock (Callable[[], float]): Wall-clock time source (used for the diurnal phase).
+        """
+        if model not in self.MODELS:
+            raise ValueError(
+                f"Unknown sampler model '{model}'. Use one of {self.MODELS}."
+            )
+        self.model = model
+        self.tick = tick
+        self.humidity_range = humidity_range
+        self.temperature_range = temperature_range
+        self.clock = clock
+        self.count = 0
+        self._rng = (
+            np.random.default_rng(seed) if np is not None else random.Random(seed)
+        )
+        self._tick_index = None
+        self._humidity = None
+        self._temperature = None
+        self._offsets = None
+
+    def attach(self, sensor):
+        """
+        Bind a sensor to the next free slot of the sampler.
+
+        Args:
+            sensor: An IndoorSensor or OutdoorSensor.
+        """
+        sensor.sampler = self
+        sensor.sample_index = self.count
+        self.count += 1
+        self._tick_index = None  # Fleet size changed; regenerate on next read
+
+    def reading(self, index):
+        """
+        Return the current readings for one sensor slot.
+
+        Args:
+            index (int): The sensor's slot.
+
+        Returns:
+            dict: Humidity and temperature for the sensor.
+        """
+        now = self.clock()
+        tick_index = int(now // self.tick)
+        if (
+            tick_index != self._tick_index
+            or self._humidity is None
+            or index >= len(self._humidity)
+        ):
+            self.sample(now)
+            self._tick_index = tick_index
+        return {
+            "humidity": float(self._humidity[index]),
+            "temperature": float(self._temperature[index]),
+        }
+
+    def sample(self, now=None):
+        """
+        Regenerate readings for every attached sensor.
+
+        Args:
+            now (float, optional): Current wall-clock time; defaults to the sampler clock.
+
+        Returns:
+            tuple: (humidity values, temperature values), one entry per sensor.
+        """
+        now = self.clock() if now is None else now
+        if np is not None:
+            self._sample_numpy(now)
+        else:
+            self._sample_python(now)
+        return self._humidity, self._temperature
+
+    def _resized(self):
+        return self._humidity is None or len(self._humidity) != self.count
+
+    def _diurnal_phase(self, now):
+        # 0 at 09:00 and peaks at 15:00 (UTC) for temperature.
+        return math.sin(
+            2 * math.pi * ((now % SECONDS_PER_DAY) / SECONDS_PER_DAY - 0.375)
+        )
+
+    def _sample_numpy(self, now):
+        rng = self._rng
+        h_low, h_high = self.humidity_range
+        t_low, t_high = self.temperature_range
+        n = self.count
+
+        resized = self._resized()
+        if resized:
+            self._offsets = rng.normal(0.0, 1.0, n)
+        if self.model == "uniform" or (resized and self.model == "random_walk"):
+            self._humidity = rng.uniform(h_low, h_high, n)
+            self._temperature = rng.uniform(t_low, t_high, n)
+            return
+
+        if self.model == "random_walk":
+            self._humidity += rng.normal(0.0, 0.5, n)
+            self._temperature += rng.normal(0.0, 0.1, n)
+        else:
+            phase = self._diurnal_phase(now)
+            t_mid, t_amp = (t_low + t_high) / 2, (t_high - t_low) / 4
+            h_mid, h_amp = (h_low + h_high) / 2, (h_high - h_low) / 4
+            self._temperature = (
+                t_mid + t_amp * phase + 2.0 * self._offsets + rng.normal(0.0, 0.2, n)
+            )
+            self._humidity = (
+                h_mid - h_amp * phase - 3.0 * self._offsets + rng.normal(0.0, 0.5, n)
+            )
+
+        np.clip(self._humidity, h_low, h_high, out=self._humidity)
+        np.clip(self._temperature, t_low, t_high, out=self._temperature)
+
+    def _sample_python(self, now):
+        rng = self._rng
+        h_low, h_high = self.humidity_range
+        t_low, t_high = self.temperature_range
+        n = self.count
+
+        resized = self._resized()
+        if resized:
+            self._offsets = [rng.gauss(0.0, 1.0) for _ in range(n)]
+        if self.model == "uniform" or (resized and self.model == "random_walk"):
+            self._humidity = [rng.uniform(h_low, h_high) for _ in range(n)]
+            self._temperature = [rng.uniform(t_low, t_high) for _ in range(n)]
+            return
+
+        if self.model == "random_walk":
+            humidity = [h + rng.gauss(0.0, 0.5) for h in self._humidity]
+            temperature = [t + rng.gauss(0.0, 0.1) for t in self._temperature]
+        else:
+            phase = self._diurnal_phase(now)
+            t_mid, t_amp = (t_low + t_high) / 2, (t_high - t_low) / 4
+            h_mid, h_amp = (h_low + h_high) / 2, (h_high - h_low) / 4
+            temperature = [
+                t_mid + t_amp * phase + 2.0 * o + rng.gauss(0.0, 0.2)
+                for o in self._offsets
+            ]
+            humidity = [
+                h_mid - h_amp * phase - 3.0 * o + rng.gauss(0.0, 0.5)
+                for o in self._offsets
+            ]
+
+        self._humidity = [min(max(h, h_low), h_high) for h in humidity]
+        self._temperature = [min(max(t, t_low), t_high) for t in temperature]
@@ -0,0 +1,101 @@
+from array import array
+
+from .device import Device
+
+
+class DeviceStateStore:
+    """
+    Central table of discrete device states, one byte per device.
+
+    Devices register a slot and store their state as the integer code of an
+    IntEnum. Writing a different code marks the slot dirty, so simulations can
+    publish only devices whose state changed since they last published.
+
+    Whoever creates a fleet owns its store (see SimulationController), so the
+    table is freed together with the devices.
+    """
+
+    def __init__(self):
+        self.codes = array("B")
+        self._dirty = bytearray()
+        self.dirty_count = 0
+
+    def __len__(self):
+        return len(self.codes)
+
+    def add(self, code):
+        """
+        Register a device with an initial state code.
+
+        New slots start dirty so the initial state is published once.
+
+        Returns:
+            int: The device's slot.
+        """
+        self.codes.append(code)
+        self._dirty.append(1)
+        self.dirty_count += 1
+        return len(self.codes) - 1
+
+    def set(self, slot, code):
+        """Store a state code, marking the slot dirty if it changed. Returns True on change."""
+        if self.codes[slot] == code:
+            return False
+        self.codes[slot] = code
+        if not self._dirty[slot]:
+            self._dirty[slot] = 1
+            self.dirty_count += 1
+        return True
+
+    def take_dirty(self, slot):
+        """Return whether the slot changed since the last call, clearing its flag."""
+        if not self._dirty[slot]:
+            return False
+        self._dirty[slot] = 0
+        self.dirty_count -= 1
+        return True
+
+    def dirty_slots(self):
+        """Return the slots changed since their flags were last cleared."""
+        return [slot for slot, dirty in enumerate(self._dirty) if dirty]
+
+    def count_codes(self):
+        """Return how many devices are in each state code."""
+        counts = {}
+        for code in self.codes:
+            counts[code] = counts.get(code, 0) + 1
+        return counts
+
+
+class StatefulDevice(Device):
+    """
+    Base class for devices whose state is one of a fixed set of names.
+
+    Subclasses set ``State`` to an IntEnum. ``state`` reads and writes the name
+    (e.g. "OPEN") while the store holds only the enum's code. A device
+    created without a store gets a private one-slot store of its own.
+    """
+
+    __slots__ = ("store", "slot")
+
+    State = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.State is not None:
+            # Plain lookups are cheaper than constructing enum members on every access.
+            cls._state_names = tuple(member.name for member in cls.State)
+            cls._state_codes = {member.name: int(member) for member in cls.State}
+
+    def __init__(self, group_id, device_type, device_id, initial_state, store=None):
+        super().__init__(group_id, device_type, device_id)
+        self.store = store if store is not None else DeviceStateStore()
+        self.slot = self.store.add(self._state_codes[initial_state])
+
+    @property
+    def state(self):
+        return self._state_names[self.store.codes[self.slot]]
+
+    @state.setter
+    def state(self, name):
+        self.store.set(self.slot, self._state_codes[name])
@@ -1,21 +1,44 @@
-from .device import Device  # Import the base Device class
+from enum import IntEnum
 
+from output.output_sink import get_sink
 
-class VacuumCleaner(Device):
-    def __init__(self, group_id, device_id):
-        super().__init__(group_id, "vacuum", device_id)
-        self.state = "IDLE"
+from .state_store import StatefulDevice
+
+
+class VacuumState(IntEnum):
+    IDLE = 0
+    CLEANING = 1
+
+
+class VacuumCleaner(StatefulDevice):
+    __slots__ = ()
+
+    DEVICE_TYPE = "vacuum"
+    State = VacuumState
+
+    def __init__(self, group_id, device_id, store=None):
+        super().__init__(group_id, self.DEVICE_TYPE, device_id, "IDLE", store)
 
     def start_cleaning(self):
         if self.powered:
             self.state = "CLEANING"
-            print(f"Vacuum {self.device_id} is now cleaning.")
+            get_sink().debug("Vacuum %s is now cleaning.", self.device_id)
         else:
-            print(f"Vacuum {self.device_id} cannot clean. Power is OFF.")
+            get_sink().debug("Vacuum %s cannot clean. Power is OFF.", self.device_id)
 
     def stop_cleaning(self):
         if self.powered and self.state == "CLEANING":
             self.state = "IDLE"
-            print(f"Vacuum {self.device_id} has stopped cleaning.")
+            get_sink().debug("Vacuum %s has stopped cleaning.", self.device_id)
+        else:
+            get_sink().debug(
+                "Vacuum %s is already idle or not powered.", self.device_id
+            )
+
+    def generate_command(self):
+        """Alternate between cleaning and idling and return the resulting state."""
+        if self.state == "CLEANING":
+            self.stop_cleaning()
         else:
-            print(f"Vacuum {self.device_id} is already idle or not powered.")
+            self.start_cleaning()
+        return self.state
@@ -1,58 +1,272 @@
+import asyncio
+import sys
+import threading
+from logging import getLevelName
+
+from analytics import LatencyTracker, RollingAggregator, RuleEngine
+from broker.async_mqtt_manager import AsyncMQTTManager
+from broker.client_pool import PooledMQTTManager
+from broker.metrics import MetricsDump, MetricsServer
 from broker.mqtt_manager import MQTTManager
-from menu import DeviceSelector
+from config import load_config
+from menu import DeviceSelector, TrafficDashboard
+from recording import TelemetryRecorder
+from output.output_sink import NullSink, PrintSink, ThreadedWriterSink, set_sink
+from simulation.fleet import FleetSpec
+from simulation.sharded_runner import ShardedRunner
 from simulation.simulation_controller import SimulationController
 
 
-def main():
+def main(argv=None):
     """
     Main function to initialize the MQTT manager, handle user input, and control simulations.
+
+    Settings come from command-line flags, MQTT_SIM_* environment variables or a
+    config file (see config.simulator_config); anything left unset is asked for
+    interactively.
+
+    Args:
+        argv (list, optional): Command-line arguments; defaults to sys.argv[1:].
     """
+    config = load_config(argv)
+    level = getLevelName(config.log_level.upper())  # Validated by load_config
+    set_sink(status_sink(config, level))
+
+    if config.shards > 1:
+        succeeded = run_sharded(config)
+        set_sink(PrintSink(level=level))  # Writes out what a threaded sink still holds
+        if not succeeded:
+            sys.exit(1)
+        return
+
     print("=== MQTT Broker Connection ===")
 
-    # Step 1: Initialize the MQTT Manager (prompts user for broker details)
-    mqtt_manager = MQTTManager()
+    # Step 1: Initialize the MQTT Manager (prompts for broker details unless configured)
+    if config.pool_size > 1:
+        mqtt_manager = PooledMQTTManager(
+            broker=config.require("broker"),
+            port=config.port,
+            pool_size=config.pool_size,
+            coalesce_window=config.coalesce_window,
+            dispatch_workers=config.dispatch_workers,
+            snapshot_path=config.snapshot_path,
+            snapshot_interval=config.snapshot_interval,
+            trace=config.trace,
+        )
+    else:
+        # The asyncio variant also publishes synchronously, e.g. for rules and stats
+        manager_class = AsyncMQTTManager if config.async_publish else MQTTManager
+        mqtt_manager = manager_class(
+            broker=config.require("broker"),
+            port=config.port,
+            coalesce_window=config.coalesce_window,
+            dispatch_workers=config.dispatch_workers,
+            snapshot_path=config.snapshot_path,
+            snapshot_interval=config.snapshot_interval,
+            trace=config.trace,
+        )
     mqtt_manager.connect()
     mqtt_manager.start()
 
-    # Step 2: Display device selection menu
-    selector = DeviceSelector()
+    # Step 2: Use the configured device or display the device selection menu
+    selector = DeviceSelector(config.device, config.interactive)
     selected_device = selector.get_selection()
     print(f"You selected: {selected_device}")
 
     # Step 3: Initialize the Simulation Controller
-    controller = SimulationController(mqtt_manager)
+    fleet = FleetSpec.from_dict(config.fleet) if config.fleet else None
+    if fleet is not None and selected_device != "All devices":
+        fleet = fleet.only(selected_device)
+    controller = SimulationController(
+        mqtt_manager,
+        fleet=fleet,
+        jitter=config.jitter,
+        report_interval=config.report_interval,
+        sampler_model=config.sampler,
+        packed_payloads=config.packed,
+        intervals=config.intervals,
+        snapshot_every=config.snapshot_every,
+        activity=config.activity,
+    )
 
     # Step 4: Subscribe to appropriate topics
     if selected_device == "All devices":
         # Subscribe to the root topic to listen to all messages
-        mqtt_manager.subscribe(
-            "home/#", lambda client, userdata, message: print_message(message)
-        )
+        topic_filter = "home/#"
     else:
         # Subscribe to topics for the selected device
-        base_topic = f"home/{selected_device.replace(' ', '_').lower()}/#"
-        mqtt_manager.subscribe(
-            base_topic, lambda client, userdata, message: print_message(message)
+        topic_filter = controller.topic_filter(selected_device)
+    if not config.dashboard:
+        mqtt_manager.subscribe(topic_filter, print_message, with_topic=True)
+
+    recorder = None
+    if config.record_path:
+        # Keep every received message in a columnar log (see recording.TelemetryReader)
+        recorder = TelemetryRecorder(config.record_path)
+        mqtt_manager.subscribe(topic_filter, recorder.record, with_topic=True)
+
+    aggregator = None
+    if config.aggregate_window:
+        # Publish rolling min/max/mean/percentiles on home/<group>/.../stats
+        aggregator = RollingAggregator(
+            mqtt_manager, config.aggregate_window, config.aggregate_interval
+        )
+        aggregator.attach(topic_filter)
+        aggregator.start()
+
+    rules = None
+    if config.rules_path:
+        # React to device state, e.g. switch a light on when a door opens
+        rules = RuleEngine(mqtt_manager)
+        with open(config.rules_path, encoding="utf-8") as rules_file:
+            rules.load(rules_file)
+        rules.attach(topic_filter)
+
+    metrics_server = metrics_dump = None
+    if config.metrics_port is not None:
+        # Prometheus-style text, e.g. curl http://127.0.0.1:<port>/metrics
+        metrics_server = MetricsServer(mqtt_manager.metrics, config.metrics_port)
+        metrics_server.start()
+    if config.metrics_path:
+        metrics_dump = MetricsDump(
+            mqtt_manager.metrics, config.metrics_path, config.metrics_interval
         )
+        metrics_dump.start()
+
+    latency = None
+    if config.trace:
+        # Measure publish-to-receive latency, loss and reordering per device type
+        latency = LatencyTracker(mqtt_manager, config.latency_interval)
+        latency.attach(mqtt_manager)
+        latency.start()
+
+    dashboard = None
+    if config.dashboard:
+        # Live per-device view; attached after the tracker so both get trace stamps
+        dashboard = TrafficDashboard(config.dashboard_fps)
+        dashboard.attach(mqtt_manager, topic_filter)
 
     # Step 5: Start the simulation
-    if selected_device == "All devices":
-        controller.simulate_all_devices()
+    def simulate():
+        if config.load_rate:
+            # Fixed aggregate rate: devices are only used as the source of messages
+            if selected_device != "All devices" and fleet is None:
+                controller.fleet = controller.fleet.only(selected_device)
+            controller.generate_load(config.load_rate, config.duration, config.load_mix)
+        elif config.async_publish:
+            if selected_device != "All devices" and fleet is None:
+                controller.fleet = controller.fleet.only(selected_device)
+            asyncio.run(controller.simulate_all_devices_async(config.duration))
+        elif selected_device == "All devices" or fleet is not None:
+            controller.simulate_all_devices(config.duration)
+        elif config.duration is not None or dashboard is not None:
+            # The scheduler can be stopped from the dashboard; simulate_device cannot
+            controller.fleet = controller.fleet.only(selected_device)
+            controller.simulate_all_devices(config.duration)
+        else:
+            controller.simulate_device(selected_device)
+
+    if dashboard is None:
+        simulate()
     else:
-        controller.simulate_device(selected_device)
+        # The dashboard owns the terminal, so status output is muted meanwhile.
+        set_sink(NullSink())
+        simulation = threading.Thread(target=simulate, name="simulation", daemon=True)
+        simulation.start()
+        try:
+            dashboard.run(keep_running=simulation.is_alive)
+        finally:
+            controller.stop()
+            simulation.join()
+            set_sink(status_sink(config, level))
 
     # Stop the MQTT manager gracefully on exit
+    if aggregator is not None:
+        aggregator.stop()
+    if latency is not None:
+        latency.stop()
     mqtt_manager.stop()
+    if metrics_dump is not None:
+        metrics_dump.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
+    if latency is not None:
+        latency.print_totals()
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.recorded} messages to {config.record_path}")
+    if rules is not None:
+        print(f"Evaluated {rules.evaluated} rules, {rules.fired} fired")
+    set_sink(PrintSink(level=level))  # Writes out what a threaded sink still holds
+
+
+def status_sink(config, level):
+    """
+    Returns the sink for status output selected by the log_writer setting.
+
+    Args:
+        config (SimulatorConfig): The resolved settings.
+        level (int): Minimum level to emit.
+    """
+    if config.log_writer == "threaded":
+        return ThreadedWriterSink(level=level)
+    return PrintSink(level=level)
+
+
+def run_sharded(config):
+    """
+    Runs the configured fleet across several worker processes.
+
+    Args:
+        config (SimulatorConfig): The resolved settings.
+
+    Returns:
+        bool: False if any worker process failed.
+    """
+    broker = config.require("broker")
+    if broker is None:
+        broker = input("Enter the MQTT broker address (e.g., localhost): ").strip()
+    fleet = FleetSpec.from_dict(config.fleet) if config.fleet else FleetSpec.single()
+    if config.device is not None:
+        device = DeviceSelector(config.device).get_selection()
+        if device != "All devices":
+            fleet = fleet.only(device)
+
+    runner = ShardedRunner(
+        fleet,
+        {
+            "broker": broker,
+            "port": config.port,
+            "pool_size": config.pool_size,
+            "coalesce_window": config.coalesce_window,
+            "jitter": config.jitter,
+            "report_interval": config.report_interval,
+            "sampler": config.sampler,
+            "packed": config.packed,
+            "intervals": config.intervals,
+            "snapshot_every": config.snapshot_every,
+            "activity": config.activity,
+            "duration": config.duration,
+            "trace": config.trace,
+            # Every shard publishes an equal share of the aggregate rate.
+            "load_rate": config.load_rate,
+            "load_mix": config.load_mix,
+        },
+        shards=config.shards,
+    )
+    runner.run()
+    return not runner.failed
 
 
-def print_message(message):
+def print_message(topic, payload):
     """
     Helper function to print received MQTT messages.
 
     Args:
-        message: The MQTT message object containing topic and payload.
+        topic (str): The topic the message was received on.
+        payload (str): The decoded message payload.
     """
-    print(f"Message received on topic '{message.topic}': {message.payload.decode()}")
+    print(f"Message received on topic '{topic}': {payload}")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 # menu/__init__.py
 
+from .dashboard import TrafficDashboard
 from .device_selector import DeviceSelector
 
 __all__ = [
     "DeviceSelector",
+    "TrafficDashboard",
 ]
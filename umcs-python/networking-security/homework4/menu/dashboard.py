@@ -0,0 +1,239 @@
+import curses
+import threading
+import time
+
+# Columns: (title, width); the value column takes the remaining width.
+COLUMNS = (("Device", 44), ("Msgs", 10), ("Msg/s", 9), ("Lag ms", 9))
+HEADER_ROWS = 2  # Summary line and column titles
+
+
+class DeviceRow:
+    """
+    Live figures of one device, updated by the subscriber and read by the screen.
+    """
+
+    __slots__ = ("key", "count", "metric", "value", "lag", "rate", "counted")
+
+    def __init__(self, key):
+        self.key = key
+        self.count = 0
+        self.metric = ""
+        self.value = None
+        self.lag = None
+        self.rate = 0.0
+        self.counted = 0  # count at the previous frame, for the rate
+
+
+class TrafficDashboard:
+    """
+    A curses view of live traffic: per-device last value, message rate and lag.
+
+    ``on_message`` only updates counters and references, so it keeps up with
+    tens of thousands of messages per second. All formatting happens on the
+    screen thread, at most ``fps`` times per second and only for the rows on
+    screen. Each cell remembers what it last drew and is rewritten only when
+    its text changes, so a frame costs little more than the cells that moved.
+    Lag comes from the send time in traced messages or packed payloads.
+    """
+
+    def __init__(self, fps=10.0, clock=time.time):
+        """
+        Initializes an empty dashboard.
+
+        Args:
+            fps (float): Maximum frames drawn per second.
+            clock (callable): Time source, in seconds since the epoch.
+        """
+        self.frame_interval = 1.0 / fps
+        self.clock = clock
+        self.rows = {}  # device key -> DeviceRow
+        self.order = []  # device keys sorted for display
+        self._topics = {}  # topic -> (DeviceRow, metric)
+        self._new_keys = []
+        self._lock = threading.Lock()  # Only taken when a new topic appears
+        self.received = 0
+        self.top = 0  # First device row on screen
+        self._cells = {}  # (screen row, column) -> text drawn there
+        self._stopping = threading.Event()
+
+    def attach(self, mqtt_manager, topic_filter="home/#"):
+        """
+        Subscribes the dashboard and chains it onto the trace hook for lag.
+        """
+        mqtt_manager.subscribe(topic_filter, self.on_message, with_topic=True)
+        handler = mqtt_manager.message_handler
+        previous = handler.on_trace
+
+        def on_trace(topic, sent, sequence):
+            if previous is not None:
+                previous(topic, sent, sequence)
+            self.observe_trace(topic, sent)
+
+        handler.on_trace = on_trace
+
+    def _row_for(self, topic):
+        """Return (row, metric) for a topic seen for the first time."""
+        levels = topic.split("/")
+        key = "/".join(levels[1:4]) if len(levels) > 4 else topic
+        metric = levels[4] if len(levels) > 4 else ""
+        with self._lock:
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = DeviceRow(key)
+                self._new_keys.append(key)
+            entry = self._topics[topic] = (row, metric)
+        return entry
+
+    def on_message(self, topic, payload):
+        """Subscriber action: record a message (called with its topic)."""
+        entry = self._topics.get(topic)
+        row, metric = entry if entry is not None else self._row_for(topic)
+        row.count += 1
+        row.metric = metric
+        row.value = payload
+        if type(payload) is dict and "timestamp" in payload:
+            row.lag = self.clock() - payload["timestamp"]
+        self.received += 1
+
+    def observe_trace(self, topic, sent):
+        """Trace hook: record the publish-to-receive lag of a message."""
+        entry = self._topics.get(topic)
+        row = entry[0] if entry is not None else self._row_for(topic)[0]
+        row.lag = self.clock() - sent
+
+    def stop(self):
+        """Make a running ``run()`` return; safe to call from another thread."""
+        self._stopping.set()
+
+    def run(self, keep_running=None):
+        """
+        Show the dashboard until 'q' is pressed, ``stop()`` is called or
+        `keep_running` returns False.
+        """
+        curses.wrapper(self._loop, keep_running)
+
+    def _loop(self, stdscr, keep_running):
+        curses.curs_set(0)
+        stdscr.timeout(int(self.frame_interval * 1000))
+        stdscr.erase()
+        self._cells = {}
+        last_frame = time.monotonic()
+        while not self._stopping.is_set():
+            # Keys wake the loop at once; otherwise getch returns after one frame.
+            key = stdscr.getch()
+            if key in (ord("q"), ord("Q"), 27):
+                return
+            if key != -1:
+                self._scroll(stdscr, key)
+            if keep_running is not None and not keep_running():
+                return
+            now = time.monotonic()
+            if now - last_frame >= self.frame_interval:
+                self._update_rates(now - last_frame)
+                self._draw(stdscr)
+                last_frame = now
+
+    def _scroll(self, stdscr, key):
+        page = max(1, stdscr.getmaxyx()[0] - HEADER_ROWS)
+        step = {
+            curses.KEY_UP: -1,
+            curses.KEY_DOWN: 1,
+            curses.KEY_PPAGE: -page,
+            curses.KEY_NPAGE: page,
+        }.get(key, 0)
+        if key == curses.KEY_RESIZE:
+            stdscr.erase()
+            self._cells = {}
+        self.top = max(0, min(self.top + step, len(self.order) - 1))
+
+    def _update_rates(self, elapsed):
+        if self._new_keys:
+            with self._lock:
+                new_keys, self._new_keys = self._new_keys, []
+            self.order = sorted(self.order + new_keys)
+        # Walk our own key list: the subscriber may add rows to the dict meanwhile.
+        rows = self.rows
+        for key in self.order:
+            row = rows[key]
+            count = row.count
+            # Exponential smoothing so the column does not flicker frame to frame
+            instant = (count - row.counted) / elapsed
+            row.rate += (instant - row.rate) * 0.3
+            row.counted = count
+
+    def _draw(self, stdscr):
+        height, width = stdscr.getmaxyx()
+        total_rate = sum(self.rows[key].rate for key in self.order)
+        self._put(
+            stdscr,
+            0,
+            0,
+            f"{len(self.order)} devices, {self.received} messages, "
+            f"{total_rate:,.0f} msg/s   (UP/DOWN/PgUp/PgDn scroll, q quits)",
+            width,
+            curses.A_BOLD,
+        )
+        titles = [title for title, _ in COLUMNS] + ["Last value"]
+        self._put_row(stdscr, 1, titles, width, curses.A_UNDERLINE)
+
+        visible = self.order[self.top : self.top + height - HEADER_ROWS]
+        for offset, key in enumerate(visible):
+            row = self.rows[key]
+            self._put_row(
+                stdscr,
+                HEADER_ROWS + offset,
+                [
+                    row.key,
+                    str(row.count),
+                    f"{row.rate:.1f}",
+                    "" if row.lag is None else f"{row.lag * 1000:.1f}",
+                    _format_value(row.metric, row.value),
+                ],
+                width,
+            )
+        # Blank rows left over from a longer list or a scroll.
+        for screen_row in range(HEADER_ROWS + len(visible), height):
+            self._put_row(stdscr, screen_row, [""] * (len(COLUMNS) + 1), width)
+        stdscr.refresh()
+
+    def _put_row(self, stdscr, screen_row, texts, width, attr=curses.A_NORMAL):
+        x = 0
+        for column, text in enumerate(texts):
+            cell_width = COLUMNS[column][1] if column < len(COLUMNS) else width - x
+            if cell_width <= 0:
+                break
+            self._put(stdscr, screen_row, x, text, cell_width, attr)
+            x += cell_width + 1
+
+    def _put(self, stdscr, screen_row, x, text, cell_width, attr=curses.A_NORMAL):
+        """Write a cell only if its text changed since the last frame."""
+        text = text[:cell_width].ljust(cell_width)
+        if self._cells.get((screen_row, x)) == text:
+            return
+        self._cells[(screen_row, x)] = text
+        height, width = stdscr.getmaxyx()
+        if screen_row >= height or x >= width:
+            return
+        try:
+            stdscr.addstr(screen_row, x, text[: width - x - 1], attr)
+        except curses.error:
+            pass  # Writing the bottom-right corner raises after drawing
+
+
+def _format_value(metric, value):
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return " ".join(
+            f"{field}={_format_number(field_value)}"
+            for field, field_value in value.items()
+            if field not in ("timestamp", "schema")
+        )
+    return f"{metric}={_format_number(value)}" if metric else str(value)
+
+
+def _format_number(value):
+    try:
+        return f"{float(value):.2f}"
+    except (TypeError, ValueError):
+        return str(value)
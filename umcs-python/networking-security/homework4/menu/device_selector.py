@@ -1,5 +1,7 @@
 import curses
 
+from devices.device_type import DeviceType
+
 
 class DeviceSelector:
     """
@@ -7,11 +9,38 @@ class DeviceSelector:
     and text-based fallback menus.
     """
 
-    def __init__(self):
+    def __init__(self, selection=None, interactive=True):
         """
         Initializes the list of available devices.
+
+        Args:
+            selection (str, optional): A preconfigured choice that skips the menus.
+            interactive (bool): Whether the menus may be shown when nothing is preconfigured.
         """
         self.devices = DeviceType.list()
+        self.selection = selection
+        self.interactive = interactive
+
+    def resolve(self, name):
+        """
+        Matches a device name case-insensitively, accepting 'door_sensor' for 'Door Sensor'.
+
+        Args:
+            name (str): The device name to look up.
+
+        Returns:
+            str: The matching device name.
+
+        Raises:
+            ValueError: If no device matches.
+        """
+        wanted = name.strip().replace("_", " ").lower()
+        for device in self.devices:
+            if device.lower() == wanted:
+                return device
+        raise ValueError(
+            f"Unknown device '{name}'. Choose one of: {', '.join(self.devices)}"
+        )
 
     def curses_menu(self, stdscr):
         """
@@ -24,31 +53,40 @@ class DeviceSelector:
             str: The selected device.
         """
         current_selection = 0  # Tracks the currently selected option
+        first_row = 3  # Screen row of the first option, below the title lines
 
-        while True:
-            stdscr.clear()
-            stdscr.addstr("Simulate devices:\n", curses.A_BOLD)
-            stdscr.addstr("Use UP/DOWN to navigate and ENTER to select.\n\n")
-
-            # Render the menu options
-            for idx, device in enumerate(self.devices):
-                if idx == current_selection:
-                    stdscr.addstr(
-                        f"> {device}\n", curses.A_REVERSE
-                    )  # Highlight the current selection
-                else:
-                    stdscr.addstr(f"  {device}\n")
+        def draw_option(idx):
+            if idx == current_selection:
+                # Highlight the current selection
+                stdscr.addstr(
+                    first_row + idx, 0, f"> {self.devices[idx]}", curses.A_REVERSE
+                )
+            else:
+                stdscr.addstr(first_row + idx, 0, f"  {self.devices[idx]}")
+            stdscr.clrtoeol()
 
-            stdscr.refresh()
+        # Draw the whole menu once; keypresses only redraw the options that change.
+        stdscr.clear()
+        stdscr.addstr("Simulate devices:\n", curses.A_BOLD)
+        stdscr.addstr("Use UP/DOWN to navigate and ENTER to select.\n\n")
+        for idx in range(len(self.devices)):
+            draw_option(idx)
+        stdscr.refresh()
 
+        while True:
             # Handle user input
             key = stdscr.getch()
+            previous = current_selection
             if key == curses.KEY_UP and current_selection > 0:
                 current_selection -= 1
             elif key == curses.KEY_DOWN and current_selection < len(self.devices) - 1:
                 current_selection += 1
             elif key == curses.KEY_ENTER or key in [10, 13]:  # Enter key
                 return self.devices[current_selection]  # Return the selected device
+            if current_selection != previous:
+                draw_option(previous)
+                draw_option(current_selection)
+                stdscr.refresh()
 
     def fallback_menu(self):
         """
@@ -66,11 +104,16 @@ class DeviceSelector:
 
     def get_selection(self):
         """
-        Displays the device selection menu, falling back to text-based if curses fails.
+        Returns the preconfigured device, or displays the device selection menu,
+        falling back to text-based if curses fails.
 
         Returns:
             str: The selected device.
         """
+        if self.selection is not None:
+            return self.resolve(self.selection)
+        if not self.interactive:
+            raise ValueError("No device selected and interactive menus are disabled.")
         try:
             return curses.wrapper(self.curses_menu)
         except curses.error:
@@ -0,0 +1,19 @@
+# output/__init__.py
+
+from .output_sink import (
+    NullSink,
+    OutputSink,
+    PrintSink,
+    ThreadedWriterSink,
+    get_sink,
+    set_sink,
+)
+
+__all__ = [
+    "OutputSink",
+    "NullSink",
+    "PrintSink",
+    "ThreadedWriterSink",
+    "get_sink",
+    "set_sink",
+]
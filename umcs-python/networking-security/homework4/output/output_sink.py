@@ -0,0 +1,216 @@
+import queue
+import sys
+import threading
+from logging import DEBUG, ERROR, INFO, WARNING, getLevelName
+from typing import Any, Dict, List, Optional, TextIO
+
+
+class OutputSink:
+    """
+    Base class for where status messages go.
+
+    Messages below ``level`` are discarded before any formatting happens, and
+    messages below WARNING can be sampled so only every ``sample_every``-th one is
+    emitted. Callers pass a %-style format string plus arguments, so a suppressed
+    message costs one comparison instead of building a string. Subclasses
+    implement ``emit``.
+    """
+
+    def __init__(self, level: int = INFO, sample_every: int = 1) -> None:
+        """
+        Initializes the sink's filters and counters.
+
+        Args:
+            level (int): Minimum level to emit (logging.DEBUG, INFO, WARNING or ERROR).
+            sample_every (int): Emit only every N-th message below WARNING.
+        """
+        self.level = level
+        self.sample_every = max(1, sample_every)
+        self.emitted: Dict[int, int] = {}
+        self.sampled_out: int = 0
+        self._sample_counter: int = 0
+
+    def enabled(self, level: int) -> bool:
+        """
+        Returns True if messages at this level would be emitted.
+        """
+        return level >= self.level
+
+    def log(self, level: int, message: str, *args: Any) -> None:
+        """
+        Formats and emits a message if it passes the level and sampling filters.
+
+        Args:
+            level (int): The message level.
+            message (str): A %-style format string.
+            *args (Any): Values for the format string.
+        """
+        if level < self.level:
+            return
+        if level < WARNING and self.sample_every > 1:
+            self._sample_counter += 1
+            if self._sample_counter % self.sample_every:
+                self.sampled_out += 1
+                return
+        self.emitted[level] = self.emitted.get(level, 0) + 1
+        self.emit(level, message % args if args else message)
+
+    def debug(self, message: str, *args: Any) -> None:
+        # Checked here as well so suppressed hot-path messages skip the extra call.
+        if self.level <= DEBUG:
+            self.log(DEBUG, message, *args)
+
+    def info(self, message: str, *args: Any) -> None:
+        self.log(INFO, message, *args)
+
+    def warning(self, message: str, *args: Any) -> None:
+        self.log(WARNING, message, *args)
+
+    def error(self, message: str, *args: Any) -> None:
+        self.log(ERROR, message, *args)
+
+    def emit(self, level: int, text: str) -> None:
+        """
+        Writes one formatted message.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def decorate(level: int, text: str) -> str:
+        """
+        Returns the line written for a message: warnings and errors get a
+        ``[LEVEL]`` prefix, other messages are written as they are.
+        """
+        if level >= WARNING:
+            return f"[{getLevelName(level)}] {text}"
+        return text
+
+    def close(self) -> None:
+        """
+        Releases any resources held by the sink.
+        """
+
+
+class NullSink(OutputSink):
+    """
+    Discards everything; useful for benchmarks.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(level=ERROR + 1)
+
+    def emit(self, level: int, text: str) -> None:
+        pass
+
+
+class PrintSink(OutputSink):
+    """
+    Prints messages synchronously, like the original print() calls.
+    """
+
+    def __init__(
+        self, level: int = INFO, sample_every: int = 1, stream: Optional[TextIO] = None
+    ) -> None:
+        super().__init__(level, sample_every)
+        self.stream = stream
+
+    def emit(self, level: int, text: str) -> None:
+        print(self.decorate(level, text), file=self.stream or sys.stdout)
+
+
+class ThreadedWriterSink(OutputSink):
+    """
+    Hands messages to a background thread that writes them in batches, in
+    the same format as PrintSink.
+
+    The calling thread never blocks on terminal or file I/O: when the bounded
+    buffer is full, new messages are dropped and counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        level: int = INFO,
+        sample_every: int = 1,
+        stream: Optional[TextIO] = None,
+        max_pending: int = 10000,
+        batch_size: int = 1000,
+    ) -> None:
+        """
+        Initializes the sink and starts its writer thread.
+
+        Args:
+            level (int): Minimum level to emit.
+            sample_every (int): Emit only every N-th message below WARNING.
+            stream (TextIO, optional): Where to write; defaults to sys.stdout.
+            max_pending (int): Maximum number of messages waiting to be written.
+            batch_size (int): Maximum number of messages joined into one write.
+        """
+        super().__init__(level, sample_every)
+        self.stream = stream or sys.stdout
+        self.batch_size = batch_size
+        self.dropped: int = 0
+        self._pending: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(
+            target=self._write_loop, name="output-sink", daemon=True
+        )
+        self._writer.start()
+
+    def emit(self, level: int, text: str) -> None:
+        try:
+            self._pending.put_nowait(self.decorate(level, text))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """
+        Writes out pending messages and stops the writer thread.
+        """
+        self._pending.put(None)
+        self._writer.join()
+
+    def _write_loop(self) -> None:
+        pending = self._pending
+        while True:
+            batch: List[str] = []
+            text = pending.get()
+            while text is not None:
+                batch.append(text)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    text = pending.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self.stream.write("\n".join(batch) + "\n")
+                self.stream.flush()
+            if text is None:
+                return
+
+
+# Quiet by default: per-message and per-device output is logged at DEBUG.
+_sink: OutputSink = PrintSink(level=INFO)
+
+
+def get_sink() -> OutputSink:
+    """
+    Returns the process-wide output sink.
+    """
+    return _sink
+
+
+def set_sink(sink: OutputSink) -> OutputSink:
+    """
+    Replaces the process-wide output sink, closing the previous one.
+
+    Args:
+        sink (OutputSink): The new sink.
+
+    Returns:
+        OutputSink: The new sink.
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    if previous is not sink:
+        previous.close()
+    return sink
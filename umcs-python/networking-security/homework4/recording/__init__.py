@@ -0,0 +1,5 @@
+# recording/__init__.py
+
+from .telemetry_log import TelemetryReader, TelemetryRecorder
+
+__all__ = ["TelemetryRecorder", "TelemetryReader"]
@@ -0,0 +1,380 @@
+"""
+Replays a log written by TelemetryRecorder against an MQTT broker.
+
+Run from the homework4 directory:
+    python -m recording.replay --log recordings --broker localhost --speed 10 --shards 4
+
+Messages keep their original spacing divided by ``--speed``; ``--speed max``
+publishes as fast as possible. With several shards, each worker process
+replays the devices that hash to it, so every topic keeps its message order,
+and all workers share one start time so the combined timing is preserved.
+
+Packed payloads are recorded as one row per field; replay packs the fields
+into the original binary message on the original topic again. Logs recorded
+before packed messages were marked replay those fields as text messages on
+``<topic>/<field>``. A ``--topic-filter`` must match the field topics as well
+(e.g. end in ``#``) for packed messages to be rebuilt.
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import queue
+import struct
+import sys
+import time
+import zlib
+from logging import WARNING
+
+from broker.client_pool import device_key
+from broker.payload_codec import encode_payload
+from output.output_sink import PrintSink, get_sink, set_sink
+
+from .telemetry_log import KIND_FIELD, KIND_PACKED, TelemetryReader
+
+# A row is published on time if it goes out within this many seconds of its slot.
+ON_TIME = 0.005
+
+
+def shard_of(topic, shards):
+    """
+    Return the shard that replays `topic`.
+
+    Topics are sharded by device, so the field rows of a packed message reach
+    the same worker as the row that closes it.
+    """
+    return zlib.crc32(device_key(topic).encode("utf-8")) % shards
+
+
+def format_value(value):
+    """Turn a recorded value back into a payload string."""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+class ReplayEngine:
+    """
+    Re-publishes recorded rows through an MQTT manager at a chosen speed.
+    """
+
+    def __init__(
+        self,
+        log_directory,
+        mqtt_manager,
+        speed=1.0,
+        topic_filter="#",
+        start=None,
+        end=None,
+        shard=0,
+        shards=1,
+        clock=time.time,
+        sleep=time.sleep,
+    ):
+        """
+        Initializes the engine.
+
+        Args:
+            log_directory (str): Directory written by TelemetryRecorder.
+            mqtt_manager: Manager whose ``publish`` sends the messages.
+            speed (float, optional): Time compression factor (10 = ten times faster);
+                None replays as fast as possible.
+            topic_filter (str): Replay only topics matching this MQTT filter.
+            start (float, optional): Skip rows recorded before this timestamp.
+            end (float, optional): Skip rows recorded at or after this timestamp.
+            shard (int): Which shard of the topics this engine replays.
+            shards (int): Total number of shards.
+            clock (callable): Wall-clock time source, shared across processes.
+            sleep (callable): Used to wait for a row's slot.
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError(f"Replay speed must be positive: {speed}")
+        self.reader = TelemetryReader(log_directory)
+        self.mqtt_manager = mqtt_manager
+        self.speed = speed
+        self.topic_filter = topic_filter
+        self.start = start
+        self.end = end
+        self.shard = shard
+        self.shards = shards
+        self.clock = clock
+        self.sleep = sleep
+
+    def recorded_span(self):
+        """Return the (first, last) timestamps the replay covers across all shards."""
+        first, last = self.reader.time_range()
+        if self.start is not None:
+            first = max(first, self.start)
+        if self.end is not None:
+            last = min(last, self.end)
+        return first, last
+
+    def run(self, start_at=None):
+        """
+        Replay the rows of this shard.
+
+        Args:
+            start_at (float, optional): Wall-clock time of the first recorded row;
+                defaults to now. Shards of one replay must use the same value.
+
+        Returns:
+            dict: rows (messages published), elapsed, target_rate, achieved_rate,
+                on_time, mean_lag, max_lag (seconds behind schedule) and incomplete
+                (packed messages that could not be rebuilt).
+        """
+        first, last = self.recorded_span()
+        start_at = self.clock() if start_at is None else start_at
+        speed = self.speed
+        shards, shard = self.shards, self.shard
+        publish = self.mqtt_manager.publish
+        clock, sleep = self.clock, self.sleep
+
+        def in_shard(topic):
+            return shards == 1 or shard_of(topic, shards) == shard
+
+        recorded = self.reader.scan(
+            self.topic_filter, self.start, self.end, in_shard, with_kind=True
+        )
+        # Read the first segment before the start time so it does not delay row one.
+        first_row = next(recorded, None)
+        recorded = itertools.chain([first_row] if first_row else [], recorded)
+        if start_at > clock():
+            sleep(start_at - clock())
+        began = clock()
+        rows = on_time = incomplete = 0
+        total_lag = max_lag = 0.0
+        packing = {}  # topic -> fields of the packed message being rebuilt
+        for timestamp, topic, value, kind in recorded:
+            if kind == KIND_FIELD:
+                parent, _, field = topic.rpartition("/")
+                packing.setdefault(parent, {})[field] = value
+                continue
+            if kind == KIND_PACKED:
+                fields = packing.pop(topic, {})
+                fields["timestamp"] = timestamp
+                try:
+                    payload = encode_payload(value, fields)
+                except (KeyError, struct.error) as e:
+                    # Some fields were filtered out or the schema is unknown here.
+                    get_sink().debug("Cannot rebuild %s message: %s", topic, e)
+                    incomplete += 1
+                    continue
+            else:
+                payload = format_value(value)
+            if speed is not None:
+                due = start_at + (timestamp - first) / speed
+                now = clock()
+                if due > now:
+                    sleep(due - now)
+                    now = clock()
+                lag = now - due if now > due else 0.0
+                total_lag += lag
+                if lag > max_lag:
+                    max_lag = lag
+                if lag <= ON_TIME:
+                    on_time += 1
+            publish(topic, payload)
+            rows += 1
+        elapsed = clock() - began
+
+        duration = (last - first) / speed if speed and last > first else 0.0
+        return {
+            "shard": shard,
+            "rows": rows,
+            "elapsed": elapsed,
+            "target_rate": rows / duration if duration else math.inf,
+            "achieved_rate": rows / elapsed if elapsed else 0.0,
+            "on_time": on_time if speed is not None else rows,
+            "mean_lag": total_lag / rows if rows else 0.0,
+            "max_lag": max_lag,
+            "incomplete": incomplete,
+        }
+
+
+def _replay_shard(shard, shards, settings, start_at, reports):
+    """
+    Replay one shard in a worker process and send its report to the parent.
+
+    A failure is sent as ``{"shard": shard, "error": message}`` so the parent
+    never waits for a report that will not come.
+    """
+    from broker.mqtt_manager import MQTTManager
+
+    set_sink(PrintSink(level=settings.get("worker_log_level", WARNING)))
+    mqtt_manager = None
+    try:
+        mqtt_manager = MQTTManager(broker=settings["broker"], port=settings["port"])
+        mqtt_manager.connect()
+        mqtt_manager.start()
+        engine = ReplayEngine(
+            settings["log"],
+            mqtt_manager,
+            speed=settings["speed"],
+            topic_filter=settings["topic_filter"],
+            shard=shard,
+            shards=shards,
+        )
+        reports.put(engine.run(start_at))
+    except Exception as e:
+        get_sink().error("Shard %d failed: %s", shard, e)
+        reports.put({"shard": shard, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        if mqtt_manager is not None:
+            mqtt_manager.stop()
+
+
+def _collect_reports(workers, reports, poll_interval=0.5):
+    """
+    Wait for one report per worker, standing in an error report for any worker
+    that exits without sending one (e.g. killed or crashed in native code).
+    """
+    results = {}
+    while len(results) < len(workers):
+        try:
+            report = reports.get(timeout=poll_interval)
+        except queue.Empty:
+            dead = [
+                shard
+                for shard, worker in enumerate(workers)
+                if shard not in results and worker.exitcode is not None
+            ]
+            if not dead:
+                continue
+            # A report sent just before exiting may still be in the pipe.
+            try:
+                while True:
+                    report = reports.get_nowait()
+                    results[report["shard"]] = report
+            except queue.Empty:
+                pass
+            for shard in dead:
+                results.setdefault(
+                    shard,
+                    {
+                        "shard": shard,
+                        "error": f"worker exited with code {workers[shard].exitcode}",
+                    },
+                )
+            continue
+        results[report["shard"]] = report
+    return results
+
+
+def run_sharded_replay(settings, shards):
+    """
+    Replay a log with `shards` worker processes and return their reports.
+
+    Args:
+        settings (dict): log, broker, port, speed, topic_filter and optionally
+            worker_log_level.
+        shards (int): Number of worker processes.
+
+    Returns:
+        list: One report dictionary per shard (see ReplayEngine.run); a shard that
+            failed reports only its "shard" and an "error" message.
+    """
+    context = multiprocessing.get_context()
+    reports = context.Queue()
+    # Leave the workers time to connect so none of them starts behind schedule.
+    start_at = time.time() + 1.0
+    workers = [
+        context.Process(
+            target=_replay_shard,
+            args=(shard, shards, settings, start_at, reports),
+            name=f"replay-{shard}",
+        )
+        for shard in range(shards)
+    ]
+    for worker in workers:
+        worker.start()
+    results = _collect_reports(workers, reports)
+    for worker in workers:
+        worker.join()
+    return [results[shard] for shard in range(shards)]
+
+
+def print_reports(reports):
+    """
+    Print achieved vs target rate per shard and in total.
+
+    Returns:
+        bool: False if any shard failed.
+    """
+    failed = [report for report in reports if "error" in report]
+    for report in failed:
+        get_sink().error("Shard %d failed: %s", report["shard"], report["error"])
+    reports = [report for report in reports if "error" not in report]
+    for report in reports:
+        get_sink().info(
+            "Shard %d: %d messages in %.2f s, %.0f msg/s (target %.0f), "
+            "%.1f%% on time, mean lag %.1f ms, max lag %.1f ms",
+            report["shard"],
+            report["rows"],
+            report["elapsed"],
+            report["achieved_rate"],
+            report["target_rate"],
+            100.0 * report["on_time"] / report["rows"] if report["rows"] else 100.0,
+            report["mean_lag"] * 1000,
+            report["max_lag"] * 1000,
+        )
+    rows = sum(report["rows"] for report in reports)
+    elapsed = max((report["elapsed"] for report in reports), default=0.0)
+    target = sum(report["target_rate"] for report in reports)
+    get_sink().info(
+        "Total: %d messages, %.0f msg/s achieved, %.0f msg/s target",
+        rows,
+        rows / elapsed if elapsed else 0.0,
+        target,
+    )
+    incomplete = sum(report["incomplete"] for report in reports)
+    if incomplete:
+        get_sink().warning("%d packed messages could not be rebuilt.", incomplete)
+    return not failed
+
+
+def parse_speed(text):
+    """Parse a --speed value: a positive number or 'max'."""
+    return None if text.lower() == "max" else float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--log", required=True, help="TelemetryRecorder directory")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument(
+        "--speed", type=parse_speed, default=1.0, help="e.g. 1, 10, 100 or max"
+    )
+    parser.add_argument("--topic-filter", default="#")
+    parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args()
+
+    settings = {
+        "log": args.log,
+        "broker": args.broker,
+        "port": args.port,
+        "speed": args.speed,
+        "topic_filter": args.topic_filter,
+    }
+    if args.shards > 1:
+        if not print_reports(run_sharded_replay(settings, args.shards)):
+            sys.exit(1)
+        return
+
+    from broker.mqtt_manager import MQTTManager
+
+    mqtt_manager = MQTTManager(broker=args.broker, port=args.port)
+    mqtt_manager.connect()
+    mqtt_manager.start()
+    engine = ReplayEngine(
+        args.log, mqtt_manager, speed=args.speed, topic_filter=args.topic_filter
+    )
+    try:
+        print_reports([engine.run()])
+    finally:
+        mqtt_manager.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; scans fall back to a Python loop
+    np = None
+
+from broker.topic_trie import TopicTrie
+
+# Segment layout: a 64-byte header followed by four column arrays of `capacity`
+# entries each: timestamps (float64), values (float64), topic ids (uint32) and
+# value kinds (uint8).
+MAGIC = b"TLOG"
+VERSION = 1
+HEADER_SIZE = 64
+
+_HEADER = struct.Struct("<4sBxxxIIdd")  # magic, version, capacity, count, min/max time
+
+KIND_NUMBER = 0
+KIND_STRING = 1  # The value is an id in the string dictionary
+KIND_FIELD = 2  # A number from a packed message, recorded under <topic>/<field>
+# Closes a packed message on <topic>; the value is its schema's string id
+KIND_PACKED = 3
+
+TOPICS_FILE = "topics.jsonl"
+STRINGS_FILE = "strings.jsonl"
+SEGMENT_PATTERN = "segment-*.tlog"
+
+# A scanned row: (timestamp, topic, value), plus the value kind if requested.
+Row = Tuple[float, str, Any]
+KindedRow = Tuple[float, str, Any, int]
+
+
+def _segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"segment-{number:06d}.tlog")
+
+
+def _segment_size(capacity: int) -> int:
+    return HEADER_SIZE + capacity * (8 + 8 + 4 + 1)
+
+
+class _Dictionary:
+    """
+    An append-only mapping of strings to dense integer ids, one JSON string per line.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._file = None
+        self.reload()
+
+    def reload(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as file:
+                for line in file.readlines()[len(self.names) :]:
+                    name = json.loads(line)
+                    self.ids[name] = len(self.names)
+                    self.names.append(name)
+
+    def id_for(self, name: str) -> int:
+        """Return the id of `name`, adding it to the file if it is new."""
+        ident = self.ids.get(name)
+        if ident is None:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            ident = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self._file.write(json.dumps(name) + "\n")
+            self._file.flush()
+        return ident
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Segment:
+    """
+    One memory-mapped segment file and typed views of its columns.
+    """
+
+    def __init__(self, path: str, capacity: Optional[int] = None) -> None:
+        """
+        Opens a segment, creating it with `capacity` rows if it does not exist.
+        Segments opened without a capacity are mapped read-only.
+        """
+        self.path = path
+        writable = capacity is not None
+        if writable and not os.path.exists(path):
+            with open(path, "wb") as file:
+                file.truncate(_segment_size(capacity))
+                file.write(
+                    _HEADER.pack(MAGIC, VERSION, capacity, 0, math.inf, -math.inf)
+                )
+        self._file = open(path, "r+b" if writable else "rb")
+        self._map = mmap.mmap(
+            self._file.fileno(),
+            0,
+            access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ,
+        )
+        magic, version, self.capacity, self.count, self.min_time, self.max_time = (
+            _HEADER.unpack_from(self._map)
+        )
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            self._file.close()
+            raise ValueError(f"{path} is not a version {VERSION} telemetry segment.")
+
+        capacity = self.capacity
+        offsets = {}
+        offset = HEADER_SIZE
+        for column, width in (
+            ("times", 8),
+            ("values", 8),
+            ("topic_ids", 4),
+            ("kinds", 1),
+        ):
+            offsets[column] = (offset, offset + width * capacity)
+            offset += width * capacity
+        self.offsets = offsets
+        view = memoryview(self._map)
+        self.times = view[slice(*offsets["times"])].cast("d")
+        self.values = view[slice(*offsets["values"])].cast("d")
+        self.topic_ids = view[slice(*offsets["topic_ids"])].cast("I")
+        self.kinds = view[slice(*offsets["kinds"])].cast("B")
+        self._view = view
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def write_header(self) -> None:
+        _HEADER.pack_into(
+            self._map,
+            0,
+            MAGIC,
+            VERSION,
+            self.capacity,
+            self.count,
+            self.min_time,
+            self.max_time,
+        )
+
+    def column(self, name: str, dtype: str) -> Any:
+        """Return the first `count` entries of a column as a NumPy array."""
+        start, _ = self.offsets[name]
+        return np.frombuffer(self._map, dtype=dtype, count=self.count, offset=start)
+
+    def close(self) -> None:
+        # The typed views must be released before the mapping can be closed.
+        for view in (self.times, self.values, self.topic_ids, self.kinds, self._view):
+            view.release()
+        self._map.close()
+        self._file.close()
+
+
+class TelemetryRecorder:
+    """
+    Appends received messages to a columnar, memory-mapped log.
+
+    Each row is (timestamp, topic id, value). Topics, and string values such as
+    "OPEN", are stored once in append-only dictionaries and referenced by id, so
+    a row takes 21 bytes whatever its topic. Rows go into fixed-size segment
+    files that are mapped into memory; when one fills up, the next is created.
+    The row count in a segment's header is updated every ``flush_every`` rows
+    and on ``flush``/``close``, which is when rows become visible to readers.
+    """
+
+    def __init__(
+        self, directory: str, segment_rows: int = 1 << 20, flush_every: int = 4096
+    ) -> None:
+        """
+        Opens the log in `directory`, continuing its last segment if there is one.
+
+        Args:
+            directory (str): Where the segment and dictionary files live.
+            segment_rows (int): Rows per new segment file.
+            flush_every (int): Rows between header updates.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.flush_every = flush_every
+        self.recorded: int = 0
+        self.topics = _Dictionary(os.path.join(directory, TOPICS_FILE))
+        self.strings = _Dictionary(os.path.join(directory, STRINGS_FILE))
+        self._lock = threading.Lock()
+        self._unflushed = 0
+
+        existing = sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)))
+        self._number = len(existing)
+        if existing:
+            self._segment = _Segment(existing[-1], segment_rows)
+            if self._segment.full:
+                self._rotate()
+        else:
+            self._segment = self._new_segment()
+
+    def _new_segment(self) -> _Segment:
+        self._number += 1
+        return _Segment(_segment_path(self.directory, self._number), self.segment_rows)
+
+    def _rotate(self) -> None:
+        self._segment.write_header()
+        self._segment.close()
+        self._segment = self._new_segment()
+
+    def append(
+        self,
+        topic: str,
+        value: Any,
+        timestamp: Optional[float] = None,
+        kind: int = KIND_NUMBER,
+    ) -> None:
+        """
+        Appends one row.
+
+        Args:
+            topic (str): The message topic.
+            value (Any): A number, or any other value, which is stored as a string.
+            timestamp (Optional[float]): Seconds since the epoch; defaults to now.
+            kind (int): KIND_FIELD or KIND_PACKED for the rows of a packed message
+                (see ``record``); otherwise the kind follows from the value.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        text = None
+        if kind == KIND_PACKED:
+            text = str(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            number = value
+        else:
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                kind, text = KIND_STRING, str(value)
+
+        with self._lock:
+            if text is not None:
+                # Dictionaries hand out ids by length, so lookups must not interleave.
+                number = self.strings.id_for(text)
+            segment = self._segment
+            if segment.full:
+                self._rotate()
+                segment = self._segment
+            row = segment.count
+            segment.times[row] = timestamp
+            segment.values[row] = number
+            segment.topic_ids[row] = self.topics.id_for(topic)
+            segment.kinds[row] = kind
+            segment.count = row + 1
+            if timestamp < segment.min_time:
+                segment.min_time = timestamp
+            if timestamp > segment.max_time:
+                segment.max_time = timestamp
+            self.recorded += 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                segment.write_header()
+                self._unflushed = 0
+
+    def record(self, topic: str, payload: Any) -> None:
+        """
+        Subscriber action: records a decoded payload received on `topic`.
+
+        Field dictionaries from packed payloads are recorded as one row per field,
+        under ``<topic>/<field>``, using their embedded timestamp if present. A
+        final row on `topic` names the schema, so a replay can pack the fields
+        into the original message again.
+        """
+        if isinstance(payload, dict):
+            timestamp = payload.get("timestamp")
+            schema = payload.get("schema")
+            kind = KIND_NUMBER if schema is None else KIND_FIELD
+            for field, value in payload.items():
+                if field not in ("timestamp", "schema"):
+                    self.append(f"{topic}/{field}", value, timestamp, kind)
+            if schema is not None:
+                self.append(topic, schema, timestamp, KIND_PACKED)
+        else:
+            self.append(topic, payload)
+
+    def flush(self) -> None:
+        """
+        Makes every appended row visible to readers.
+        """
+        with self._lock:
+            self._segment.write_header()
+            self._segment._map.flush()
+            self._unflushed = 0
+
+    def close(self) -> None:
+        """
+        Flushes and closes the log.
+        """
+        self.flush()
+        with self._lock:
+            self._segment.close()
+        self.topics.close()
+        self.strings.close()
+
+
+class TelemetryReader:
+    """
+    Range scans over a log written by TelemetryRecorder.
+
+    Segments whose time range lies outside the requested interval are skipped
+    using their headers. Within a segment, rows are filtered with NumPy when it
+    is installed and with a Python loop otherwise.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Args:
+            directory (str): The recorder's directory.
+        """
+        self.directory = directory
+        self.topics = _Dictionary(os.path.join(directory, TOPICS_FILE))
+        self.strings = _Dictionary(os.path.join(directory, STRINGS_FILE))
+
+    def segments(self) -> List[str]:
+        """
+        Returns the segment file paths in recording order.
+        """
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+
+    def time_range(self) -> Tuple[float, float]:
+        """
+        Returns the earliest and latest recorded timestamps, or (0.0, 0.0) if empty.
+        """
+        first, last = math.inf, -math.inf
+        for path in self.segments():
+            segment = _Segment(path)
+            if segment.count:
+                first = min(first, segment.min_time)
+                last = max(last, segment.max_time)
+            segment.close()
+        return (first, last) if first <= last else (0.0, 0.0)
+
+    def topic_ids(
+        self, topic_filter: str, where: Optional[Callable[[str], bool]] = None
+    ) -> Set[int]:
+        """
+        Return the ids of recorded topics matching an MQTT topic filter and,
+        if given, the `where` predicate.
+        """
+        trie: TopicTrie[bool] = TopicTrie()
+        trie.insert(topic_filter, True)
+        return {
+            ident
+            for ident, topic in enumerate(self.topics.names)
+            if trie.match(topic) and (where is None or where(topic))
+        }
+
+    def scan(
+        self,
+        topic_filter: str = "#",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        where: Optional[Callable[[str], bool]] = None,
+        with_kind: bool = False,
+    ) -> Iterator[Union[Row, KindedRow]]:
+        """
+        Yields rows whose topic matches `topic_filter` and whose time is in [start, end).
+
+        Args:
+            topic_filter (str): MQTT topic filter, e.g. "home/+/door_sensor/#".
+            start (Optional[float]): Earliest timestamp, inclusive.
+            end (Optional[float]): Latest timestamp, exclusive.
+            where (Optional[Callable[[str], bool]]): Extra test on topic names,
+                applied once per topic rather than per row.
+            with_kind (bool): Also yield each row's KIND_* value.
+
+        Yields:
+            Row: (timestamp, topic, value) in the order they were recorded, or a
+                KindedRow with `with_kind`.
+        """
+        self.topics.reload()
+        self.strings.reload()
+        wanted = self.topic_ids(topic_filter, where)
+        if not wanted:
+            return
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        for path in self.segments():
+            segment = _Segment(path)
+            try:
+                if (
+                    segment.count
+                    and segment.max_time >= start
+                    and segment.min_time < end
+                ):
+                    yield from self._scan_segment(
+                        segment, wanted, start, end, with_kind
+                    )
+            finally:
+                segment.close()
+
+    def scan_device(
+        self,
+        device_id: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Iterator[Row]:
+        """
+        Yields the rows recorded for one device (any group or type) in [start, end).
+        """
+        return self.scan(f"home/+/+/{device_id}/#", start, end)
+
+    def _scan_segment(
+        self,
+        segment: _Segment,
+        wanted: Set[int],
+        start: float,
+        end: float,
+        with_kind: bool,
+    ) -> Iterator[Union[Row, KindedRow]]:
+        topics, strings = self.topics.names, self.strings.names
+        if np is not None:
+            times = segment.column("times", "<f8")
+            topic_ids = segment.column("topic_ids", "<u4")
+            mask = (times >= start) & (times < end)
+            mask &= np.isin(topic_ids, np.fromiter(wanted, dtype="<u4"))
+            rows = np.nonzero(mask)[0].tolist()
+            # Copy the selected values out so no array keeps the mapping alive.
+            times = times[rows].tolist()
+            topic_ids = topic_ids[rows].tolist()
+            values = segment.column("values", "<f8")[rows].tolist()
+            kinds = segment.column("kinds", "u1")[rows].tolist()
+            selected = zip(times, topic_ids, values, kinds)
+        else:
+            selected = [
+                (
+                    segment.times[row],
+                    segment.topic_ids[row],
+                    segment.values[row],
+                    segment.kinds[row],
+                )
+                for row in range(segment.count)
+                if start <= segment.times[row] < end
+                and segment.topic_ids[row] in wanted
+            ]
+        for timestamp, topic_id, value, kind in selected:
+            if kind == KIND_STRING or kind == KIND_PACKED:
+                value = strings[int(value)]
+            if with_kind:
+                yield timestamp, topics[topic_id], value, kind
+            else:
+                yield timestamp, topics[topic_id], value
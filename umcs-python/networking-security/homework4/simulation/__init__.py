@@ -1,7 +1,10 @@
 # simulation/__init__.py
 
+from .fleet import FleetEntry, FleetSpec
 from .simulation_controller import SimulationController
 
 __all__ = [
+    "FleetEntry",
+    "FleetSpec",
     "SimulationController",
 ]
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from output.output_sink import get_sink
+
+
+class DeviceSimulation:
+    """
+    Base class for device simulations that publish over an MQTT manager.
+
+    Subclasses set ``interval`` and implement ``generate_messages``; the base
+    class provides the blocking ``simulate`` loop and its asyncio counterpart.
+    Topics are built once at construction (see ``device_topic``) so steps do
+    not format strings on every tick.
+    """
+
+    __slots__ = ("device", "mqtt_manager", "packed")
+
+    interval = 1  # Seconds between simulation steps
+
+    def __init__(self, device, mqtt_manager, packed=False):
+        self.device = device
+        self.mqtt_manager = mqtt_manager
+        self.packed = (
+            packed  # Publish packed binary payloads where the device supports it
+        )
+
+    def device_topic(self, suffix):
+        """Build this device's topic ending in `suffix` (e.g. 'state/update')."""
+        device = self.device
+        return (
+            f"home/{device.group_id}/{device.device_type}/{device.device_id}/{suffix}"
+        )
+
+    def generate_messages(self):
+        """Return the (topic, payload) pairs produced by one simulation step."""
+        raise NotImplementedError
+
+    def simulate(self):
+        """Simulate the device and publish its data."""
+        while True:
+            self.simulate_step()
+            time.sleep(self.interval)
+
+    def simulate_step(self):
+        """Simulate one step for the device."""
+        if self.device.powered:
+            for topic, payload in self.generate_messages():
+                self.mqtt_manager.publish(topic, payload)
+                get_sink().debug("Published to %s: %s", topic, payload)
+        else:
+            get_sink().debug(
+                "%s %s is powered OFF.", self.device.device_type, self.device.device_id
+            )
+
+    async def simulate_async(self, interval=None):
+        """
+        Simulate the device on the running event loop.
+
+        Needs an AsyncMQTTManager whose pipeline has been started (start_async).
+        """
+        interval = self.interval if interval is None else interval
+        while True:
+            await self.simulate_step_async()
+            await asyncio.sleep(interval)
+
+    async def simulate_step_async(self):
+        """Simulate one step, awaiting the manager's publish pipeline."""
+        if self.device.powered:
+            for topic, payload in self.generate_messages():
+                await self.mqtt_manager.publish_async(topic, payload)
@@ -0,0 +1,181 @@
+from devices.device_type import DeviceType
+
+
+def device_slug(device_name):
+    """Convert a DeviceType value such as 'Door Sensor' to 'door_sensor'."""
+    return device_name.replace(" ", "_").lower()
+
+
+class FleetEntry:
+    """
+    How many devices of one type to create, which groups they belong to and how they are numbered.
+    """
+
+    __slots__ = ("device_name", "count", "groups", "id_start")
+
+    def __init__(self, device_name, count, groups=("home",), id_start=0):
+        if (
+            device_name not in DeviceType.list()
+            or device_name == DeviceType.ALL_DEVICES.value
+        ):
+            raise ValueError(f"Unknown device type: {device_name}")
+        if count < 0:
+            raise ValueError(f"Device count must not be negative: {count}")
+        if not groups:
+            raise ValueError(f"At least one group is required for {device_name}")
+        self.device_name = device_name
+        self.count = count
+        self.groups = tuple(groups)
+        self.id_start = id_start
+
+    def device_ids(self):
+        """Yield (group_id, device_id) pairs, spreading devices round-robin across groups."""
+        slug = device_slug(self.device_name)
+        groups = self.groups
+        for index in range(self.id_start, self.id_start + self.count):
+            yield groups[index % len(groups)], f"{slug}_{index}"
+
+    def split(self, parts):
+        """
+        Divide the entry into `parts` entries with consecutive, non-overlapping id ranges.
+
+        Args:
+            parts (int): Number of entries to produce.
+
+        Returns:
+            list: FleetEntry objects whose counts add up to this entry's count.
+        """
+        base, extra = divmod(self.count, parts)
+        entries = []
+        id_start = self.id_start
+        for part in range(parts):
+            count = base + (1 if part < extra else 0)
+            entries.append(FleetEntry(self.device_name, count, self.groups, id_start))
+            id_start += count
+        return entries
+
+
+class FleetSpec:
+    """
+    Describes a device population: a FleetEntry per device type.
+
+    A spec can be written as a plain dictionary (e.g. loaded from a config file)::
+
+        {
+            "groups": ["floor1", "floor2"],
+            "devices": {
+                "Door Sensor": 1000,
+                "Indoor Sensor": {"count": 5000, "groups": ["lab"], "id_start": 100},
+            },
+        }
+
+    Integer entries use the top-level groups and start numbering at 0.
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+
+    @classmethod
+    def single(cls, group_id="home"):
+        """Return a spec with one device of every type, matching the original controller."""
+        return cls(
+            FleetEntry(name, 1, (group_id,))
+            for name in DeviceType.list()
+            if name != DeviceType.ALL_DEVICES.value
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a spec from a dictionary.
+
+        Args:
+            data (dict): Mapping with an optional "groups" list and a "devices" mapping
+                of device type name to either a count or a dict with "count", "groups"
+                and "id_start".
+
+        Returns:
+            FleetSpec: The parsed spec.
+
+        Raises:
+            ValueError: If the spec has unknown keys or device names, or a count
+                or id that is not a whole number.
+        """
+        unknown = set(data) - {"groups", "devices"}
+        if unknown:
+            raise ValueError(f"Unknown fleet keys: {', '.join(sorted(unknown))}")
+        devices = data.get("devices")
+        if not isinstance(devices, dict):
+            raise ValueError(
+                'A fleet needs a "devices" mapping of device type to count'
+            )
+        default_groups = tuple(data.get("groups", ("home",)))
+        entries = []
+        for name, value in devices.items():
+            if not isinstance(value, dict):
+                entries.append(
+                    FleetEntry(name, _whole(name, "count", value), default_groups)
+                )
+                continue
+            unknown = set(value) - {"count", "groups", "id_start"}
+            if unknown:
+                raise ValueError(
+                    f"Unknown keys for {name}: {', '.join(sorted(unknown))}"
+                )
+            entries.append(
+                FleetEntry(
+                    name,
+                    _whole(name, "count", value.get("count")),
+                    tuple(value.get("groups", default_groups)),
+                    _whole(name, "id_start", value.get("id_start", 0)),
+                )
+            )
+        return cls(entries)
+
+    def only(self, device_name):
+        """Return a spec restricted to one device type."""
+        return FleetSpec(e for e in self.entries if e.device_name == device_name)
+
+    def split(self, parts):
+        """
+        Divide the fleet into `parts` specs covering disjoint device id ranges.
+
+        Args:
+            parts (int): Number of shards.
+
+        Returns:
+            list: FleetSpec objects, one per shard.
+        """
+        shards = [[] for _ in range(parts)]
+        for entry in self.entries:
+            for shard, part in zip(shards, entry.split(parts)):
+                if part.count:
+                    shard.append(part)
+        return [FleetSpec(entries) for entries in shards]
+
+    def total(self):
+        """Return the total number of devices in the fleet."""
+        return sum(entry.count for entry in self.entries)
+
+    def iter_devices(self, device_classes):
+        """
+        Lazily create every device in the fleet.
+
+        Args:
+            device_classes (dict): Mapping of device type name to a device class or
+                another callable taking (group_id, device_id).
+
+        Yields:
+            tuple: (device type name, device instance).
+        """
+        for entry in self.entries:
+            device_class = device_classes[entry.device_name]
+            for group_id, device_id in entry.device_ids():
+                yield entry.device_name, device_class(group_id, device_id)
+
+
+def _whole(device_name, key, value):
+    """Return `value` if it is an int; bools and floats are rejected, not truncated."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{device_name} {key} must be a whole number, got {value!r}")
+    return value
@@ -1,26 +1,38 @@
-import time
+from broker.payload_codec import encode_payload
 
+from .device_simulation import DeviceSimulation
 
-class IndoorSensorSimulation:
-    def __init__(self, indoor_sensor, mqtt_manager):
+
+class IndoorSensorSimulation(DeviceSimulation):
+    __slots__ = (
+        "indoor_sensor",
+        "humidity_topic",
+        "temperature_topic",
+        "telemetry_topic",
+    )
+
+    interval = 3  # Simulate every 3 seconds
+
+    def __init__(self, indoor_sensor, mqtt_manager, packed=False):
+        super().__init__(indoor_sensor, mqtt_manager, packed)
         self.indoor_sensor = indoor_sensor
-        self.mqtt_manager = mqtt_manager
+        # Only the topics used by the selected payload mode are kept per device.
+        self.humidity_topic = None if packed else self.device_topic("humidity/update")
+        self.temperature_topic = (
+            None if packed else self.device_topic("temperature/update")
+        )
+        self.telemetry_topic = self.device_topic("telemetry/update") if packed else None
 
-    def simulate(self):
-        """Simulate the indoor sensor and publish its data."""
-        while True:
-            self.simulate_step()
-            time.sleep(3)  # Simulate every 3 seconds
+    def generate_messages(self):
+        """
+        Generate the indoor sensor messages carrying its data.
 
-    def simulate_step(self):
-        """Simulate one step for the indoor sensor."""
-        if self.indoor_sensor.powered:
-            data = self.indoor_sensor.generate_data()
-            for key, value in data.items():
-                topic = f"home/{self.indoor_sensor.group_id}/{self.indoor_sensor.device_type}/{self.indoor_sensor.device_id}/{key}/update"
-                self.mqtt_manager.publish(topic, value)
-                print(f"Published to {topic}: {value}")
-        else:
-            print(
-                f"{self.indoor_sensor.device_type} {self.indoor_sensor.device_id} is powered OFF."
-            )
+        In packed mode all readings go out as a single telemetry message.
+        """
+        data = self.indoor_sensor.generate_data()
+        if self.packed:
+            return [(self.telemetry_topic, encode_payload("sensor", data))]
+        return [
+            (self.humidity_topic, data["humidity"]),
+            (self.temperature_topic, data["temperature"]),
+        ]
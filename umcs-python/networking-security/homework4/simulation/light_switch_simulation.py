@@ -1,25 +1,25 @@
-import time
+from .state_simulation import StateSimulation
 
 
-class LightSwitchSimulation:
-    def __init__(self, light_switch, mqtt_manager):
-        self.light_switch = light_switch
-        self.mqtt_manager = mqtt_manager
+class LightSwitchSimulation(StateSimulation):
+    __slots__ = ("light_switch", "state_topic")
+
+    interval = 4  # Simulate every 4 seconds
 
-    def simulate(self):
-        """Simulate the light switch and publish its state."""
-        while True:
-            self.simulate_step()
-            time.sleep(4)  # Simulate every 4 seconds
+    def __init__(
+        self,
+        light_switch,
+        mqtt_manager,
+        packed=False,
+        snapshot_every=None,
+        activity=1.0,
+    ):
+        super().__init__(light_switch, mqtt_manager, packed, snapshot_every, activity)
+        self.light_switch = light_switch
+        self.state_topic = self.device_topic("state/update")
 
-    def simulate_step(self):
-        """Simulate one step for the light switch."""
-        if self.light_switch.powered:
-            state = self.light_switch.toggle_state()
-            topic = f"home/{self.light_switch.group_id}/{self.light_switch.device_type}/{self.light_switch.device_id}/state/update"
-            self.mqtt_manager.publish(topic, state)
-            print(f"Published to {topic}: {state}")
-        else:
-            print(
-                f"{self.light_switch.device_type} {self.light_switch.device_id} is powered OFF."
-            )
+    def generate_messages(self):
+        """Generate the light switch messages carrying its state."""
+        if self.active():
+            self.light_switch.toggle_state()
+        return self.state_messages(self.state_topic)
@@ -0,0 +1,305 @@
+import bisect
+import math
+import random
+import threading
+import time
+
+from analytics.histogram import LatencyHistogram
+from output.output_sink import get_sink
+
+
+class TokenBucket:
+    """
+    Hands out send slots at a fixed rate, independent of how fast they are used.
+
+    Token ``n`` becomes available at ``start + n / rate``. ``take`` waits for the
+    next token and returns the time it was due, not the time it was taken. When
+    the sender stalls, tokens keep accruing on the original schedule and are
+    handed out back to back once it recovers, so the stall shows up as latency
+    for every message that should have gone out meanwhile. Measuring from the
+    due time avoids coordinated omission: a closed loop that waits for each
+    send before scheduling the next would quietly lower its rate instead.
+    """
+
+    def __init__(self, rate, clock=time.perf_counter, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError(f"Target rate must be positive: {rate}")
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+        self.start = None
+        self.taken = 0
+
+    def take(self):
+        """Wait for the next token and return the time it was due."""
+        if self.start is None:
+            self.start = self.clock()
+        due = self.start + self.taken / self.rate
+        self.taken += 1
+        wait = due - self.clock()
+        if wait > 0:
+            self.sleep(wait)
+        return due
+
+    def backlog(self):
+        """Return how many tokens are due but not yet taken."""
+        if self.start is None:
+            return 0
+        due = int((self.clock() - self.start) * self.rate) + 1
+        return max(0, due - self.taken)
+
+
+class MessageMix:
+    """
+    Picks which simulation produces the next message, by device type weight.
+
+    Each device type is chosen in proportion to its weight and a device of that
+    type uniformly at random, so the mix holds regardless of how many devices
+    each type has. Without explicit weights every type gets the share of
+    steps it takes on its own schedule, i.e. device count / step interval.
+    """
+
+    max_attempts = 100  # Devices stepped per message before the slot is given up
+
+    def __init__(self, simulations_by_type, weights=None, intervals=None):
+        """
+        Args:
+            simulations_by_type (dict): Device type name -> list of simulations.
+            weights (dict, optional): Device type name -> relative share of messages;
+                types left out are not generated.
+            intervals (dict, optional): Step interval per device type name, used
+                for the default weights.
+        """
+        intervals = intervals or {}
+        if weights is None:
+            weights = {
+                name: len(simulations) / intervals.get(name, simulations[0].interval)
+                for name, simulations in simulations_by_type.items()
+                if simulations
+            }
+        unknown = set(weights) - set(simulations_by_type)
+        if unknown:
+            raise ValueError(f"No devices of type {', '.join(sorted(unknown))}")
+        self.names = [name for name in weights if weights[name] > 0]
+        if not self.names:
+            raise ValueError("The message mix needs at least one positive weight.")
+        self.simulations = [simulations_by_type[name] for name in self.names]
+        self.cumulative = []
+        total = 0.0
+        for name in self.names:
+            total += weights[name]
+            self.cumulative.append(total)
+        self.pending = []
+
+    def next_message(self):
+        """
+        Return (device type name, topic, payload) for the next message, or None
+        if ``max_attempts`` device steps in a row produced nothing to send.
+        """
+        pending = self.pending
+        # State devices may skip a step with nothing new to say; try another device,
+        # but not forever: a quiet fleet (e.g. activity 0) may have nothing at all.
+        attempts = 0
+        while not pending:
+            if attempts == self.max_attempts:
+                return None
+            attempts += 1
+            slot = bisect.bisect(self.cumulative, random.random() * self.cumulative[-1])
+            slot = min(slot, len(self.names) - 1)
+            simulation = random.choice(self.simulations[slot])
+            name = self.names[slot]
+            pending.extend(
+                (name, topic, payload)
+                for topic, payload in reversed(simulation.generate_messages())
+            )
+        return pending.pop()
+
+
+class LoadGenerator:
+    """
+    Publishes a device message mix at a fixed aggregate rate (open loop).
+
+    Every message gets a slot from a TokenBucket; a slot for which the mix has
+    nothing to send is counted as skipped. Two latencies are recorded:
+    service time, how long the publish call took, and response time, from the
+    slot's due time to the end of the publish, which includes any time spent
+    behind schedule.
+    """
+
+    def __init__(
+        self,
+        mqtt_manager,
+        mix,
+        rate,
+        report_interval=1.0,
+        clock=time.perf_counter,
+        sleep=time.sleep,
+        on_report=None,
+    ):
+        """
+        Args:
+            mqtt_manager: Manager whose ``publish`` sends the messages.
+            mix (MessageMix): Source of the messages.
+            rate (float): Target messages per second across all devices.
+            report_interval (float): Seconds between throughput lines, or 0 for none.
+            clock (callable): Monotonic time source.
+            sleep (callable): Used to wait for the next slot.
+            on_report (callable, optional): Receives each interval's report instead
+                of it being printed, in the scheduler's format: steps (messages
+                sent), mean_lag and max_lag (response time) and overdue (backlog).
+                A last report covers the rest of the run.
+        """
+        self.mqtt_manager = mqtt_manager
+        self.mix = mix
+        self.bucket = TokenBucket(rate, clock, sleep)
+        self.report_interval = report_interval
+        self.clock = clock
+        self.service = LatencyHistogram()
+        self.response = LatencyHistogram()
+        self.sent_by_type = {name: 0 for name in mix.names}
+        self.max_backlog = 0
+        self.skipped = 0  # Slots for which the mix had no message
+        self.on_report = on_report
+        self._stopping = threading.Event()
+
+    def stop(self):
+        """Ask a running ``run()`` to return; safe to call from another thread."""
+        self._stopping.set()
+
+    def _report(self, sent, elapsed, lag_total, lag_max):
+        """Print (or pass to ``on_report``) one interval's throughput and lag."""
+        backlog = self.bucket.backlog()
+        self.max_backlog = max(self.max_backlog, backlog)
+        if self.on_report is not None:
+            self.on_report(
+                {
+                    "steps": sent,
+                    "mean_lag": lag_total / sent if sent else 0.0,
+                    "max_lag": lag_max,
+                    "overdue": backlog,
+                }
+            )
+            return
+        get_sink().info(
+            "Load: %.0f msg/s, %d behind schedule",
+            sent / elapsed if elapsed else 0.0,
+            backlog,
+        )
+
+    def run(self, duration):
+        """
+        Publish for `duration` seconds, or until Ctrl+C if it is None, and return a report.
+
+        Returns:
+            dict: sent, skipped, elapsed, target_rate, achieved_rate, max_backlog,
+                by_type, and the service and response LatencyHistograms.
+        """
+        clock = self.clock
+        publish = self.mqtt_manager.publish
+        take = self.bucket.take
+        next_message = self.mix.next_message
+        record_service = self.service.record
+        record_response = self.response.record
+        sent_by_type = self.sent_by_type
+
+        began = clock()
+        end = began + duration if duration is not None else math.inf
+        last_report = began
+        sent = reported = 0
+        lag_total = lag_max = 0.0  # Response times since the last report
+        try:
+            while True:
+                due = take()
+                if due >= end or self._stopping.is_set():
+                    break
+                message = next_message()
+                if message is None:
+                    self.skipped += 1
+                    continue
+                name, topic, payload = message
+                started = clock()
+                publish(topic, payload)
+                finished = clock()
+                response = finished - due
+                record_service(finished - started)
+                record_response(response)
+                sent_by_type[name] += 1
+                sent += 1
+                lag_total += response
+                if response > lag_max:
+                    lag_max = response
+
+                if (
+                    self.report_interval
+                    and finished - last_report >= self.report_interval
+                ):
+                    self._report(
+                        sent - reported, finished - last_report, lag_total, lag_max
+                    )
+                    reported = sent
+                    last_report = finished
+                    lag_total = lag_max = 0.0
+        except KeyboardInterrupt:
+            get_sink().info("Stopped load generation.")
+        if self.on_report is not None:
+            self._report(sent - reported, clock() - last_report, lag_total, lag_max)
+        elapsed = clock() - began
+        return {
+            "sent": sent,
+            "skipped": self.skipped,
+            "elapsed": elapsed,
+            "target_rate": self.bucket.rate,
+            "achieved_rate": sent / elapsed if elapsed else 0.0,
+            "max_backlog": max(self.max_backlog, self.bucket.backlog()),
+            "by_type": dict(sent_by_type),
+            "service": self.service,
+            "response": self.response,
+        }
+
+
+def _format_ms(seconds):
+    return f"{seconds * 1000:.3f} ms"
+
+
+def print_histogram(title, histogram, width=40):
+    """Print percentiles and a power-of-two bar chart of a LatencyHistogram."""
+    sink = get_sink()
+    summary = histogram.summary()
+    sink.info(
+        "%s: %d samples, mean %s, %s",
+        title,
+        summary["count"],
+        _format_ms(summary["mean"]),
+        ", ".join(
+            f"{key} {_format_ms(value)}"
+            for key, value in summary.items()
+            if key.startswith("p") or key == "max"
+        ),
+    )
+    buckets = list(histogram.buckets())
+    largest = max((count for _, count in buckets), default=0)
+    for upper, count in buckets:
+        bar = "#" * max(1, round(width * count / largest))
+        sink.info("  <= %12s  %-*s %d", _format_ms(upper), width, bar, count)
+
+
+def print_load_report(report):
+    """Print the throughput and latency histograms of a LoadGenerator run."""
+    get_sink().info(
+        "Load: %d messages in %.2f s, %.0f msg/s achieved (target %.0f), "
+        "at most %d behind schedule",
+        report["sent"],
+        report["elapsed"],
+        report["achieved_rate"],
+        report["target_rate"],
+        report["max_backlog"],
+    )
+    if report["skipped"]:
+        get_sink().warning(
+            "Load: %d slots skipped because no device had a message to send",
+            report["skipped"],
+        )
+    for name, count in report["by_type"].items():
+        get_sink().info("  %s: %d messages", name, count)
+    print_histogram("Service time", report["service"])
+    print_histogram("Response time", report["response"])
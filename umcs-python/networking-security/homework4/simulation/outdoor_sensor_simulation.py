@@ -1,26 +1,38 @@
-import time
+from broker.payload_codec import encode_payload
 
+from .device_simulation import DeviceSimulation
 
-class OutdoorSensorSimulation:
-    def __init__(self, outdoor_sensor, mqtt_manager):
+
+class OutdoorSensorSimulation(DeviceSimulation):
+    __slots__ = (
+        "outdoor_sensor",
+        "humidity_topic",
+        "temperature_topic",
+        "telemetry_topic",
+    )
+
+    interval = 3  # Simulate every 3 seconds
+
+    def __init__(self, outdoor_sensor, mqtt_manager, packed=False):
+        super().__init__(outdoor_sensor, mqtt_manager, packed)
         self.outdoor_sensor = outdoor_sensor
-        self.mqtt_manager = mqtt_manager
+        # Only the topics used by the selected payload mode are kept per device.
+        self.humidity_topic = None if packed else self.device_topic("humidity/update")
+        self.temperature_topic = (
+            None if packed else self.device_topic("temperature/update")
+        )
+        self.telemetry_topic = self.device_topic("telemetry/update") if packed else None
 
-    def simulate(self):
-        """Simulate the outdoor sensor and publish its data."""
-        while True:
-            self.simulate_step()
-            time.sleep(3)  # Simulate every 3 seconds
+    def generate_messages(self):
+        """
+        Generate the outdoor sensor messages carrying its data.
 
-    def simulate_step(self):
-        """Simulate one step for the outdoor sensor."""
-        if self.outdoor_sensor.powered:
-            data = self.outdoor_sensor.generate_data()
-            for key, value in data.items():
-                topic = f"home/{self.outdoor_sensor.group_id}/{self.outdoor_sensor.device_type}/{self.outdoor_sensor.device_id}/{key}/update"
-                self.mqtt_manager.publish(topic, value)
-                print(f"Published to {topic}: {value}")
-        else:
-            print(
-                f"{self.outdoor_sensor.device_type} {self.outdoor_sensor.device_id} is powered OFF."
-            )
+        In packed mode all readings go out as a single telemetry message.
+        """
+        data = self.outdoor_sensor.generate_data()
+        if self.packed:
+            return [(self.telemetry_topic, encode_payload("sensor", data))]
+        return [
+            (self.humidity_topic, data["humidity"]),
+            (self.temperature_topic, data["temperature"]),
+        ]
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from output.output_sink import get_sink
+
+
+class LagStats:
+    """
+    Accumulates how late simulation steps fire compared to their schedule.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clear all counters."""
+        self.steps = 0
+        self.skipped = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def record(self, lag):
+        """Record the lag (in seconds) of one fired step."""
+        self.steps += 1
+        self.total_lag += lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    @property
+    def mean_lag(self):
+        return self.total_lag / self.steps if self.steps else 0.0
+
+    def summary(self):
+        """Return the counters as a dictionary."""
+        return {
+            "steps": self.steps,
+            "skipped": self.skipped,
+            "mean_lag": self.mean_lag,
+            "max_lag": self.max_lag,
+        }
+
+
+class SimulationScheduler:
+    """
+    Fires each simulation's step at its own interval using a min-heap of due times.
+
+    Every simulation is started at a random phase within its interval and each
+    following step is scheduled ``interval`` seconds after the previous due time,
+    scaled by a random jitter. The loop sleeps until the earliest due step, so CPU
+    use follows the number of steps fired rather than the number of devices.
+    """
+
+    def __init__(
+        self,
+        jitter=0.1,
+        report_interval=10.0,
+        clock=time.monotonic,
+        sleep=None,
+        on_report=None,
+    ):
+        """
+        Initializes an empty scheduler.
+
+        Args:
+            jitter (float): Fraction of the interval by which each step may be moved (0.1 = ±10%).
+            report_interval (float): Seconds between lag reports, or 0 to disable them.
+            clock (Callable[[], float]): Monotonic time source.
+            sleep (Callable[[float], None], optional): Sleep function used while idle;
+                by default waits on the stop event so ``stop()`` wakes the loop.
+            on_report (Callable[[dict], None], optional): Receives each lag report instead
+                of it being printed.
+        """
+        self.jitter = jitter
+        self.report_interval = report_interval
+        self.clock = clock
+        self.on_report = on_report
+        self.stats = LagStats()
+        self._heap = []
+        # Tie-breaker so simulations are never compared
+        self._counter = itertools.count()
+        self._stop_event = threading.Event()
+        self.sleep = sleep or self._stop_event.wait
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, simulation, interval=None):
+        """
+        Schedule a simulation.
+
+        Args:
+            simulation: Object with a ``simulate_step()`` method and an ``interval`` attribute.
+            interval (float, optional): Overrides the simulation's own interval.
+        """
+        interval = interval if interval is not None else simulation.interval
+        first_due = self.clock() + random.uniform(0, interval)
+        heapq.heappush(
+            self._heap, (first_due, next(self._counter), interval, simulation)
+        )
+
+    def run_pending(self):
+        """
+        Fire every step that is due now.
+
+        Returns:
+            int: The number of steps fired.
+        """
+        heap = self._heap
+        now = self.clock()
+        fired = 0
+        while heap and heap[0][0] <= now and not self._stop_event.is_set():
+            due, _, interval, simulation = heap[0]
+            # Lag is how late the step starts; its own run time is not lag.
+            self.stats.record(self.clock() - due)
+            simulation.simulate_step()
+            fired += 1
+
+            next_due = due + self._jittered(interval)
+            if next_due <= now:
+                # Too far behind: drop the missed ticks instead of bursting to catch up.
+                self.stats.skipped += 1
+                next_due = now + self._jittered(interval)
+            heapq.heapreplace(
+                heap, (next_due, next(self._counter), interval, simulation)
+            )
+        return fired
+
+    def lag_report(self):
+        """Return lag statistics since the last report, including how many steps are overdue."""
+        summary = self.stats.summary()
+        now = self.clock()
+        summary["overdue"] = sum(1 for entry in self._heap if entry[0] < now)
+        return summary
+
+    def run(self, duration=None):
+        """
+        Run the scheduling loop.
+
+        A ``stop()`` made before the loop starts makes it return at once; the
+        stop is consumed when the loop returns, so the scheduler can run again.
+
+        Args:
+            duration (float, optional): Seconds to run for; runs until interrupted if omitted.
+        """
+        try:
+            self._run(duration)
+        finally:
+            self._stop_event.clear()
+
+    def _run(self, duration):
+        start = self.clock()
+        next_report = start + self.report_interval
+        while self._heap and not self._stop_event.is_set():
+            self.run_pending()
+            now = self.clock()
+
+            if self.report_interval and now >= next_report:
+                self.print_report()
+                next_report = now + self.report_interval
+            if duration is not None and now - start >= duration:
+                break
+
+            wait = self._heap[0][0] - now
+            if duration is not None:
+                wait = min(wait, start + duration - now)
+            if self.report_interval:
+                wait = min(wait, next_report - now)
+            if wait > 0:
+                self.sleep(wait)
+
+    def stop(self):
+        """Ask a running ``run()`` loop to return; safe to call from another thread."""
+        self._stop_event.set()
+
+    def print_report(self):
+        """Print (or pass to ``on_report``) and reset the lag statistics."""
+        report = self.lag_report()
+        self.stats.reset()
+        if self.on_report is not None:
+            self.on_report(report)
+            return
+        get_sink().info(
+            "Scheduler: %d steps, mean lag %.1f ms, max lag %.1f ms, %d skipped, %d overdue",
+            report["steps"],
+            report["mean_lag"] * 1000,
+            report["max_lag"] * 1000,
+            report["skipped"],
+            report["overdue"],
+        )
+
+    def _jittered(self, interval):
+        if not self.jitter:
+            return interval
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,232 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from logging import WARNING
+
+from output.output_sink import PrintSink, get_sink, set_sink
+
+
+def _run_shard(shard_index, fleet, settings, reports, stop_event):
+    """
+    Simulate one shard of the fleet in a worker process.
+
+    Each worker owns its own MQTTManager connection and SimulationController,
+    and sends a report dictionary to the parent every report interval. With a
+    ``load_rate``, the worker publishes its share of that rate from its devices
+    instead of running them on their own intervals.
+    """
+    # Imported here so the parent process does not need paho to start workers.
+    from broker.client_pool import PooledMQTTManager
+    from broker.mqtt_manager import MQTTManager
+
+    from .scheduler import SimulationScheduler
+    from .simulation_controller import SimulationController
+
+    set_sink(PrintSink(level=settings.get("worker_log_level", WARNING)))
+    pool_size = settings.get("pool_size", 1)
+    coalesce_window = settings.get("coalesce_window")
+    trace = settings.get("trace", False)
+    if pool_size > 1:
+        mqtt_manager = PooledMQTTManager(
+            broker=settings["broker"],
+            port=settings["port"],
+            pool_size=pool_size,
+            coalesce_window=coalesce_window,
+            trace=trace,
+        )
+    else:
+        mqtt_manager = MQTTManager(
+            broker=settings["broker"],
+            port=settings["port"],
+            coalesce_window=coalesce_window,
+            trace=trace,
+        )
+    mqtt_manager.connect()
+    mqtt_manager.start()
+
+    controller = SimulationController(
+        mqtt_manager,
+        fleet=fleet,
+        sampler_model=settings.get("sampler"),
+        packed_payloads=settings.get("packed", False),
+        snapshot_every=settings.get("snapshot_every"),
+        activity=settings.get("activity", 1.0),
+        intervals=settings.get("intervals"),
+        report_interval=settings.get("report_interval", 5.0),
+    )
+
+    last = {"time": time.monotonic(), "published": 0}
+
+    def send_report(report):
+        now = time.monotonic()
+        published = mqtt_manager.published_count
+        report.update(
+            shard=shard_index,
+            devices=fleet.total(),
+            published=published - last["published"],
+            elapsed=now - last["time"],
+        )
+        last.update(time=now, published=published)
+        reports.put(report)
+
+    load_rate = settings.get("load_rate")
+    if load_rate:
+        # Let the parent stop the generator without killing the process mid-publish.
+        threading.Thread(
+            target=lambda: (stop_event.wait(), controller.stop()), daemon=True
+        ).start()
+        controller.generate_load(
+            load_rate, settings.get("duration"), settings.get("load_mix"), send_report
+        )
+        mqtt_manager.stop()
+        return
+
+    interval_by_class = {
+        controller.simulation_classes[name]: interval
+        for name, interval in (settings.get("intervals") or {}).items()
+    }
+
+    scheduler = SimulationScheduler(
+        jitter=settings.get("jitter", 0.1),
+        report_interval=settings.get("report_interval", 5.0),
+        on_report=send_report,
+    )
+    for simulation in controller.build_simulations():
+        scheduler.add(simulation, interval_by_class.get(type(simulation)))
+
+    # Let the parent stop the scheduler without killing the process mid-publish.
+    threading.Thread(
+        target=lambda: (stop_event.wait(), scheduler.stop()), daemon=True
+    ).start()
+    try:
+        scheduler.run(settings.get("duration"))
+    except KeyboardInterrupt:
+        pass  # The parent handles Ctrl+C and sets stop_event
+    scheduler.print_report()
+    mqtt_manager.stop()
+
+
+class ShardedRunner:
+    """
+    Splits a fleet across worker processes so the device count scales with cores.
+
+    Every worker runs its own MQTT connection and scheduler for a disjoint slice
+    of device ids. The parent collects their periodic reports and prints the
+    publish rate and scheduling lag per shard and in total. A fleet smaller
+    than the shard count gets one worker per device.
+    """
+
+    def __init__(self, fleet, settings, shards=None):
+        """
+        Initializes the runner.
+
+        Args:
+            fleet (FleetSpec): The whole fleet to simulate.
+            settings (dict): broker, port and optionally pool_size,
+                coalesce_window, trace, jitter, report_interval, sampler, packed,
+                snapshot_every, activity, intervals, duration, load_rate (in
+                total, split evenly between the workers), load_mix and
+                worker_log_level.
+            shards (int, optional): Number of worker processes; defaults to the CPU count.
+        """
+        self.fleet = fleet
+        self.settings = settings
+        self.shards = shards or os.cpu_count() or 1
+        self.totals = {}
+        self.failed = (
+            {}
+        )  # Shard index -> exit code of workers that did not exit cleanly
+
+    def run(self):
+        """
+        Start the workers, print aggregated reports until they finish, then join them.
+
+        Returns:
+            dict: Total published messages and steps per shard. Shards whose
+            worker failed are listed with their exit code in ``failed``.
+        """
+        context = multiprocessing.get_context()
+        reports = context.Queue()
+        stop_event = context.Event()
+        fleets = [fleet for fleet in self.fleet.split(self.shards) if fleet.total()]
+        settings = dict(self.settings)
+        if settings.get("load_rate"):
+            settings["load_rate"] /= len(fleets)
+        workers = [
+            context.Process(
+                target=_run_shard,
+                args=(index, fleet, settings, reports, stop_event),
+                name=f"shard-{index}",
+            )
+            for index, fleet in enumerate(fleets)
+        ]
+        for worker in workers:
+            worker.start()
+        get_sink().info(
+            "Simulating %d devices across %d shards... Press Ctrl+C to stop.",
+            self.fleet.total(),
+            len(workers),
+        )
+
+        try:
+            self._collect(reports, workers)
+        except KeyboardInterrupt:
+            get_sink().info("Stopping shards...")
+            stop_event.set()
+            self._collect(reports, workers)
+        for worker in workers:
+            worker.join()
+        self._check_exits(workers)
+        return self.totals
+
+    def _check_exits(self, workers):
+        """Record and report workers that have exited with a non-zero code."""
+        for index, worker in enumerate(workers):
+            if worker.exitcode and index not in self.failed:
+                self.failed[index] = worker.exitcode
+                get_sink().error("Shard %d exited with code %d", index, worker.exitcode)
+
+    def _collect(self, reports, workers):
+        """Aggregate shard reports until every worker has exited."""
+        pending = {}
+        while any(worker.is_alive() for worker in workers) or not reports.empty():
+            try:
+                report = reports.get(timeout=0.5)
+            except queue.Empty:
+                self._check_exits(workers)
+                continue
+            totals = self.totals.setdefault(
+                report["shard"], {"published": 0, "steps": 0}
+            )
+            totals["published"] += report["published"]
+            totals["steps"] += report["steps"]
+            pending[report["shard"]] = report
+            if len(pending) == len(workers) - len(self.failed):
+                self.print_reports(pending)
+                pending = {}
+        if pending:
+            self.print_reports(pending)
+
+    def print_reports(self, reports):
+        """Print one line per shard plus the aggregate rate and worst lag."""
+        total_rate = 0.0
+        worst_lag = 0.0
+        for shard in sorted(reports):
+            report = reports[shard]
+            rate = report["published"] / report["elapsed"] if report["elapsed"] else 0.0
+            total_rate += rate
+            worst_lag = max(worst_lag, report["max_lag"])
+            get_sink().info(
+                "Shard %d: %d devices, %.0f msg/s, mean lag %.1f ms, max lag %.1f ms, %d overdue",
+                shard,
+                report["devices"],
+                rate,
+                report["mean_lag"] * 1000,
+                report["max_lag"] * 1000,
+                report["overdue"],
+            )
+        get_sink().info(
+            "All shards: %.0f msg/s, max lag %.1f ms", total_rate, worst_lag * 1000
+        )
@@ -1,17 +1,28 @@
+import asyncio
+import threading
+from functools import partial
+
 # Device simulators
 from .door_sensor_simulation import DoorSensorSimulation
+from .fleet import FleetSpec, device_slug
 from .indoor_sensor_simulation import IndoorSensorSimulation
+from .load_generator import LoadGenerator, MessageMix, print_load_report
 from .light_switch_simulation import LightSwitchSimulation
 from .outdoor_sensor_simulation import OutdoorSensorSimulation
+from .scheduler import SimulationScheduler
+from .state_simulation import StateSimulation
 from .vacuum_cleaner_simulation import VacuumCleanerSimulation
 
 # Devices
-from ..devices.device_type import DeviceType
-from ..devices.door_sensor import DoorSensor
-from ..devices.indoor_sensor import IndoorSensor
-from ..devices.light_switch import LightSwitch
-from ..devices.outdoor_sensor import OutdoorSensor
-from ..devices.vacuum_cleaner import VacuumCleaner
+from devices.device_type import DeviceType
+from devices.door_sensor import DoorSensor
+from devices.indoor_sensor import IndoorSensor
+from devices.light_switch import LightSwitch
+from devices.outdoor_sensor import OutdoorSensor
+from devices.sensor_sampler import SensorFleetSampler
+from devices.state_store import DeviceStateStore, StatefulDevice
+from devices.vacuum_cleaner import VacuumCleaner
+from output.output_sink import get_sink
 
 
 class SimulationController:
@@ -19,11 +30,50 @@ class SimulationController:
     Controls the simulation of devices based on user selection.
     """
 
-    def __init__(self, mqtt_manager):
+    def __init__(
+        self,
+        mqtt_manager,
+        fleet=None,
+        jitter=0.1,
+        report_interval=10.0,
+        sampler_model=None,
+        packed_payloads=False,
+        intervals=None,
+        snapshot_every=None,
+        activity=1.0,
+    ):
         """
         Initializes the controller with an MQTT manager and simulation classes.
+
+        Args:
+            mqtt_manager: The MQTT manager used to publish device data.
+            fleet (FleetSpec, optional): Devices to simulate; defaults to one device per type.
+            jitter (float): Fraction of each step interval used as random jitter.
+            report_interval (float): Seconds between scheduler lag reports.
+            sampler_model (str, optional): SensorFleetSampler model shared by all indoor/outdoor
+                sensors; when omitted each sensor samples independently.
+            packed_payloads (bool): Send sensor readings as one packed binary message per tick.
+            intervals (dict, optional): Step interval in seconds per device type name,
+                overriding each simulation's default.
+            snapshot_every (int, optional): For door, light and vacuum devices, publish
+                only state changes plus a full state every this many steps; when
+                omitted they publish on every step.
+            activity (float): Chance that a door, light or vacuum device changes
+                during a step.
         """
         self.mqtt_manager = mqtt_manager
+        self.fleet = fleet if fleet is not None else FleetSpec.single()
+        self.jitter = jitter
+        self.report_interval = report_interval
+        self.sampler_model = sampler_model
+        self.packed_payloads = packed_payloads
+        self.intervals = intervals or {}
+        self.snapshot_every = snapshot_every
+        self.activity = activity
+        self._running = None  # Scheduler or load generator of the current run
+        # Set by stop(); kept until the run ends so an early stop is not lost.
+        self._stop_requested = threading.Event()
+        self.store = DeviceStateStore()  # States of the door, light and vacuum devices
         self.device_classes = {
             DeviceType.DOOR_SENSOR.value: DoorSensor,
             DeviceType.INDOOR_SENSOR.value: IndoorSensor,
@@ -46,33 +96,227 @@ class SimulationController:
         Args:
             device_name (str): The name of the device to simulate.
         """
-        device_class = self.device_classes[device_name]
         simulation_class = self.simulation_classes[device_name]
-        device = device_class(
-            "home", device_name.replace(" ", "_").lower(), self.mqtt_manager
-        )
-        simulation = simulation_class(device, self.mqtt_manager)
+        device = self.device_factories()[device_name]("home", device_slug(device_name))
+        device.power_on()
+        simulation = self._create_simulation(simulation_class, device)
 
-        print(f"Simulating {device_name}... Press Ctrl+C to stop.")
+        get_sink().info("Simulating %s... Press Ctrl+C to stop.", device_name)
         try:
             simulation.simulate()  # Run simulation
         except KeyboardInterrupt:
-            print(f"\nStopped simulation for {device_name}.")
+            get_sink().info("Stopped simulation for %s.", device_name)
 
-    def simulate_all_devices(self):
+    def build_simulations(self):
         """
-        Simulates all devices concurrently.
+        Creates a powered-on device and its simulation for every device in the fleet.
+
+        Each build starts a new state store, so devices of a previous build are
+        not kept alive by it.
+
+        Returns:
+            list: The simulation instances.
         """
+        self.store = DeviceStateStore()
         simulations = []
-        for name, cls in self.device_classes.items():
-            device = cls("home", name.replace(" ", "_").lower(), self.mqtt_manager)
-            simulation_cls = self.simulation_classes[name]
-            simulations.append(simulation_cls(device, self.mqtt_manager))
+        samplers = {}
+        stop_requested = self._stop_requested.is_set
+        for name, device in self.fleet.iter_devices(self.device_factories()):
+            if stop_requested():
+                break  # Large fleets take a while; a stopped run need not wait
+
+            if self.sampler_model and isinstance(device, (IndoorSensor, OutdoorSensor)):
+                if name not in samplers:
+                    samplers[name] = SensorFleetSampler(self.sampler_model)
+                samplers[name].attach(device)
+            device.power_on()
+            simulations.append(
+                self._create_simulation(self.simulation_classes[name], device)
+            )
+        return simulations
+
+    def device_factories(self):
+        """
+        Returns a constructor per device type name, taking (group_id, device_id).
+
+        Stateful devices are created in the controller's state store.
+        """
+        return {
+            name: (
+                partial(device_class, store=self.store)
+                if issubclass(device_class, StatefulDevice)
+                else device_class
+            )
+            for name, device_class in self.device_classes.items()
+        }
+
+    def _create_simulation(self, simulation_class, device):
+        """Create a simulation with the options that apply to its class."""
+        if issubclass(simulation_class, StateSimulation):
+            return simulation_class(
+                device,
+                self.mqtt_manager,
+                packed=self.packed_payloads,
+                snapshot_every=self.snapshot_every,
+                activity=self.activity,
+            )
+        return simulation_class(device, self.mqtt_manager, packed=self.packed_payloads)
+
+    def topic_filter(self, device_name):
+        """
+        Returns the topic filter matching every device of one type.
 
-        print("Simulating all devices... Press Ctrl+C to stop.")
+        Args:
+            device_name (str): The device type name, e.g. 'Door Sensor'.
+        """
+        return f"home/+/{self.device_classes[device_name].DEVICE_TYPE}/#"
+
+    def simulate_all_devices(self, duration=None):
+        """
+        Simulates all devices concurrently, each at its own interval.
+
+        Args:
+            duration (float, optional): Seconds to run for; runs until Ctrl+C if omitted.
+        """
+        scheduler = SimulationScheduler(
+            jitter=self.jitter, report_interval=self.report_interval
+        )
+        interval_by_class = {
+            self.simulation_classes[name]: interval
+            for name, interval in self.intervals.items()
+        }
+        for simulation in self.build_simulations():
+            scheduler.add(simulation, interval_by_class.get(type(simulation)))
+        self._start(scheduler)
+
+        get_sink().info(
+            "Simulating %d devices... Press Ctrl+C to stop.", len(scheduler)
+        )
         try:
-            while True:
-                for simulation in simulations:
-                    simulation.simulate_step()  # Perform one step per device
+            scheduler.run(duration)
         except KeyboardInterrupt:
-            print("\nStopped simulation for all devices.")
+            get_sink().info("Stopped simulation for all devices.")
+        finally:
+            self._finish()
+        scheduler.print_report()
+
+    def generate_load(self, rate, duration=None, mix=None, on_report=None):
+        """
+        Publishes the fleet's messages at a fixed aggregate rate instead of per-device intervals.
+
+        Args:
+            rate (float): Target messages per second.
+            duration (float, optional): Seconds to run for; runs until Ctrl+C if omitted.
+            mix (dict, optional): Relative share of messages per device type name;
+                defaults to each type's natural share (device count / interval).
+            on_report (Callable[[dict], None], optional): Receives the periodic
+                reports instead of them being printed (see LoadGenerator).
+
+        Returns:
+            dict: The LoadGenerator report, or None if stopped before it started.
+        """
+        by_class = {cls: name for name, cls in self.simulation_classes.items()}
+        simulations_by_type = {}
+        for simulation in self.build_simulations():
+            simulations_by_type.setdefault(by_class[type(simulation)], []).append(
+                simulation
+            )
+        if self._stop_requested.is_set():
+            # Stopped while building; the mix may be empty, so do not create one.
+            self._finish()
+            return None
+        generator = LoadGenerator(
+            self.mqtt_manager,
+            MessageMix(simulations_by_type, mix, self.intervals),
+            rate,
+            report_interval=self.report_interval,
+            on_report=on_report,
+        )
+        self._start(generator)
+
+        get_sink().info(
+            "Generating %.0f msg/s from %d devices... Press Ctrl+C to stop.",
+            rate,
+            sum(len(simulations) for simulations in simulations_by_type.values()),
+        )
+        try:
+            report = generator.run(duration)
+        finally:
+            self._finish()
+        print_load_report(report)
+        return report
+
+    def stop(self):
+        """
+        Ends a running ``simulate_all_devices``, ``simulate_all_devices_async`` or
+        ``generate_load`` call; safe to call from another thread.
+
+        A stop that arrives while the fleet is still being built is kept, and the
+        run returns as soon as it would start.
+        """
+        self._stop_requested.set()
+        running = self._running
+        if running is not None:
+            running.stop()
+
+    def _start(self, running):
+        """Publish the scheduler or generator about to run, honouring an early stop."""
+        self._running = running
+        # stop() sets the flag before reading _running, so one of the two sees the other.
+        if self._stop_requested.is_set():
+            running.stop()
+
+    def _finish(self):
+        """Forget the finished run and consume its stop request."""
+        self._running = None
+        self._stop_requested.clear()
+
+    async def simulate_all_devices_async(self, duration=None):
+        """
+        Simulates all devices as tasks on the running event loop, publishing
+        through the manager's asyncio pipeline.
+
+        Requires the controller's manager to be a started AsyncMQTTManager; its
+        pipeline is started and flushed here.
+
+        Args:
+            duration (float, optional): Seconds to run for; runs until Ctrl+C if omitted.
+        """
+        interval_by_class = {
+            self.simulation_classes[name]: interval
+            for name, interval in self.intervals.items()
+        }
+        simulations = self.build_simulations()
+        await self.mqtt_manager.start_async()
+        run = asyncio.gather(
+            *(
+                simulation.simulate_async(interval_by_class.get(type(simulation)))
+                for simulation in simulations
+            )
+        )
+        self._start(_AsyncRun(asyncio.get_running_loop(), run))
+
+        get_sink().info(
+            "Simulating %d devices asynchronously... Press Ctrl+C to stop.",
+            len(simulations),
+        )
+        try:
+            await asyncio.wait_for(run, duration)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            get_sink().info("Stopped simulation for all devices.")
+        finally:
+            self._finish()
+            await self.mqtt_manager.stop_async()
+
+
+class _AsyncRun:
+    """Lets stop() cancel an asyncio run from any thread."""
+
+    __slots__ = ("loop", "future")
+
+    def __init__(self, loop, future):
+        self.loop = loop
+        self.future = future
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.future.cancel)
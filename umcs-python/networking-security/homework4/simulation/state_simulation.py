@@ -0,0 +1,40 @@
+import random
+
+from .device_simulation import DeviceSimulation
+
+
+class StateSimulation(DeviceSimulation):
+    """
+    Base class for simulations of devices with discrete states (StatefulDevice).
+
+    By default every step publishes the current state. With ``snapshot_every``
+    set, a step publishes only if the state changed since the last publish, and
+    otherwise repeats it every ``snapshot_every`` steps so late subscribers catch
+    up. ``activity`` is the chance that a step changes the device at all, which
+    models mostly idle fleets.
+    """
+
+    __slots__ = ("snapshot_every", "activity", "steps_since_publish")
+
+    def __init__(
+        self, device, mqtt_manager, packed=False, snapshot_every=None, activity=1.0
+    ):
+        super().__init__(device, mqtt_manager, packed)
+        self.snapshot_every = snapshot_every
+        self.activity = activity
+        self.steps_since_publish = 0
+
+    def active(self):
+        """Return True if the device should act during this step."""
+        return self.activity >= 1.0 or random.random() < self.activity
+
+    def state_messages(self, topic):
+        """Return the state message for this step, or nothing if it can be skipped."""
+        device = self.device
+        changed = device.store.take_dirty(device.slot)
+        if self.snapshot_every is not None:
+            self.steps_since_publish += 1
+            if not changed and self.steps_since_publish < self.snapshot_every:
+                return []
+            self.steps_since_publish = 0
+        return [(topic, device.state)]
@@ -1,25 +1,25 @@
-import time
+from .state_simulation import StateSimulation
 
 
-class VacuumCleanerSimulation:
-    def __init__(self, vacuum_cleaner, mqtt_manager):
-        self.vacuum_cleaner = vacuum_cleaner
-        self.mqtt_manager = mqtt_manager
+class VacuumCleanerSimulation(StateSimulation):
+    __slots__ = ("vacuum_cleaner", "command_topic")
+
+    interval = 5  # Simulate every 5 seconds
 
-    def simulate(self):
-        """Simulate the vacuum cleaner and publish its commands."""
-        while True:
-            self.simulate_step()
-            time.sleep(5)  # Simulate every 5 seconds
+    def __init__(
+        self,
+        vacuum_cleaner,
+        mqtt_manager,
+        packed=False,
+        snapshot_every=None,
+        activity=1.0,
+    ):
+        super().__init__(vacuum_cleaner, mqtt_manager, packed, snapshot_every, activity)
+        self.vacuum_cleaner = vacuum_cleaner
+        self.command_topic = self.device_topic("command/update")
 
-    def simulate_step(self):
-        """Simulate one step for the vacuum cleaner."""
-        if self.vacuum_cleaner.powered:
-            command = self.vacuum_cleaner.generate_command()
-            topic = f"home/{self.vacuum_cleaner.group_id}/{self.vacuum_cleaner.device_type}/{self.vacuum_cleaner.device_id}/command/update"
-            self.mqtt_manager.publish(topic, command)
-            print(f"Published to {topic}: {command}")
-        else:
-            print(
-                f"{self.vacuum_cleaner.device_type} {self.vacuum_cleaner.device_id} is powered OFF."
-            )
+    def generate_messages(self):
+        """Generate the vacuum cleaner messages carrying its commands."""
+        if self.active():
+            self.vacuum_cleaner.generate_command()
+        return self.state_messages(self.command_topic)
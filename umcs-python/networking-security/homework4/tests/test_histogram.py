@@ -0,0 +1,85 @@
+import math
+import random
+
+import pytest
+
+from analytics.histogram import LatencyHistogram
+
+RANKS = (1, 25, 50, 90, 99, 99.9, 100)
+
+
+def microseconds(values):
+    # Half a microsecond up, so recording truncates back to the intended value.
+    return [(value + 0.5) / 1e6 for value in values]
+
+
+def exact_percentile(ordered, rank):
+    return ordered[max(1, math.ceil(len(ordered) * rank / 100)) - 1]
+
+
+@pytest.mark.parametrize("sub_bucket_bits", [4, 7, 10])
+def test_percentiles_are_within_the_precision_bound(sub_bucket_bits):
+    generator = random.Random(sub_bucket_bits)
+    values = [int(generator.lognormvariate(8, 2)) for _ in range(20000)]
+    histogram = LatencyHistogram(sub_bucket_bits=sub_bucket_bits)
+    for seconds in microseconds(values):
+        histogram.record(seconds)
+
+    ordered = sorted(values)
+    bound = 2 ** (1 - sub_bucket_bits)
+    for rank, seconds in zip(RANKS, histogram.percentiles(RANKS)):
+        exact = exact_percentile(ordered, rank)
+        reported = round(seconds * 1e6)
+        # A bucket reports its highest value, so it never understates.
+        assert exact <= reported <= exact * (1 + bound), rank
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for seconds in microseconds(range(1, 101)):
+        histogram.record(seconds)
+    assert [round(p * 1e6) for p in histogram.percentiles((1, 50, 100))] == [
+        1,
+        50,
+        100,
+    ]
+    assert histogram.minimum == 1e-6
+    assert histogram.maximum == 100e-6
+
+
+def test_merge_matches_recording_everything_in_one_histogram():
+    values = microseconds(random.Random(1).randrange(1, 10**6) for _ in range(5000))
+    whole, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for index, seconds in enumerate(values):
+        whole.record(seconds)
+        (first if index % 2 else second).record(seconds)
+    first.merge(second)
+    assert first.summary() == whole.summary()
+
+
+def test_out_of_range_values_are_clamped():
+    histogram = LatencyHistogram(highest_seconds=1.0)
+    histogram.record(-0.5)
+    histogram.record(5.0)
+    assert histogram.minimum == 0.0
+    assert histogram.maximum == 1.0
+    assert histogram.count == 2
+
+
+def test_buckets_count_every_sample():
+    histogram = LatencyHistogram()
+    for seconds in microseconds([3, 300, 30000, 3000000]):
+        histogram.record(seconds, count=2)
+    buckets = list(histogram.buckets())
+    assert sum(count for _, count in buckets) == 8
+    assert [upper for upper, _ in buckets] == sorted(upper for upper, _ in buckets)
+
+
+def test_reset_and_empty_summary():
+    histogram = LatencyHistogram()
+    histogram.record(0.25)
+    histogram.reset()
+    assert histogram.summary()["count"] == 0
+    assert histogram.percentiles(RANKS) == [0.0] * len(RANKS)
+    with pytest.raises(ValueError):
+        histogram.merge(LatencyHistogram(sub_bucket_bits=5))
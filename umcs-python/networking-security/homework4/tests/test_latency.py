@@ -0,0 +1,109 @@
+import pytest
+
+from analytics.latency import LatencyTracker
+from broker.payload_codec import decode_any, trace_payload, untrace_payload
+
+DOOR = "home/floor1/door_sensor/door_sensor_0/state/update"
+OTHER_DOOR = "home/floor1/door_sensor/door_sensor_1/state/update"
+
+
+def tracker(now=10.0):
+    return LatencyTracker(clock=lambda: now)
+
+
+def observe(latency, topic, *sequences, sent=9.5):
+    for sequence in sequences:
+        latency.observe(topic, sent, sequence)
+
+
+def counters(latency):
+    return latency.counters["door_sensor"].snapshot()
+
+
+def test_in_order_stream_has_no_loss():
+    latency = tracker()
+    observe(latency, DOOR, 0, 1, 2, 3)
+    assert counters(latency) == {
+        "received": 4,
+        "lost": 0,
+        "reordered": 0,
+        "duplicates": 0,
+        "restarts": 0,
+    }
+
+
+def test_gaps_count_as_lost_per_topic():
+    latency = tracker()
+    observe(latency, DOOR, 0, 3, 4)
+    observe(latency, OTHER_DOOR, 5, 6, 9)
+    assert counters(latency)["lost"] == 4
+
+
+def test_late_message_is_reordered_and_no_longer_lost():
+    latency = tracker()
+    observe(latency, DOOR, 0, 2, 1, 3)
+    assert counters(latency)["lost"] == 0
+    assert counters(latency)["reordered"] == 1
+
+
+def test_duplicates_and_restarts():
+    latency = tracker()
+    observe(latency, DOOR, 5, 6, 6, 0, 1)
+    result = counters(latency)
+    assert result["duplicates"] == 1
+    assert result["restarts"] == 1
+    assert result["lost"] == 0
+
+
+def test_sequence_wraps_without_loss():
+    latency = tracker()
+    observe(latency, DOOR, 2**32 - 2, 2**32 - 1, 1)
+    # 0 itself is skipped, so only that one message is lost.
+    assert counters(latency)["lost"] == 1
+    assert counters(latency)["restarts"] == 0
+
+
+def test_reorder_after_export_corrects_the_totals_not_the_new_interval():
+    latency = tracker()
+    observe(latency, DOOR, 0, 2)
+    assert latency.take_reports()["door_sensor"]["lost"] == 1
+    observe(latency, DOOR, 1)
+    report = latency.take_reports()["door_sensor"]
+    assert report["lost"] == 0
+    assert report["reordered"] == 1
+    totals = latency.total_counters["door_sensor"].snapshot()
+    assert totals["lost"] == 0
+    assert totals["reordered"] == 1
+    assert totals["received"] == 3
+
+
+def test_reports_reset_each_interval_and_accumulate_totals():
+    latency = tracker()
+    observe(latency, DOOR, 0, 1)
+    first = latency.take_reports()["door_sensor"]
+    assert first["count"] == 2
+    assert first["p50"] == pytest.approx(0.5, rel=0.02)
+    assert latency.take_reports() == {}  # Nothing new since
+    observe(latency, DOOR, 2)
+    latency.take_reports()
+    assert latency.totals["door_sensor"].count == 3
+
+
+def test_non_device_topics_are_ignored():
+    latency = tracker()
+    observe(latency, "metrics/latency/door_sensor", 0, 5)
+    observe(latency, "home/door_sensor", 0, 5)
+    assert latency.counters == {}
+
+
+@pytest.mark.parametrize(
+    "payload, inner", [("OPEN", b"OPEN"), (21.5, b"21.5"), (b"\x01\x02", b"\x01\x02")]
+)
+def test_trace_prefix_round_trips(payload, inner):
+    traced = trace_payload(payload, 2**32 + 7, sent=1234.5)
+    assert untrace_payload(traced) == (1234.5, 7, inner)
+
+
+def test_untraced_payloads_are_left_alone():
+    assert untrace_payload(b"OPEN") is None
+    assert decode_any(trace_payload("OPEN", 1)) == "OPEN"
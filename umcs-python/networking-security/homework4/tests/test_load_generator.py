@@ -0,0 +1,75 @@
+import pytest
+
+from simulation.load_generator import LoadGenerator, MessageMix, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Quiet:
+    """A state device with nothing new to say."""
+
+    interval = 1.0
+
+    def generate_messages(self):
+        return []
+
+
+class Chatty:
+    interval = 1.0
+
+    def generate_messages(self):
+        return [("home/a/b/c/state", "ON"), ("home/a/b/c/level", 3)]
+
+
+class Recorder:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, message):
+        self.published.append((topic, message))
+
+
+def test_token_bucket_reports_due_times_not_take_times():
+    clock = FakeClock()
+    bucket = TokenBucket(10, clock, clock.sleep)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.1, 0.2]
+    clock.now += 1.0  # Stall: the backlog keeps its original schedule
+    assert bucket.take() == pytest.approx(0.3)
+    assert bucket.backlog() == 9  # Due by 1.2 s: tokens 0-12, of which 4 were taken
+
+
+def test_mix_returns_every_message_of_a_step_in_order():
+    mix = MessageMix({"Light Switch": [Chatty()]})
+    assert mix.next_message() == ("Light Switch", "home/a/b/c/state", "ON")
+    assert mix.next_message() == ("Light Switch", "home/a/b/c/level", 3)
+
+
+def test_quiet_fleet_gives_up_a_slot_instead_of_hanging():
+    mix = MessageMix({"Door Sensor": [Quiet(), Quiet()]})
+    assert mix.next_message() is None
+
+
+def test_generator_counts_skipped_slots():
+    clock = FakeClock()
+    manager = Recorder()
+    generator = LoadGenerator(
+        manager,
+        MessageMix({"Door Sensor": [Quiet()]}),
+        rate=100,
+        report_interval=0,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+    report = generator.run(duration=1.0)
+    assert report["sent"] == 0
+    assert report["skipped"] == 100
+    assert manager.published == []
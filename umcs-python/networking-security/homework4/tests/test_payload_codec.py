@@ -0,0 +1,62 @@
+import pytest
+
+from broker.payload_codec import decode_any, decode_payload, encode_payload, is_packed
+
+
+def test_sensor_reading_round_trips():
+    payload = encode_payload(
+        "sensor", {"timestamp": 1700000000.25, "humidity": 41.5, "temperature": -3.25}
+    )
+    assert is_packed(payload)
+    assert decode_payload(payload) == {
+        "timestamp": 1700000000.25,
+        "humidity": 41.5,
+        "temperature": -3.25,
+        "schema": "sensor",
+    }
+
+
+def test_floats_are_packed_in_single_precision():
+    values = decode_payload(
+        encode_payload("sensor", {"humidity": 41.3, "temperature": 21.7})
+    )
+    assert values["humidity"] == pytest.approx(41.3, abs=1e-5)
+    assert values["temperature"] == pytest.approx(21.7, abs=1e-5)
+
+
+def test_missing_timestamp_is_filled_with_the_current_time(monkeypatch):
+    monkeypatch.setattr("broker.payload_codec.time.time", lambda: 123.5)
+    payload = encode_payload("sensor", {"humidity": 1.0, "temperature": 2.0})
+    assert decode_payload(payload)["timestamp"] == 123.5
+
+
+def test_text_payloads_are_not_packed():
+    assert not is_packed(b"OPEN")
+    assert decode_payload(b"OPEN") is None
+    assert decode_any(b"OPEN") == "OPEN"
+    assert decode_any(b"21.5") == "21.5"
+
+
+def test_decode_any_unpacks_packed_payloads():
+    payload = encode_payload(
+        "sensor", {"timestamp": 1.0, "humidity": 2.0, "temperature": 3.0}
+    )
+    assert decode_any(payload)["schema"] == "sensor"
+
+
+def test_truncated_payload_is_rejected():
+    payload = encode_payload(
+        "sensor", {"timestamp": 1.0, "humidity": 2.0, "temperature": 3.0}
+    )
+    with pytest.raises(ValueError):
+        decode_payload(payload[:-1])
+
+
+def test_unknown_version_or_schema_is_rejected():
+    payload = encode_payload(
+        "sensor", {"timestamp": 1.0, "humidity": 2.0, "temperature": 3.0}
+    )
+    with pytest.raises(ValueError):
+        decode_payload(payload[:1] + b"\x09" + payload[2:])
+    with pytest.raises(ValueError):
+        decode_payload(payload[:2] + b"\xff" + payload[3:])
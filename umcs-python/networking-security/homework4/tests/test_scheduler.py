@@ -0,0 +1,109 @@
+import pytest
+
+from simulation.scheduler import SimulationScheduler
+
+
+class FakeClock:
+    """A clock that only moves when the scheduler sleeps or a step takes time."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Step:
+    def __init__(self, clock, interval, cost=0.0):
+        self.clock = clock
+        self.interval = interval
+        self.cost = cost
+        self.fired = []
+
+    def simulate_step(self):
+        self.fired.append(self.clock())
+        self.clock.now += self.cost
+
+
+def scheduler(clock, reports=None):
+    return SimulationScheduler(
+        jitter=0,
+        report_interval=0,
+        clock=clock,
+        sleep=clock.sleep,
+        on_report=None if reports is None else reports.append,
+    )
+
+
+def test_each_simulation_fires_at_its_own_interval():
+    clock = FakeClock()
+    fast, slow = Step(clock, 1.0), Step(clock, 2.5)
+    runner = scheduler(clock)
+    runner.add(fast)
+    runner.add(slow)
+    runner.run(duration=20)
+    assert len(fast.fired) in (19, 20, 21)
+    assert len(slow.fired) in (7, 8, 9)
+    assert [b - a for a, b in zip(fast.fired, fast.fired[1:])] == pytest.approx(
+        [1.0] * (len(fast.fired) - 1)
+    )
+
+
+def test_interval_override_replaces_the_simulation_interval():
+    clock = FakeClock()
+    step = Step(clock, 1.0)
+    runner = scheduler(clock)
+    runner.add(step, interval=5.0)
+    runner.run(duration=20)
+    assert len(step.fired) in (3, 4, 5)
+
+
+def test_lag_is_measured_before_the_step_runs():
+    clock = FakeClock()
+    slow = Step(clock, 1.0, cost=0.4)
+    runner = scheduler(clock)
+    runner.add(slow)
+    runner.run(duration=10)
+    # The step's own 0.4 s is not lag: every step starts on time.
+    assert runner.stats.steps == len(slow.fired)
+    assert runner.stats.max_lag == 0.0
+
+
+def test_missed_ticks_are_skipped_instead_of_replayed():
+    clock = FakeClock()
+    stalled = Step(clock, 1.0, cost=3.5)
+    runner = scheduler(clock)
+    runner.add(stalled)
+    runner.run(duration=20)
+    # Every step after the first starts late, so its next tick is already missed.
+    assert runner.stats.skipped == len(stalled.fired) - 1
+    assert len(stalled.fired) <= 6
+
+
+def test_stop_before_run_returns_at_once_and_is_consumed():
+    clock = FakeClock()
+    step = Step(clock, 1.0)
+    runner = scheduler(clock)
+    runner.add(step)
+    runner.stop()
+    runner.run(duration=10)
+    assert step.fired == []
+    runner.run(duration=10)
+    assert step.fired
+
+
+def test_reports_include_overdue_steps_and_reset_the_stats():
+    clock = FakeClock()
+    reports = []
+    runner = scheduler(clock, reports)
+    runner.add(Step(clock, 1.0))
+    runner.run(duration=5)
+    clock.now += 10  # Fall behind without running
+    runner.print_report()
+    assert reports[0]["overdue"] == 1
+    assert reports[0]["steps"] >= 4
+    runner.print_report()
+    assert reports[1]["steps"] == 0
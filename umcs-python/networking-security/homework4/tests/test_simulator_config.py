@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from config import simulator_config
+from config.simulator_config import load_config
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    def write(values, suffix=".json"):
+        path = tmp_path / f"sim{suffix}"
+        if suffix == ".json":
+            path.write_text(json.dumps(values), encoding="utf-8")
+        else:
+            path.write_text(values, encoding="utf-8")
+        return str(path)
+
+    return write
+
+
+def test_defaults_apply_without_any_source():
+    config = load_config([], environ={})
+    assert config.port == 1883
+    assert config.shards == 1
+    assert config.broker is None
+
+
+def test_file_is_overridden_by_environment_and_environment_by_flags(config_file):
+    path = config_file({"port": 1000, "jitter": 0.5, "shards": 2, "broker": "file"})
+    environ = {"MQTT_SIM_PORT": "2000", "MQTT_SIM_JITTER": "0.25"}
+    config = load_config(["--config", path, "--port", "3000"], environ=environ)
+    assert config.port == 3000  # flag over environment over file
+    assert config.jitter == 0.25  # environment over file
+    assert config.shards == 2  # file only
+    assert config.broker == "file"
+
+
+def test_config_file_can_come_from_the_environment(config_file):
+    path = config_file({"broker": "loopback"})
+    config = load_config([], environ={"MQTT_SIM_CONFIG": path})
+    assert config.broker == "loopback"
+
+
+def test_toml_file_with_dashed_names(config_file):
+    if simulator_config.tomllib is None:
+        pytest.skip("reading TOML needs Python 3.11+ or tomli")
+    path = config_file('broker = "loopback"\nload-rate = 50\n', suffix=".toml")
+    config = load_config(["--config", path], environ={})
+    assert config.load_rate == 50.0
+
+
+def test_values_are_converted_to_the_setting_type():
+    config = load_config(
+        ["--packed", "yes", "--fleet", '{"devices": {"Door Sensor": 3}}'],
+        environ={"MQTT_SIM_DURATION": "1.5"},
+    )
+    assert config.packed is True
+    assert config.duration == 1.5
+    assert config.fleet == {"devices": {"Door Sensor": 3}}
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--port", "abc"],
+        ["--packed", "maybe"],
+        ["--log-level", "LOUD"],
+        ["--fleet", '{"devices": {"Toaster": 1}}'],
+        ["--shards", "2", "--dashboard", "true"],
+        ["--non-interactive", "--broker", "loopback"],
+    ],
+)
+def test_invalid_settings_exit_through_the_parser(argv, capsys):
+    with pytest.raises(SystemExit) as error:
+        load_config(argv, environ={})
+    assert error.value.code == 2
+    assert "error:" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("value", [1.5, True])
+def test_integer_settings_reject_fractions_and_booleans(config_file, value):
+    path = config_file({"shards": value})
+    with pytest.raises(SystemExit):
+        load_config(["--config", path], environ={})
+
+
+def test_whole_floats_are_accepted_for_integer_settings(config_file):
+    config = load_config(["--config", config_file({"shards": 2.0})], environ={})
+    assert config.shards == 2 and isinstance(config.shards, int)
+
+
+def test_unknown_setting_in_file_is_rejected(config_file):
+    with pytest.raises(SystemExit):
+        load_config(["--config", config_file({"brokr": "x"})], environ={})
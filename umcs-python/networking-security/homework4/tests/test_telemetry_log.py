@@ -0,0 +1,101 @@
+import pytest
+
+from recording import telemetry_log
+from recording.telemetry_log import (
+    KIND_FIELD,
+    KIND_NUMBER,
+    KIND_PACKED,
+    KIND_STRING,
+    TelemetryReader,
+    TelemetryRecorder,
+)
+
+DOOR = "home/floor1/door_sensor/door_sensor_0/state/update"
+INDOOR = "home/floor1/indoor_sensor/indoor_sensor_0/temperature/update"
+
+
+@pytest.fixture(autouse=True, params=["numpy", "python"])
+def scan_path(request, monkeypatch):
+    """Runs every test with the NumPy scan (if installed) and the plain loop."""
+    if request.param == "numpy" and telemetry_log.np is None:
+        pytest.skip("NumPy is not installed")
+    if request.param == "python":
+        monkeypatch.setattr(telemetry_log, "np", None)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = TelemetryRecorder(str(tmp_path), segment_rows=4, flush_every=1)
+    yield recorder
+    recorder.close()
+
+
+def test_numbers_and_strings_round_trip(recorder, tmp_path):
+    recorder.append(INDOOR, 21.5, timestamp=10.0)
+    recorder.append(DOOR, "OPEN", timestamp=11.0)
+    recorder.append(INDOOR, "22.25", timestamp=12.0)  # Numeric text is a number
+    recorder.append(DOOR, "CLOSED", timestamp=13.0)
+    recorder.flush()
+
+    reader = TelemetryReader(str(tmp_path))
+    assert list(reader.scan("home/#", with_kind=True)) == [
+        (10.0, INDOOR, 21.5, KIND_NUMBER),
+        (11.0, DOOR, "OPEN", KIND_STRING),
+        (12.0, INDOOR, 22.25, KIND_NUMBER),
+        (13.0, DOOR, "CLOSED", KIND_STRING),
+    ]
+    assert reader.time_range() == (10.0, 13.0)
+
+
+def test_scan_filters_by_topic_and_time_across_segments(recorder, tmp_path):
+    for second in range(10):  # Four rows per segment, so three segments
+        recorder.append(INDOOR if second % 2 else DOOR, second, timestamp=second)
+    recorder.flush()
+
+    reader = TelemetryReader(str(tmp_path))
+    assert len(reader.segments()) == 3
+    assert [row[0] for row in reader.scan("home/+/indoor_sensor/#")] == [
+        1.0,
+        3.0,
+        5.0,
+        7.0,
+        9.0,
+    ]
+    assert [row[0] for row in reader.scan("home/#", start=3, end=6)] == [
+        3.0,
+        4.0,
+        5.0,
+    ]
+    assert [row[0] for row in reader.scan_device("door_sensor_0", end=4)] == [
+        0.0,
+        2.0,
+    ]
+    assert list(reader.scan("office/#")) == []
+
+
+def test_packed_messages_are_recorded_per_field(recorder, tmp_path):
+    topic = "home/lab/indoor_sensor/indoor_sensor_1/state"
+    recorder.record(
+        topic,
+        {"timestamp": 5.0, "humidity": 40.0, "temperature": 20.5, "schema": "sensor"},
+    )
+    recorder.flush()
+
+    rows = list(TelemetryReader(str(tmp_path)).scan("home/#", with_kind=True))
+    assert rows == [
+        (5.0, f"{topic}/humidity", 40.0, KIND_FIELD),
+        (5.0, f"{topic}/temperature", 20.5, KIND_FIELD),
+        (5.0, topic, "sensor", KIND_PACKED),
+    ]
+
+
+def test_rows_are_visible_only_after_a_flush(tmp_path):
+    recorder = TelemetryRecorder(str(tmp_path), flush_every=100)
+    try:
+        recorder.append(DOOR, "OPEN", timestamp=1.0)
+        reader = TelemetryReader(str(tmp_path))
+        assert list(reader.scan("home/#")) == []
+        recorder.flush()
+        assert list(reader.scan("home/#")) == [(1.0, DOOR, "OPEN")]
+    finally:
+        recorder.close()
@@ -0,0 +1,65 @@
+import pytest
+
+from broker.topic_trie import TopicTrie
+
+
+def trie(*filters):
+    topics = TopicTrie()
+    for topic_filter in filters:
+        topics.insert(topic_filter, topic_filter)
+    return topics
+
+
+def test_exact_filter_matches_only_its_topic():
+    topics = trie("home/door/state")
+    assert topics.match("home/door/state") == ["home/door/state"]
+    assert topics.match("home/door") == []
+    assert topics.match("home/door/state/extra") == []
+
+
+def test_single_level_wildcard_matches_one_level():
+    topics = trie("home/+/state")
+    assert topics.match("home/door/state") == ["home/+/state"]
+    assert topics.match("home/door/light/state") == []
+    assert topics.match("home/state") == []
+
+
+def test_multi_level_wildcard_matches_any_depth():
+    topics = trie("home/#")
+    assert topics.match("home/door") == ["home/#"]
+    assert topics.match("home/floor1/door/d1/state") == ["home/#"]
+    assert topics.match("office/door") == []
+
+
+def test_multi_level_wildcard_matches_its_parent_level():
+    assert trie("a/#").match("a") == ["a/#"]
+
+
+def test_every_matching_filter_is_returned():
+    topics = trie("home/#", "home/+/door/#", "home/floor1/door/d1", "#", "+/+")
+    assert sorted(topics.match("home/floor1/door/d1")) == [
+        "#",
+        "home/#",
+        "home/+/door/#",
+        "home/floor1/door/d1",
+    ]
+
+
+def test_system_topics_do_not_match_leading_wildcards():
+    topics = trie("#", "+/broker/load", "$SYS/#", "$SYS/+/load")
+    assert sorted(topics.match("$SYS/broker/load")) == ["$SYS/#", "$SYS/+/load"]
+    assert sorted(topics.match("SYS/broker/load")) == ["#", "+/broker/load"]
+
+
+def test_remove_prunes_the_filter():
+    topics = trie("home/+/state", "home/#")
+    assert topics.remove("home/+/state")
+    assert not topics.remove("home/+/state")
+    assert topics.match("home/door/state") == ["home/#"]
+    assert len(topics) == 1
+
+
+@pytest.mark.parametrize("topic_filter", ["", "home/#/state", "home/a#", "home/a+/b"])
+def test_invalid_filters_are_rejected(topic_filter):
+    with pytest.raises(ValueError):
+        TopicTrie().insert(topic_filter, None)